@@ -1,4 +1,6 @@
 import logging.config
+import logging.handlers
+import queue
 from pathlib import Path
 from typing import Optional
 
@@ -9,10 +11,11 @@ from utils import enums, logs
 from utils.configuration import config
 
 logger_accounting = logging.getLogger("symon-accounting")
+queue_listener: Optional[logging.handlers.QueueListener] = None
 
 
 def setup() -> None:
-    global logger_accounting
+    global logger_accounting, queue_listener
     accounting_file = config.get("accounting", "logs_file")
     if accounting_file is None:
         return
@@ -21,13 +24,23 @@ def setup() -> None:
     file_handler = logging.FileHandler(accounting_file)
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(logging.Formatter("%(asctime)s | %(message)s"))
-    logger_accounting.addHandler(file_handler)
+    # the file is written by the listener thread, the request only puts the record into the queue
+    records_queue = queue.SimpleQueue()
+    logger_accounting.addHandler(logging.handlers.QueueHandler(records_queue))
+    queue_listener = logging.handlers.QueueListener(records_queue, file_handler, respect_handler_level=True)
+    queue_listener.start()
+
+
+def shutdown() -> None:
+    if queue_listener is not None:
+        queue_listener.stop()
 
 
 def record(
     orchestrator_name: str, request: Request, body: str, status_code: int
 ) -> None:
     params = request.query_params if len(request.query_params) else ""
+    # both files are written by the listener threads, the request only puts the records into the queues
     logs.info(
         f"{request.method} {request.url.path}, params:{params}, body:{body}, status_code={status_code}"
     )
@@ -1,4 +1,6 @@
 import time
+from collections import OrderedDict
+from typing import Optional
 
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
@@ -9,6 +11,44 @@ import api.schemas.all as schemas
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 token_key = ""
 
+TOKEN_CACHE_SIZE = 256
+
+
+class TokenCache:
+    """
+    Data of the recently verified tokens, the least recently used token is dropped when the cache is full.
+    A token is not served from the cache after its expiration.
+    """
+
+    def __init__(self, size: int = TOKEN_CACHE_SIZE) -> None:
+        self._size = size
+        self._tokens: OrderedDict[str, schemas.TokenData] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def get(self, token: str, now: float) -> Optional[schemas.TokenData]:
+        token_data = self._tokens.get(token)
+        if token_data is None:
+            return None
+        if token_data.expiration < now:
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return token_data
+
+    def add(self, token: str, token_data: schemas.TokenData) -> None:
+        self._tokens[token] = token_data
+        self._tokens.move_to_end(token)
+        while len(self._tokens) > self._size:
+            self._tokens.popitem(last=False)
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+
+token_cache = TokenCache()
+
 
 def create_auth_token(
     orchestrator_name: str, orchestrator_ip: str, token_validity: int
@@ -26,6 +66,24 @@ def create_auth_token(
 async def get_data_from_auth_token(
     request: Request, token: str = Depends(oauth2_scheme)
 ) -> schemas.TokenData:
+    # the token is checked by the middleware and by the dependencies of the endpoint, it's decoded only once
+    token_data = getattr(request.state, "token_data", None)
+    if token_data is None or request.state.token != token:
+        token_data = decode_auth_token(token)
+        request.state.token = token
+        request.state.token_data = token_data
+    if str(request.client.host) != token_data.orchestrator_ip:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="The token was assigned to a different IP.",
+        )
+    return token_data
+
+
+def decode_auth_token(token: str) -> schemas.TokenData:
+    token_data = token_cache.get(token, time.time())
+    if token_data is not None:
+        return token_data
     data = encryption.decrypt(token, token_key)
     if not data:
         raise HTTPException(
@@ -33,11 +91,7 @@ async def get_data_from_auth_token(
             detail="Could not get data from the token.",
         )
     token_data = schemas.TokenData(**data)
-    if str(request.client.host) != token_data.orchestrator_ip:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="The token was assigned to a different IP.",
-        )
+    token_cache.add(token, token_data)
     return token_data
 
 
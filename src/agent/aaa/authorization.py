@@ -1,13 +1,15 @@
+import hashlib
+import hmac
 import json
 import time
 from typing import Optional
 
 from fastapi import Header, HTTPException, Request, status
 
-import aaa.encryption as encryption
-import database.daoaggregator
+import aaa.nonce_store as nonce_store
 from utils import logs
 from utils.configuration import config
+from utils.exceptions import TransactionError
 
 
 def authorization_headers(
@@ -21,9 +23,12 @@ def authorization_headers(
     pass
 
 
-async def verify_hmac(request: Request, expected_password: str) -> bool:
+async def get_message_hash(request: Request) -> "hashlib._Hash":
+    # the message without the password is hashed once per request, each key only extends a copy of the hash
+    message_hash = getattr(request.state, "authorization_message_hash", None)
+    if message_hash is not None:
+        return message_hash
     request_time = request.headers.get("authorization-time", "")
-    request_hmac = request.headers.get("authorization-hmac", "")
     request_nonce = request.headers.get("authorization-nonce", "")
     method = request.scope.get("method", "")
     path = request.scope.get("path", "")
@@ -42,10 +47,17 @@ async def verify_hmac(request: Request, expected_password: str) -> bool:
         + body_str
         + request_time
         + request_nonce
-        + expected_password
     )
-    expected_hmac = encryption.calculate_hash(message)
-    return request_hmac == expected_hmac
+    message_hash = hashlib.sha256(message.encode("utf-8"))
+    request.state.authorization_message_hash = message_hash
+    return message_hash
+
+
+async def verify_hmac(request: Request, expected_password: str) -> bool:
+    request_hmac = request.headers.get("authorization-hmac", "")
+    message_hash = (await get_message_hash(request)).copy()
+    message_hash.update(expected_password.encode("utf-8"))
+    return hmac.compare_digest(request_hmac.encode("utf-8"), message_hash.hexdigest().encode("utf-8"))
 
 
 def verify_request_time(request: Request) -> None:
@@ -73,16 +85,20 @@ def verify_request_time(request: Request) -> None:
         )
 
 
-def verify_request_nonce(request: Request) -> None:
+async def verify_request_nonce(request: Request) -> None:
     request_nonce = request.headers.get("authorization-nonce", "")
-    db = database.daoaggregator.get_dao_aggregator()
-    found = db.nonces.get_by_nonce(request_nonce)
-    if len(found):
+    try:
+        nonce_used = not await nonce_store.use(request_nonce, time.time())
+    except TransactionError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to check the nonce, the request can be sent again.",
+        )
+    if nonce_used:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The nonce has already been used.",
         )
-    db.nonces.create(request_nonce, time.time())
 
 
 async def authorize_request(
@@ -94,7 +110,7 @@ async def authorize_request(
         return
 
     verify_request_time(request)
-    verify_request_nonce(request)
+    await verify_request_nonce(request)
 
     if test_key:
         if await verify_hmac(request, test_key):
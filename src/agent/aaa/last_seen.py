@@ -0,0 +1,68 @@
+import threading
+from typing import Dict, Optional
+
+from database.daoaggregator import DAOAggregator
+from utils import logs
+from utils.configuration import config
+from utils.exceptions import TransactionError
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+class LastSeenStore(threading.Thread):
+    """
+    Last seen times of the orchestrators collected from the requests, only the latest time of every orchestrator
+    is kept. The thread writes them to the database periodically, outside of the request handling.
+    """
+
+    def __init__(self, flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+        super().__init__(name="last-seen-store", daemon=True)
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._pending: Dict[str, float] = {}
+
+    def touch(self, orchestrator_name: str, now: float) -> None:
+        with self._lock:
+            self._pending[orchestrator_name] = max(now, self._pending.get(orchestrator_name, now))
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._flush_interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not len(pending):
+            return
+        db = DAOAggregator()
+        try:
+            db.orchestrators.update_last_seen_many(pending)
+        except TransactionError:
+            db.rollback()
+            logs.warning(f"Unable to store the last seen time of {len(pending)} orchestrators.")
+        finally:
+            db.close()
+
+
+store: Optional[LastSeenStore] = None
+
+
+def setup() -> None:
+    global store
+    flush_interval = DEFAULT_FLUSH_INTERVAL
+    if config.exists("accounting", "last_seen_flush_interval_float"):
+        flush_interval = config.accounting_last_seen_flush_interval_float
+    store = LastSeenStore(flush_interval)
+    store.start()
+
+
+def shutdown() -> None:
+    if store is not None:
+        store.stop()
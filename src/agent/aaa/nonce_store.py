@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database.daoaggregator import DAOAggregator, run_in_db_thread
+from utils import logs
+from utils.configuration import config
+from utils.exceptions import TransactionError
+
+NONCE_SKEW = 5  # seconds, tolerance for the clocks of the agent and the orchestrator
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class NonceStore(threading.Thread):
+    """
+    Used nonces kept in memory for the validity of the requests, older requests are rejected by their time.
+    The new nonces are written to the database by the thread in batches, so they survive a restart.
+    A shared store is used by several API workers, a new nonce is accepted only after it's stored in the database.
+    """
+
+    def __init__(self, retention: float, flush_interval: float = DEFAULT_FLUSH_INTERVAL, shared: bool = False) -> None:
+        super().__init__(name="nonce-store", daemon=True)
+        self.shared = shared
+        self._retention = retention
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._used: Dict[str, float] = {}  # in the order of use, the oldest nonces are pruned first
+        self._pending: List[Dict[str, float]] = []
+
+    def __len__(self) -> int:
+        return len(self._used)
+
+    def load(self, db: DAOAggregator, now: float) -> None:
+        with self._lock:
+            self._used.clear()
+            for nonce in sorted(db.nonces.get_all_used_since(now - self._retention), key=lambda n: n.used_at):
+                self._used[nonce.nonce] = nonce.used_at
+
+    def use(self, nonce: str, now: float) -> bool:
+        """
+        Raises TransactionError if the shared store can't check the nonce, e.g. the database is locked.
+        """
+        with self._lock:
+            self.__prune(now)
+            if nonce in self._used:
+                return False
+            if not self.shared:
+                self._used[nonce] = now
+                self._pending.append({"nonce": nonce, "used_at": now})
+                return True
+        # the nonce is kept in memory only when it's claimed, a failed claim doesn't reject its retry
+        if not self.__claim(nonce, now):
+            return False
+        with self._lock:
+            self._used[nonce] = now
+        return True
+
+    @staticmethod
+    def __claim(nonce: str, now: float) -> bool:
+        # the primary key of the nonce rejects the nonce used by another worker
+        db = DAOAggregator()
+        try:
+            return db.nonces.claim(nonce, now)
+        except TransactionError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def __prune(self, now: float) -> None:
+        threshold = now - self._retention
+        expired = []
+        for nonce, used_at in self._used.items():
+            if used_at >= threshold:
+                break
+            expired.append(nonce)
+        for nonce in expired:
+            del self._used[nonce]
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._flush_interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not len(pending):
+            return
+        db = DAOAggregator()
+        try:
+            db.nonces.create_many(pending)
+        except TransactionError:
+            db.rollback()
+            # e.g. a nonce stored by another process, the others are stored one by one
+            for data in pending:
+                self.__store_one_nonce(db, data)
+        finally:
+            db.close()
+
+    @staticmethod
+    def __store_one_nonce(db: DAOAggregator, data: Dict[str, float]) -> None:
+        try:
+            db.nonces.create(data["nonce"], data["used_at"])
+        except TransactionError:
+            db.rollback()
+
+
+store: Optional[NonceStore] = None
+
+
+async def use(nonce: str, now: float) -> bool:
+    if not store.shared:
+        return store.use(nonce, now)
+    return await run_in_db_thread(store.use, nonce, now)
+
+
+def setup(shared: bool = False) -> None:
+    global store
+    flush_interval = DEFAULT_FLUSH_INTERVAL
+    if config.exists("authorization", "nonce_flush_interval_float"):
+        flush_interval = config.authorization_nonce_flush_interval_float
+    store = NonceStore(config.authorization_request_validity_int + NONCE_SKEW, flush_interval, shared)
+    db = DAOAggregator()
+    store.load(db, time.time())
+    db.close()
+    logs.debug(f"Loaded {len(store)} used nonces.")
+    store.start()
+
+
+def shutdown() -> None:
+    if store is not None:
+        store.stop()
@@ -24,7 +24,7 @@ async def post_token(
         authentication.verify_login(
             form_data.username, form_data.password, expected_password
         )
-        db.orchestrators.create_or_update(form_data.username, time.time())
+        await daoaggregator.run_in_db_thread(db.orchestrators.create_or_update, form_data.username, time.time())
         access_token = authentication.create_auth_token(
             form_data.username,
             request.client.host,
@@ -1,13 +1,16 @@
 import time
+from typing import Any, Dict
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
 
 import aaa.authentication as authentication
 import aaa.authorization as authorization
 import api.schemas.all as schemas
+from api import serialization
 from aaa import encryption
 from database import daoaggregator
-from database.daoaggregator import DAOAggregator
+from database.daoaggregator import DAOAggregator, run_in_db_thread
 from utils.configuration import config
 
 router = APIRouter(
@@ -32,9 +35,8 @@ async def post_multi_results_init(
     token_data: schemas.TokenData = Depends(authentication.get_data_from_auth_token),
 ) -> schemas.MultiResultId:
     await authorization.authorize_request(request, "")
-    db.multi_results.delete_by_orchestrator(token_data.orchestrator_name)
-    # TODO: replace test_ids from string to list of integers (sqlite->postgresql)
-    multi_result = db.multi_results.create(token_data.orchestrator_name, "", body)
+    await run_in_db_thread(db.multi_results.delete_by_orchestrator, token_data.orchestrator_name)
+    multi_result = await run_in_db_thread(db.multi_results.create, token_data.orchestrator_name, body)
     endpoint_result = schemas.MultiResultId(
         id_multi_result=multi_result.id_multi_result
     )
@@ -52,7 +54,7 @@ async def post_multi_results(
     body: schemas.MultiResultAddTestInput,
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
 ) -> schemas.MultiResultTestsIds:
-    test = db.tests.get_by_id(body.id_test)
+    test = await run_in_db_thread(db.tests.get_by_id, body.id_test)
     if not test:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Test doesn't exist"
@@ -60,7 +62,7 @@ async def post_multi_results(
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
-    multi_result = db.multi_results.get_by_id(multi_results_id)
+    multi_result = await run_in_db_thread(db.multi_results.get_by_id, multi_results_id)
     if not multi_result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -73,14 +75,11 @@ async def post_multi_results(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Wrong multi tests hash value.",
         )
-    test_ids = multi_result.test_ids
-    # TODO: replace multi_results / test_ids from string to list of integers (sqlite->postgresql)
-    if f",{body.id_test}," not in f",{test_ids},":
-        if len(test_ids) > 0:
-            test_ids += ","
-        test_ids += str(body.id_test)
-    db.multi_results.update_test_ids(multi_results_id, test_ids)
-    endpoint_result = schemas.MultiResultTestsIds(test_ids=test_ids)
+    test_ids = list(await run_in_db_thread(db.multi_results.get_test_ids, multi_results_id))
+    if body.id_test not in test_ids:
+        await run_in_db_thread(db.multi_results.add_test, multi_results_id, body.id_test)
+        test_ids.append(body.id_test)
+    endpoint_result = schemas.MultiResultTestsIds(test_ids=",".join(str(id_test) for id_test in test_ids))
     return endpoint_result
 
 
@@ -94,9 +93,8 @@ async def get_multi_results(
     request: Request,
     params: schemas.ResultsRequest = Depends(),
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
-) -> schemas.MultiResult:
-    now = time.time()
-    multi_result = db.multi_results.get_by_id(multi_results_id)
+) -> ORJSONResponse:
+    multi_result = await run_in_db_thread(db.multi_results.get_by_id, multi_results_id)
     if not multi_result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,21 +103,24 @@ async def get_multi_results(
     await authorization.authorize_request(
         request, config.authorization_root_password, multi_result.key
     )
-    db.multi_results.update_last_used_time(multi_results_id, now)
-    # TODO: replace test_ids from string to list of integers (sqlite->postgresql)
-    test_ids = multi_result.test_ids.split(",")
+    endpoint_result = await run_in_db_thread(get_results_for_tests, db, multi_results_id, params.since_id)
+    return ORJSONResponse(endpoint_result)
+
+
+def get_results_for_tests(db: DAOAggregator, multi_results_id: int, since_id: int) -> Dict[str, Any]:
+    now = time.time()
+    test_ids = db.multi_results.get_test_ids(multi_results_id)
+    db.multi_results.update_last_used_time(multi_results_id, now, transaction_finished=False)
+    db.tests.update_last_downloaded_time_many(test_ids, now, transaction_finished=True)
     last_result_id = db.results.get_last_used_id()
-    results_api = {}
-    for id_test in test_ids:
-        if len(id_test) == 0:
-            continue
-        id_test = int(id_test)
-        db.tests.update_last_downloaded_time(id_test, now)
-        results = db.results.get_all_in_id_range(
-            id_test, params.since_id, last_result_id
-        )
-        results_api[id_test] = schemas.Results(results=[schemas.Result(**r.__dict__) for r in results])
-    endpoint_result = schemas.MultiResult(
-        results=results_api, last_checked_id=last_result_id
-    )
+    # all the results are loaded by one query and grouped by the test
+    results_api = {id_test: [] for id_test in test_ids}
+    rows = db.results.get_rows_in_id_range_for_tests(test_ids, since_id, last_result_id)
+    for result in serialization.results.rows(rows):
+        results_api[result["fk_tests"]].append(result)
+    # the same fields as schemas.MultiResult
+    endpoint_result = {
+        "results": {id_test: {"results": results} for id_test, results in results_api.items()},
+        "last_checked_id": last_result_id,
+    }
     return endpoint_result
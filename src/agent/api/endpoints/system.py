@@ -1,14 +1,19 @@
-from typing import Annotated
+from pathlib import Path
+from typing import Annotated, Union
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 import aaa.accounting as accounting
 import aaa.authentication as authentication
 import aaa.authorization as authorization
+import aaa.last_seen as last_seen
 import api.schemas.all as schemas
 from api import logs_processing
 from database import daoaggregator
-from database.daoaggregator import DAOAggregator
+from database.daoaggregator import DAOAggregator, run_in_db_thread
+from utils import logs, metrics
 from utils.configuration import config
 
 router = APIRouter(
@@ -59,6 +64,25 @@ async def get_system_config_all(request: Request) -> schemas.Config:
     return endpoint_result
 
 
+async def stream_lines_from_file(
+    file: Path, params: Union[schemas.LogsRequest, schemas.AccountingRequest], max_size: int
+) -> StreamingResponse:
+    if not logs_processing.compression_available(params.compression_alg):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The compression algorithm {params.compression_alg.value} is not available.",
+        )
+    lines_range = await run_in_threadpool(logs_processing.find_lines_range, file, params.since, max_size)
+    chunks = logs_processing.compress_stream(logs_processing.read_lines_range(lines_range), params.compression_alg)
+    headers = {
+        "Content-Encoding": params.compression_alg.value,
+        "X-More-Data": str(lines_range.more_data).lower(),
+    }
+    if lines_range.last_datetime is not None:
+        headers["X-Last-Datetime"] = lines_range.last_datetime
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8", headers=headers)
+
+
 @router.get(
     "/orchestrators",
     response_model=schemas.Orchestrators,
@@ -68,12 +92,29 @@ async def get_system_orchestrators(
     request: Request, db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)
 ) -> schemas.Orchestrators:
     await authorization.authorize_request(request, config.authorization_root_password)
-    orchestrators_db = db.orchestrators.get_all()
+    # the times collected from the requests since the last periodic write
+    await run_in_db_thread(last_seen.store.flush)
+    orchestrators_db = await run_in_db_thread(db.orchestrators.get_all)
     orchestrators_api = [schemas.Orchestrator(**o.__dict__) for o in orchestrators_db]
     endpoint_result = schemas.Orchestrators(orchestrators=orchestrators_api)
     return endpoint_result
 
 
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Returns the metrics of all the agent processes in the Prometheus text format.",
+)
+async def get_system_metrics(
+    request: Request, db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)
+) -> PlainTextResponse:
+    await authorization.authorize_request(request, config.authorization_root_password)
+    runs = await run_in_db_thread(db.runs.count_records_in_table)
+    gauges = {"agent_runs": {f'state="{state.name}"': count for state, count in runs.categories.items()}}
+    endpoint_result = await run_in_threadpool(metrics.render, gauges)
+    return PlainTextResponse(endpoint_result, media_type=metrics.CONTENT_TYPE)
+
+
 @router.get(
     "/logs",
     response_model=schemas.Logs,
@@ -87,6 +128,8 @@ async def get_system_logs(
         max_logs_size = min(params.max_size, config.logging_api_max_logs_size_int)
     else:
         max_logs_size = config.logging_api_max_logs_size_int
+    if params.compression_alg in logs_processing.STREAMED_COMPRESSION_ALGS:
+        return await stream_lines_from_file(config.logging_logs_file, params, max_logs_size)
     extracted_lines = logs_processing.get_lines_from_file(
         config.logging_logs_file,
         params.since,
@@ -112,7 +155,9 @@ async def get_system_logs_stats(
     params: schemas.LogsStatsRequest = Depends()
 ) -> schemas.LogsStats:
     await authorization.authorize_request(request, config.authorization_root_password)
-    logs_stats = logs_processing.statistics(config.logging_logs_file, params.minutes)
+    logs_stats = logs.get_severity_statistics(params.minutes)
+    if logs_stats is None:
+        logs_stats = logs_processing.statistics(config.logging_logs_file, params.minutes)
     endpoint_result = schemas.LogsStats(**logs_stats)
     return endpoint_result
 
@@ -130,6 +175,8 @@ async def get_system_accounting(
         max_logs_size = min(params.max_size, config.logging_api_max_logs_size_int)
     else:
         max_logs_size = config.logging_api_max_logs_size_int
+    if params.compression_alg in logs_processing.STREAMED_COMPRESSION_ALGS:
+        return await stream_lines_from_file(config.accounting_logs_file, params, max_logs_size)
     extracted_lines = accounting.get_lines_from_file(
         config.accounting_logs_file,
         params.since,
@@ -1,13 +1,20 @@
 import time
+from typing import Any, AsyncIterator, Dict
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
+from sqlalchemy import Result, Row
+from starlette.background import BackgroundTask
 
 import aaa.authentication as authentication
 import aaa.authorization as authorization
 import api.schemas.all as schemas
+from api import serialization
 from database import daoaggregator
-from database.daoaggregator import DAOAggregator
-from utils import enums
+from database.dao.generic import STREAM_CHUNK_SIZE
+from database.daoaggregator import DAOAggregator, run_in_db_thread
+from utils import enums, wakeup
 from utils.configuration import config
 
 router = APIRouter(
@@ -36,12 +43,11 @@ def find_test(db: DAOAggregator, id_test: int) -> schemas.Test:
 )
 async def get_test_all(
     request: Request, db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)
-) -> schemas.Tests:
+) -> ORJSONResponse:
     await authorization.authorize_request(request, config.authorization_root_password)
-    tests_db = db.tests.get_all()
-    tests_api = [schemas.Test(**t.__dict__) for t in tests_db]
-    endpoint_result = schemas.Tests(tests=tests_api)
-    return endpoint_result
+    tests_db = await run_in_db_thread(db.tests.get_all_rows)
+    endpoint_result = {"tests": serialization.tests.rows(tests_db)}
+    return ORJSONResponse(endpoint_result)
 
 
 @router.get(
@@ -52,7 +58,7 @@ async def get_test_all(
 async def get_test(
     id_test: int, request: Request, db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)
 ) -> schemas.Test:
-    test = find_test(db, id_test)
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
@@ -67,36 +73,25 @@ async def get_test(
 )
 async def get_test_full(
     id_test: int, request: Request, db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)
-) -> schemas.TestFullInfo:
-    test = find_test(db, id_test)
+) -> ORJSONResponse:
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
+    endpoint_result = await run_in_db_thread(get_test_full_info, db, test)
+    return ORJSONResponse(endpoint_result)
 
-    requests = db.requests.get_all_by_test_id(test.id_test)
-    requests_api = [schemas.Request(**r.__dict__) for r in requests]
-
-    events = db.events.get_all_by_test_id(test.id_test)
-    events_api = [schemas.Event(**e.__dict__) for e in events]
-
-    runs = db.runs.get_all_by_test_id(test.id_test)
-    runs_api = [schemas.Run(**r.__dict__) for r in runs]
 
-    results = db.results.get_all_by_test_id(test.id_test)
-    results_api = [schemas.Result(**r.__dict__) for r in results]
-
-    old_params = db.old_params.get_all_by_test_id(test.id_test)
-    old_params_api = [schemas.OldParams(**o.__dict__) for o in old_params]
-
-    endpoint_result = schemas.TestFullInfo(
-        test=test.__dict__,
-        requests=requests_api,
-        events=events_api,
-        runs=runs_api,
-        results=results_api,
-        old_params=old_params_api,
-    )
-    return endpoint_result
+def get_test_full_info(db: DAOAggregator, test: schemas.Test) -> Dict[str, Any]:
+    # the same fields and order as schemas.TestFullInfo
+    return {
+        "test": serialization.tests.record(test),
+        "requests": serialization.requests.rows(db.requests.get_rows_by_test_id(test.id_test)),
+        "events": serialization.events.rows(db.events.get_rows_by_test_id(test.id_test)),
+        "runs": serialization.runs.rows(db.runs.get_rows_by_test_id(test.id_test)),
+        "old_params": serialization.old_params.rows(db.old_params.get_rows_by_test_id(test.id_test)),
+        "results": serialization.results.rows(db.results.get_rows_by_test_id(test.id_test)),
+    }
 
 
 @router.get(
@@ -109,16 +104,80 @@ async def get_test_results(
     request: Request,
     params: schemas.ResultsRequest = Depends(),
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
-) -> schemas.Results:
-    test = find_test(db, id_test)
+) -> ORJSONResponse:
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
-    db.tests.update_last_downloaded_time(id_test, time.time())
-    results = db.results.get_all_since_id(id_test, params.since_id)
-    results_api = [schemas.Result(**r.__dict__) for r in results]
-    endpoint_result = schemas.Results(results=results_api)
-    return endpoint_result
+    await run_in_db_thread(db.tests.update_last_downloaded_time, id_test, time.time())
+    results = await run_in_db_thread(db.results.get_rows_since_id, id_test, params.since_id)
+    endpoint_result = {"results": serialization.results.rows(results)}
+    return ORJSONResponse(endpoint_result)
+
+
+def result_to_json_line(row: Row) -> bytes:
+    # the same fields as in schemas.Result, the stored data string is only escaped, not parsed
+    result = {
+        "fk_tests": row.fk_tests,
+        "version": row.version,
+        "planned": row.planned,
+        "started": row.started,
+        "finished": row.finished,
+        "status": row.status.value,
+        "recovery_attempt": row.recovery_attempt,
+        "data": row.data,
+        "id_result": row.id_result,
+    }
+    return orjson.dumps(result) + b"\n"
+
+
+def fetch_json_lines(rows: Result) -> bytes:
+    return b"".join(result_to_json_line(row) for row in rows.fetchmany(STREAM_CHUNK_SIZE))
+
+
+async def stream_results(db: DAOAggregator, rows: Result, chunk: bytes) -> AsyncIterator[bytes]:
+    # every chunk is fetched in the DB threads, after a complete or aborted stream
+    # the session is closed by the background task of the response
+    try:
+        while len(chunk):
+            yield chunk
+            chunk = await run_in_db_thread(fetch_json_lines, rows)
+    except Exception:
+        await run_in_db_thread(db.close)
+        raise
+
+
+@router.get(
+    "/{id_test}/results/stream",
+    response_class=StreamingResponse,
+    summary="Streams the results for the specified test as NDJSON, one result per line ordered by the result ID.",
+)
+async def get_test_results_stream(
+    id_test: int,
+    request: Request,
+    params: schemas.ResultsStreamRequest = Depends(),
+) -> StreamingResponse:
+    # the session is closed after the response, not when the endpoint returns
+    db = DAOAggregator()
+    try:
+        test = await run_in_db_thread(find_test, db, id_test)
+        await authorization.authorize_request(
+            request, config.authorization_root_password, test.key_ro
+        )
+        await run_in_db_thread(db.tests.update_last_downloaded_time, id_test, time.time())
+        rows = await run_in_db_thread(
+            db.results.iterate_in_id_range, id_test, params.since_id, params.until_id, params.limit
+        )
+        # a failing query is an error response, not a truncated stream
+        chunk = await run_in_db_thread(fetch_json_lines, rows)
+    except Exception:
+        await run_in_db_thread(db.close)
+        raise
+    return StreamingResponse(
+        stream_results(db, rows, chunk),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(run_in_db_thread, db.close),
+    )
 
 
 @router.get(
@@ -129,11 +188,11 @@ async def get_test_results(
 async def get_test_events(
     id_test: int, request: Request, db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)
 ) -> schemas.Events:
-    test = find_test(db, id_test)
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
-    events_db = db.events.get_all_by_test_id(id_test)
+    events_db = await run_in_db_thread(db.events.get_all_by_test_id, id_test)
     events_api = [schemas.Event(**e.__dict__) for e in events_db]
     endpoint_result = schemas.Events(events=events_api)
     return endpoint_result
@@ -149,15 +208,16 @@ async def post_test_request(
     request: Request,
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
 ) -> schemas.Events:
-    test = find_test(db, id_test)
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_rw
     )
-    request = db.requests.create(id_test, enums.RequestReason.new, 0, time.time())
+    request = await run_in_db_thread(db.requests.create, id_test, enums.RequestReason.new, 0, time.time())
     if not request:  # TODO: after moving from sqllite to postgresql, create a unit test that will check this by failing the integrity check
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Unable to create a request"
         )
+    wakeup.notify_calendar()
     return request.id_request
 
 
@@ -171,11 +231,11 @@ async def get_old_params(
     request: Request,
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
 ) -> schemas.OldParamsList:
-    test = find_test(db, id_test)
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
-    old_params = db.old_params.get_all_by_test_id(id_test)
+    old_params = await run_in_db_thread(db.old_params.get_all_by_test_id, id_test)
     old_params_api = [schemas.OldParams(**op.__dict__) for op in old_params]
     endpoint_result = schemas.OldParamsList(old_params=old_params_api)
     return endpoint_result
@@ -192,11 +252,11 @@ async def get_old_params_by_version(
     request: Request,
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
 ) -> schemas.OldParams:
-    test = find_test(db, id_test)
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_ro
     )
-    old_params = db.old_params.get_by_test_id_and_version(id_test, version)
+    old_params = await run_in_db_thread(db.old_params.get_by_test_id_and_version, id_test, version)
     if not old_params:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Specified old_params for the test doesn't exist."
@@ -214,6 +274,15 @@ async def post_test(
     await authorization.authorize_request(
         request, config.authorization_new_tests_password
     )
+    test = await run_in_db_thread(create_test, db, body)
+    if body.state == enums.TestState.enabled:
+        wakeup.notify_calendar()
+
+    endpoint_result = schemas.Test(**test.__dict__)
+    return endpoint_result
+
+
+def create_test(db: DAOAggregator, body: schemas.TestCreate) -> schemas.Test:
     now = time.time()
     test = db.tests.create(body, created=now, transaction_finished=False)
     if not test:  # TODO: after moving from sqllite to postgresql, create a unit test that will check this by failing the integrity check
@@ -227,9 +296,7 @@ async def post_test(
         )
 
     db.commit()
-
-    endpoint_result = schemas.Test(**test.__dict__)
-    return endpoint_result
+    return test
 
 
 @router.patch(
@@ -243,13 +310,23 @@ async def patch_test(
     body: schemas.TestUpdate,
     db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator),
 ) -> schemas.Test:
-    test = find_test(db, id_test)
+    test = await run_in_db_thread(find_test, db, id_test)
     await authorization.authorize_request(
         request, config.authorization_root_password, test.key_rw
     )
+    state_changed = body.state != test.state
+    updated_test = await run_in_db_thread(update_test, db, test, body)
+    if state_changed:
+        wakeup.notify_calendar()
+    endpoint_result = schemas.Test(**updated_test.__dict__)
+    return endpoint_result
+
+
+def update_test(db: DAOAggregator, test: schemas.Test, body: schemas.TestUpdate) -> schemas.Test:
     now = time.time()
+    state_changed = body.state != test.state
 
-    if body.state != test.state:
+    if state_changed:
         db.requests.create(
             test.id_test, enums.RequestReason.update, 0, now, transaction_finished=False
         )
@@ -267,8 +344,6 @@ async def patch_test(
         new_version = test.version
 
     db.tests.update(
-        id_test, **body.model_dump(), version=new_version, transaction_finished=True
+        test.id_test, **body.model_dump(), version=new_version, transaction_finished=True
     )
-    updated_test = db.tests.get_by_id(id_test)
-    endpoint_result = schemas.Test(**updated_test.__dict__)
-    return endpoint_result
+    return db.tests.get_by_id(test.id_test)
@@ -1,16 +1,26 @@
 import base64
 import os
+import re
 import zlib
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from utils import enums, logs
 from utils.exceptions import TransactionError
 
+try:
+    import zstandard
+except ModuleNotFoundError:  # optional, only for the zstd compression
+    zstandard = None
+
 LogCounters = Dict[str, int]
 
+RECORD_START = re.compile(rb"\d{4}-\d{2}-\d{2} ")  # the lines of a record without the time (e.g. traceback) are skipped
+STREAM_CHUNK_SIZE = 65536
+STREAMED_COMPRESSION_ALGS = (enums.CompressionAlg.gzip, enums.CompressionAlg.zstd)
+
 
 @dataclass
 class ExtractedLines:
@@ -19,6 +29,13 @@ class ExtractedLines:
     more_data: bool
 
 
+@dataclass
+class LinesRange:
+    parts: List[Tuple[Path, int, int]]  # file, start and end offset
+    last_datetime: Optional[str]
+    more_data: bool
+
+
 # source: https://stackoverflow.com/questions/2301789/how-to-read-a-file-in-reverse-order
 def reverse_readline(filename: Path, buf_size: int = 8192):
     """A generator that returns the lines of a file in reverse order"""
@@ -83,14 +100,88 @@ def statistics(log_file: Path, delta_minutes: int) -> LogCounters:
     return counters
 
 
-def find_lines_from_datetime(file: Path, since: str, include_since: bool) -> List[str]:
+def get_log_segments(file: Path) -> List[Path]:
+    """Rotated segments of the log (file.N, ..., file.1) followed by the file itself, from the oldest."""
+    rotated = [
+        segment for segment in file.parent.glob(f"{file.name}.*") if segment.suffix[1:].isdigit()
+    ]
+    rotated.sort(key=lambda segment: int(segment.suffix[1:]), reverse=True)
+    return rotated + [file]
+
+
+def read_record_start(fh: BinaryIO, position: int) -> Tuple[int, Optional[bytes]]:
+    """Offset and the first line of the first record which starts at the position or after it."""
+    if position > 0:
+        fh.seek(position - 1)
+        fh.readline()  # the rest of the line containing the position
+    else:
+        fh.seek(0)
+    while True:
+        offset = fh.tell()
+        line = fh.readline()
+        if not line:
+            return offset, None
+        if RECORD_START.match(line):
+            return offset, line
+
+
+def find_offset_after(fh: BinaryIO, threshold: bytes) -> int:
+    """Offset of the first record greater than the threshold, the records in the file are ordered by time."""
+    low = 0
+    high = fh.seek(0, os.SEEK_END)
+    while low < high:
+        middle = (low + high) // 2
+        _, line = read_record_start(fh, middle)
+        if line is None or line > threshold:
+            high = middle
+        else:
+            low = middle + 1
+    offset, _ = read_record_start(fh, low)
+    return offset
+
+
+def iterate_lines_from_datetime(file: Path, since: str, include_since: bool) -> Iterator[Tuple[Path, int, bytes]]:
     if not include_since:
         since += "~"  # by adding the symbol, the comparing of the strings (with line > since) will result in not fulling the match rule of the line begins with the same string
-    matched_lines = []
-    for line in reverse_readline(file):
-        if line > since:
-            matched_lines.append(line)
-    return matched_lines
+    threshold = since.encode("utf-8")
+    for segment in get_log_segments(file):
+        if not segment.exists():
+            continue
+        with open(segment, "rb") as fh:
+            offset = find_offset_after(fh, threshold)
+            fh.seek(offset)
+            for line in fh:
+                yield segment, offset, line
+                offset += len(line)
+
+
+def find_lines_from_datetime(file: Path, since: str, include_since: bool) -> Iterator[str]:
+    for _, _, line in iterate_lines_from_datetime(file, since, include_since):
+        yield line.rstrip(b"\n").decode("utf-8", errors="replace")
+
+
+def find_lines_range(file: Path, since: str, max_size: int) -> LinesRange:
+    """The same lines as selected by get_lines_from_file, only their offsets are kept."""
+    parts: List[Tuple[Path, int, int]] = []
+    selected_size = 0
+    last_datetime = None
+    more_data_available = False
+    lines = iterate_lines_from_datetime(file, since, False)
+    try:
+        for segment, offset, line in lines:
+            text = line.rstrip(b"\n").decode("utf-8", errors="replace")
+            if not adding_line_doesnt_reach_limit(selected_size, text, max_size):
+                more_data_available = True
+                break
+            selected_size += len(text) + 1
+            last_datetime = text[: len("1970-01-01 00:00:00,000")]
+            if len(parts) and parts[-1][0] == segment:
+                parts[-1] = (segment, parts[-1][1], offset + len(line))
+            else:
+                parts.append((segment, offset, offset + len(line)))
+    finally:
+        lines.close()
+    return LinesRange(parts, last_datetime, more_data_available)
 
 
 def compress_data(data: str, algorithm: enums.CompressionAlg) -> str:
@@ -103,26 +194,64 @@ def compress_data(data: str, algorithm: enums.CompressionAlg) -> str:
     return compressed_data
 
 
-def adding_line_doesnt_reach_limit(data: str, line: str, max_size: int) -> bool:
-    if len(data) + len(line) <= max_size:
+def read_lines_range(lines_range: LinesRange) -> Iterator[bytes]:
+    for segment, start, end in lines_range.parts:
+        with open(segment, "rb") as fh:
+            fh.seek(start)
+            remaining = end - start
+            chunk = b""
+            while remaining > 0:
+                chunk = fh.read(min(remaining, STREAM_CHUNK_SIZE))
+                if not len(chunk):
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            if not chunk.endswith(b"\n"):
+                yield b"\n"  # the last line of the file is still being written
+
+
+def compress_stream(chunks: Iterable[bytes], algorithm: enums.CompressionAlg) -> Iterator[bytes]:
+    match algorithm:
+        case enums.CompressionAlg.gzip:
+            compressor = zlib.compressobj(wbits=31)  # with the gzip header
+        case enums.CompressionAlg.zstd if zstandard is not None:
+            compressor = zstandard.ZstdCompressor().compressobj()
+        case _:
+            raise TransactionError("Unknown compression algorithm has been specified.")
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if len(compressed):
+            yield compressed
+    yield compressor.flush()
+
+
+def compression_available(algorithm: enums.CompressionAlg) -> bool:
+    return algorithm != enums.CompressionAlg.zstd or zstandard is not None
+
+
+def adding_line_doesnt_reach_limit(data_size: int, line: str, max_size: int) -> bool:
+    if data_size + len(line) <= max_size:
         return True
     return False
 
 
 def select_lines_until_limit_is_reached(
-    lines: List[str], max_size: int = 1_000_000
+    lines: Iterable[str], max_size: int = 1_000_000
 ) -> ExtractedLines:
-    filtered_lines = ""
+    """The lines are taken from the oldest, the reading stops when the limit is reached."""
+    filtered_lines = []
+    filtered_size = 0
     last_datetime = None
     more_data_available = False
-    for line in reversed(lines):
-        if adding_line_doesnt_reach_limit(filtered_lines, line, max_size):
-            filtered_lines += line + "\n"
+    for line in lines:
+        if adding_line_doesnt_reach_limit(filtered_size, line, max_size):
+            filtered_lines.append(line + "\n")
+            filtered_size += len(line) + 1
             last_datetime = line[: len("1970-01-01 00:00:00,000")]
         else:
             more_data_available = True
             break
-    result = ExtractedLines(filtered_lines, last_datetime, more_data_available)
+    result = ExtractedLines("".join(filtered_lines), last_datetime, more_data_available)
     return result
 
 
@@ -133,7 +262,10 @@ def get_lines_from_file(
     compression_alg: Optional[enums.CompressionAlg] = None,
 ) -> ExtractedLines:
     matched_lines = find_lines_from_datetime(file, since, False)
-    extracted_lines = select_lines_until_limit_is_reached(matched_lines, max_size)
+    try:
+        extracted_lines = select_lines_until_limit_is_reached(matched_lines, max_size)
+    finally:
+        matched_lines.close()
     if compression_alg:
         extracted_lines.lines = compress_data(extracted_lines.lines, compression_alg)
     return extracted_lines
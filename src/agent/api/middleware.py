@@ -1,30 +1,16 @@
 import time
-from typing import Any, Callable
 
-from fastapi import HTTPException, Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request, status
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 import aaa.accounting as accounting
 import aaa.authentication as authentication
-import database.daoaggregator as daoaggregator
+import aaa.last_seen as last_seen
+from utils.configuration import config
 from utils.exceptions import TransactionError
 
 
-async def middleware_accounting(
-    request: Request, call_next: Callable, orchestrator_name: str
-) -> Any:
-    body_bytes = await request.body()
-    body = body_bytes.decode("utf-8").replace("\n", "\\n")
-    try:
-        response = await call_next(request)
-    except HTTPException as exception:
-        accounting.record(orchestrator_name, request, body, exception.status_code)
-        raise exception
-    accounting.record(orchestrator_name, request, body, response.status_code)
-    return response
-
-
 async def get_orchestrator_name_from_token(request: Request) -> str:
     bearer_token: str = request.headers.get("Authorization").split("Bearer")[1].strip()
     token_data = await authentication.get_data_from_auth_token(request, bearer_token)
@@ -36,24 +22,53 @@ def user_is_authenticated(request: Request) -> bool:
     return "Bearer" in request.headers.get("Authorization", "")
 
 
-async def process_request(
-    request: Request,
-    call_next: Callable,
-) -> Any:
-    if user_is_authenticated(request):
-        orchestrator_name = await get_orchestrator_name_from_token(request)
-        db = daoaggregator.get_dao_aggregator()
-        db.orchestrators.update(orchestrator_name, time.time())
-        db.close()
-        response = await middleware_accounting(request, call_next, orchestrator_name)
-    else:
-        response = await call_next(request)
-    return response
+class Accounting:
+    """
+    Records the requests of the authenticated orchestrators. The body is passed to the application as it's received,
+    the copy for the accounting record is written after the response has been sent.
+    """
 
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-class Accounting(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Any:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        config.reload_if_changed()  # e.g. changed through another API worker
+        request = Request(scope)
+        if not user_is_authenticated(request):
+            await self.app(scope, receive, send)
+            return
         try:
-            return await process_request(request, call_next)
+            orchestrator_name = await get_orchestrator_name_from_token(request)
         except TransactionError:
-            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={'message': "Could not get data from the token."})
+            response = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={'message': "Could not get data from the token."})
+            await response(scope, receive, send)
+            return
+        last_seen.store.touch(orchestrator_name, time.time())
+        await self.__call_with_accounting(scope, receive, send, request, orchestrator_name)
+
+    async def __call_with_accounting(
+        self, scope: Scope, receive: Receive, send: Send, request: Request, orchestrator_name: str
+    ) -> None:
+        body_chunks = []
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        async def receive_with_copy() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                body_chunks.append(message.get("body", b""))
+            return message
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_copy, send_with_status)
+        finally:
+            body = b"".join(body_chunks).decode("utf-8", errors="replace").replace("\n", "\\n")
+            accounting.record(orchestrator_name, request, body, status_code)
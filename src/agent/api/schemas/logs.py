@@ -13,7 +13,10 @@ class LogsRequest(BaseModel):
         None, description="Maximum length of the data (before compression)."
     )
     compression_alg: Optional[enums.CompressionAlg] = Field(
-        None, description="Name of the compression algorithm used to compress the data."
+        None,
+        description="Name of the compression algorithm used to compress the data. The gzip and zstd algorithms "
+        "return the plain records as a compressed stream (Content-Encoding), the last datetime and the indication "
+        "of more data are in the X-Last-Datetime and X-More-Data headers.",
     )
 
 
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from fastapi import Path
+from fastapi import Path, Query
 from pydantic import BaseModel, Field
 
 from utils import enums
@@ -35,5 +35,17 @@ class ResultsRequest(BaseModel):
     )
 
 
+class ResultsStreamRequest(BaseModel):
+    since_id: int = Query(
+        description="Specifies the last result ID from which to retrieve test results. Record with the specified ID wont be returned."
+    )
+    until_id: Optional[int] = Query(
+        None, description="Specifies the last result ID that will be returned."
+    )
+    limit: Optional[int] = Query(
+        None, ge=1, description="Maximal number of the returned results."
+    )
+
+
 class Results(BaseModel):
     results: List[Result] = Field(description="Test results for the specified test.")
@@ -0,0 +1,37 @@
+import operator
+from typing import Any, Dict, List, Sequence, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Row
+
+import api.schemas.all as schemas
+import database.connection as connection
+import database.models.all as models
+
+
+class RowsSerializer:
+    """
+    Maps the plain rows of a table straight to the dicts of the response schema, with the same keys and order
+    as the schema serialized by FastAPI. The values come from the database and are not validated again,
+    the stored data strings are passed as they are.
+    """
+
+    def __init__(self, schema: Type[BaseModel], table: Type[connection.Base]) -> None:
+        self.keys = tuple(field.alias or name for name, field in schema.model_fields.items())
+        columns = [column.key for column in table.__table__.columns]
+        self._values = operator.itemgetter(*(columns.index(key) for key in self.keys))
+
+    def rows(self, rows: Sequence[Row]) -> List[Dict[str, Any]]:
+        keys, values = self.keys, self._values
+        return [dict(zip(keys, values(row))) for row in rows]
+
+    def record(self, record: connection.Base) -> Dict[str, Any]:
+        return {key: getattr(record, key) for key in self.keys}
+
+
+tests = RowsSerializer(schemas.Test, models.Test)
+results = RowsSerializer(schemas.Result, models.Result)
+requests = RowsSerializer(schemas.Request, models.Request)
+events = RowsSerializer(schemas.Event, models.Event)
+runs = RowsSerializer(schemas.Run, models.Run)
+old_params = RowsSerializer(schemas.OldParams, models.OldParams)
@@ -0,0 +1,85 @@
+"""
+Time of the HMAC verification of one request with a test key and the root key, when the test key doesn't match.
+The previous verification (the body parsed and the whole message hashed for every key) is compared with
+the verification against the message hash cached on the request.
+
+Run from the agent folder: python -m code_tests.aaa.benchmark_authorization [--sizes 1000 100000 1000000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, List
+
+from starlette.requests import Request
+
+import aaa.authorization as authorization
+import aaa.encryption as encryption
+
+ROOT_KEY = "root_password"
+TEST_KEY = "test_password"
+
+
+def create_request(body: bytes, request_hmac: str) -> Request:
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/test",
+        "query_string": b"",
+        "headers": [
+            (b"authorization-time", b"1625190000"),
+            (b"authorization-nonce", b"nonce"),
+            (b"authorization-hmac", request_hmac.encode("utf-8")),
+        ],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request(scope, receive)
+
+
+def create_body(size: int) -> bytes:
+    items = []
+    while len(json.dumps(items)) < size:
+        items.append({"name": f"item_{len(items)}", "value": "x" * 80})
+    return json.dumps({"items": items}).encode("utf-8")
+
+
+async def previous_verify_hmac(request: Request, expected_password: str) -> bool:
+    body = await request.body()
+    body_str = json.dumps(json.loads(body), sort_keys=True)
+    message = "POST" + "/test" + "" + body_str + "1625190000" + "nonce" + expected_password
+    return request.headers.get("authorization-hmac", "") == encryption.calculate_hash(message)
+
+
+async def verify_both_keys(body: bytes, request_hmac: str, verify_hmac: Callable) -> None:
+    request = create_request(body, request_hmac)
+    assert not await verify_hmac(request, TEST_KEY)
+    assert await verify_hmac(request, ROOT_KEY)
+
+
+def measure(body: bytes, request_hmac: str, verify_hmac: Callable, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        asyncio.run(verify_both_keys(body, request_hmac, verify_hmac))
+    return (time.perf_counter() - started) / repeats
+
+
+def main(sizes: List[int], repeats: int) -> None:
+    print(f"{'body [B]':>9s} | {'previous [ms]':>13s} | {'cached [ms]':>11s}")
+    for size in sizes:
+        body = create_body(size)
+        message = "POST/test" + json.dumps(json.loads(body), sort_keys=True) + "1625190000nonce" + ROOT_KEY
+        request_hmac = encryption.calculate_hash(message)
+        previous = measure(body, request_hmac, previous_verify_hmac, repeats)
+        cached = measure(body, request_hmac, authorization.verify_hmac, repeats)
+        print(f"{len(body):9d} | {previous * 1000:13.3f} | {cached * 1000:11.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=50)
+    arguments = parser.parse_args()
+    main(arguments.sizes, arguments.repeats)
@@ -12,6 +12,9 @@ def test_setup():
             aaa.accounting.setup()
 
         mock_open.assert_called_once()
+    # the records are written by the listener thread
+    assert aaa.accounting.queue_listener._thread is not None
+    aaa.accounting.shutdown()
 
 
 @patch('logging.getLogger')
@@ -3,8 +3,17 @@ from unittest.mock import patch
 
 import pytest
 from fastapi import HTTPException
+from starlette.datastructures import State
 
 import aaa.authentication
+import api.schemas.all as schemas
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    aaa.authentication.token_cache.clear()
+    yield
+    aaa.authentication.token_cache.clear()
 
 
 @pytest.mark.parametrize(
@@ -35,6 +44,7 @@ def test_create_auth_token(orchestrator_name, orchestrator_ip, token_validity, c
 async def test_get_data_from_auth_token(mock_token_data, mock_decrypt, decrypted_data, client_ip, expected_exception):
     # Mock the request object
     mock_request = MagicMock()
+    mock_request.state = State()
     mock_request.client.host = client_ip
 
     # Set the side effect of the mock_decrypt function
@@ -52,6 +62,53 @@ async def test_get_data_from_auth_token(mock_token_data, mock_decrypt, decrypted
         assert result.model_dump() == decrypted_data
 
 
+@pytest.mark.asyncio
+async def test_get_data_from_auth_token_decodes_token_once():
+    token_data = {"orchestrator_ip": "127.0.0.1", "orchestrator_name": "orchestrator", "expiration": 2000}
+    first_request = MagicMock(state=State())
+    first_request.client.host = "127.0.0.1"
+    second_request = MagicMock(state=State())
+    second_request.client.host = "192.168.1.1"
+
+    with patch("aaa.encryption.decrypt", return_value=token_data) as mock_decrypt:
+        with patch("time.time", return_value=1000):
+            # the middleware and the endpoint dependency in the same request
+            assert (await aaa.authentication.get_data_from_auth_token(first_request, "token")).model_dump() == token_data
+            assert (await aaa.authentication.get_data_from_auth_token(first_request, "token")).model_dump() == token_data
+            # another request with the same token is served from the cache, the IP is still checked
+            with pytest.raises(HTTPException):
+                await aaa.authentication.get_data_from_auth_token(second_request, "token")
+    mock_decrypt.assert_called_once_with("token", aaa.authentication.token_key)
+
+
+@pytest.mark.parametrize(
+    "now, cached",
+    [
+        (1000, True),
+        (2000, True),
+        (2001, False),  # expired token is not served from the cache
+    ]
+)
+def test_TokenCache_get(now, cached):
+    cache = aaa.authentication.TokenCache()
+    token_data = schemas.TokenData(orchestrator_name="orchestrator", orchestrator_ip="127.0.0.1", expiration=2000)
+    cache.add("token", token_data)
+    assert (cache.get("token", now) is token_data) is cached
+    assert len(cache) == int(cached)
+    assert cache.get("unknown", now) is None
+
+
+def test_TokenCache_drops_least_recently_used_token():
+    cache = aaa.authentication.TokenCache(size=2)
+    for token in ("first", "second"):
+        cache.add(token, schemas.TokenData(orchestrator_name=token, orchestrator_ip="127.0.0.1", expiration=2000))
+    cache.get("first", 1000)
+    cache.add("third", schemas.TokenData(orchestrator_name="third", orchestrator_ip="127.0.0.1", expiration=2000))
+    assert len(cache) == 2
+    assert cache.get("second", 1000) is None
+    assert cache.get("first", 1000).orchestrator_name == "first"
+
+
 @patch('aaa.encryption.calculate_hash')
 @pytest.mark.parametrize(
     "username, hashed_password, expected_password, expected_exception",
@@ -2,8 +2,11 @@ from unittest.mock import AsyncMock, patch, MagicMock
 
 import pytest
 from fastapi import Request, HTTPException, status
+from starlette.datastructures import State
 
 import aaa.authorization
+from aaa.nonce_store import NonceStore
+from utils.exceptions import TransactionError
 
 
 def test_authorization_headers():
@@ -23,6 +26,7 @@ def test_authorization_headers():
 @pytest.mark.asyncio(loop_scope="function")
 async def test_verify_hmac_valid(authorization_hmac, request_body, request_json, json_called, password, result):
     mock_request = MagicMock()
+    mock_request.state = State()
     mock_request.headers = {
         "authorization-time": "1625190000",
         "authorization-hmac": authorization_hmac,
@@ -37,16 +41,15 @@ async def test_verify_hmac_valid(authorization_hmac, request_body, request_json,
     mock_request.body = AsyncMock(return_value=request_body)
     mock_request.json = AsyncMock(return_value=request_json)
 
-    expected_password = "my_secret_password"
-
-    result = await aaa.authorization.verify_hmac(mock_request, expected_password)
+    assert await aaa.authorization.verify_hmac(mock_request, password) is result
+    # the second key is checked against the cached message, the body is not parsed again
+    assert await aaa.authorization.verify_hmac(mock_request, "another_password") is False
 
     if json_called:
         mock_request.json.assert_called_once()
     else:
         mock_request.json.assert_not_called()
-
-    assert result is result
+    mock_request.body.assert_called_once()
 
 
 @pytest.mark.parametrize(
@@ -77,33 +80,42 @@ def test_verify_request_time(time_from_header, current_time, validity_limit, exc
 
 
 @pytest.mark.parametrize(
-    "request_nonce, return_nonce, return_time, db_create_called",
+    "request_nonce, used_nonces, should_raise_exception",
     [
-        ("test_nonce", [], 123456789, ("test_nonce", 123456789)),  # unused nonce
-        ("test_nonce", ["test_nonce"], 123456789, None),  # already used nonce
-        ("", [], 123456789, ("", 123456789)),  # no nonce in header, not used yet
+        ("test_nonce", [], False),  # unused nonce
+        ("test_nonce", ["test_nonce"], True),  # already used nonce
+        ("", [], False),  # no nonce in header, not used yet
     ]
 )
-def test_verify_request_nonce(request_nonce, return_nonce, return_time, db_create_called):
+@pytest.mark.asyncio
+async def test_verify_request_nonce(request_nonce, used_nonces, should_raise_exception):
     mock_request = MagicMock(spec=Request)
     mock_request.headers.get.return_value = request_nonce
 
-    mock_dao_aggregator = MagicMock()
-    mock_dao_aggregator.nonces.get_by_nonce.return_value = return_nonce
+    store = NonceStore(retention=60)
+    for nonce in used_nonces:
+        store.use(nonce, 123456789)
 
-    with patch("database.daoaggregator.get_dao_aggregator", return_value=mock_dao_aggregator):
-        with patch("time.time", return_value=return_time):
-            if len(return_nonce):
+    with patch("aaa.nonce_store.store", store):
+        with patch("time.time", return_value=123456789):
+            if should_raise_exception:
                 with pytest.raises(HTTPException) as exception_info:
-                    aaa.authorization.verify_request_nonce(mock_request)
+                    await aaa.authorization.verify_request_nonce(mock_request)
                 assert exception_info.value.status_code == status.HTTP_403_FORBIDDEN
             else:
-                aaa.authorization.verify_request_nonce(mock_request)
+                await aaa.authorization.verify_request_nonce(mock_request)
 
-    if db_create_called is None:
-        mock_dao_aggregator.nonces.create.assert_not_called()
-    else:
-        mock_dao_aggregator.nonces.create.assert_called_once_with(*db_create_called)
+    assert store._pending == [{"nonce": nonce, "used_at": 123456789} for nonce in used_nonces or [request_nonce]]
+
+
+@pytest.mark.asyncio
+async def test_verify_request_nonce_claim_error():
+    mock_request = MagicMock(spec=Request)
+    mock_request.headers.get.return_value = "test_nonce"
+    with patch("aaa.nonce_store.use", side_effect=TransactionError):
+        with pytest.raises(HTTPException) as exception_info:
+            await aaa.authorization.verify_request_nonce(mock_request)
+    assert exception_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
 
 
 @pytest.mark.asyncio
@@ -140,7 +152,7 @@ async def test_authorize_request(
 ):
     # Mock the dependencies
     with patch("aaa.authorization.verify_request_time") as mock_verify_request_time, \
-         patch("aaa.authorization.verify_request_nonce") as mock_verify_request_nonce, \
+         patch("aaa.authorization.verify_request_nonce", new_callable=AsyncMock) as mock_verify_request_nonce, \
          patch("aaa.authorization.verify_hmac", new_callable=AsyncMock) as mock_verify_hmac, \
          patch("utils.logs.warning") as mock_logs_warning:
 
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+
+import aaa.last_seen as last_seen
+import database.connection as connection
+from database.daoaggregator import DAOAggregator
+from utils.exceptions import TransactionError
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'last_seen.db'}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    db = DAOAggregator()
+    yield db
+    db.close()
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+def test_LastSeenStore_flush(db):
+    db.orchestrators.create("first", 10)
+    db.orchestrators.create("second", 10)
+    store = last_seen.LastSeenStore()
+    store.touch("first", 100)
+    store.touch("first", 120)
+    store.touch("first", 110)  # an older request finished later
+    store.touch("unknown", 120)  # deleted meanwhile, skipped
+    store.flush()
+    store.flush()  # nothing new to store
+
+    db.close()
+    assert {o.name: o.last_seen for o in db.orchestrators.get_all()} == {"first": 120, "second": 10}
+
+
+def test_LastSeenStore_flush_error():
+    mock_db = MagicMock()
+    mock_db.orchestrators.update_last_seen_many.side_effect = TransactionError
+    store = last_seen.LastSeenStore()
+    store.touch("first", 100)
+    with patch("aaa.last_seen.DAOAggregator", return_value=mock_db):
+        with patch("utils.logs.warning") as mock_logs_warning:
+            store.flush()
+
+    mock_db.orchestrators.update_last_seen_many.assert_called_once_with({"first": 100})
+    mock_db.rollback.assert_called_once()
+    mock_db.close.assert_called_once()
+    mock_logs_warning.assert_called_once()
+
+
+def test_LastSeenStore_stop_flushes_pending_times():
+    store = last_seen.LastSeenStore(flush_interval=60)
+    store.start()
+    store.touch("first", 100)
+    with patch.object(store, "flush") as mock_flush:
+        store.stop()
+    assert not store.is_alive()
+    mock_flush.assert_called_once()
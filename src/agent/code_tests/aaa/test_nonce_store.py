@@ -0,0 +1,111 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+
+import aaa.nonce_store as nonce_store
+import database.connection as connection
+from database.daoaggregator import DAOAggregator
+from utils.exceptions import TransactionError
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nonces.db'}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    db = DAOAggregator()
+    yield db
+    db.close()
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "used_at, now, accepted",
+    [
+        (100, 100, False),  # replayed immediately
+        (100, 160, False),  # still within the retention
+        (100, 161, True),  # forgotten after the retention, the request time is already rejected
+    ]
+)
+def test_NonceStore_use(used_at, now, accepted):
+    store = nonce_store.NonceStore(retention=60)
+    assert store.use("nonce", used_at)
+    assert store.use("nonce", now) is accepted
+    assert store.use("other", now)
+
+
+def test_NonceStore_prunes_expired_nonces():
+    store = nonce_store.NonceStore(retention=60)
+    for i in range(10):
+        store.use(f"nonce_{i}", i * 10)
+    assert len(store) == 7  # nonces used at 30..90 are kept at the time 90
+    store.use("last", 200)
+    assert len(store) == 1
+
+
+def test_NonceStore_flush_and_load(db):
+    store = nonce_store.NonceStore(retention=60)
+    store.use("old", 10)
+    store.use("recent", 100)
+    store.flush()
+    assert store._pending == []
+    assert [nonce.nonce for nonce in db.nonces.get_by_nonce("recent")] == ["recent"]
+
+    # a restarted store still rejects the nonces used within the retention
+    restarted = nonce_store.NonceStore(retention=60)
+    restarted.load(db, 120)
+    assert len(restarted) == 1
+    assert not restarted.use("recent", 120)
+    assert restarted.use("old", 120)
+
+
+def test_NonceStore_flush_fallback():
+    mock_db = MagicMock()
+    mock_db.nonces.create_many.side_effect = TransactionError
+    mock_db.nonces.create.side_effect = [TransactionError, None]
+    store = nonce_store.NonceStore(retention=60)
+    store.use("first", 100)
+    store.use("second", 100)
+    with patch("aaa.nonce_store.DAOAggregator", return_value=mock_db):
+        store.flush()
+        store.flush()  # nothing new to store
+
+    mock_db.nonces.create_many.assert_called_once()
+    assert mock_db.nonces.create.call_count == 2
+    assert mock_db.rollback.call_count == 2
+    mock_db.close.assert_called_once()
+
+
+def test_NonceStore_stop_flushes_pending_nonces():
+    store = nonce_store.NonceStore(retention=60, flush_interval=60)
+    store.start()
+    store.use("nonce", 100)
+    with patch.object(store, "flush") as mock_flush:
+        store.stop()
+    assert not store.is_alive()
+    mock_flush.assert_called_once()
+
+
+def test_NonceStore_shared_by_workers(db):
+    first_worker = nonce_store.NonceStore(retention=60, shared=True)
+    second_worker = nonce_store.NonceStore(retention=60, shared=True)
+    assert first_worker.use("nonce", 100)
+    assert not second_worker.use("nonce", 101)  # stored in the database by the first worker
+    assert not first_worker.use("nonce", 102)
+    assert second_worker.use("other", 102)
+    assert first_worker._pending == []
+    assert len(db.nonces.get_all_used_since(0)) == 2
+
+
+def test_NonceStore_shared_claim_error(db):
+    # e.g. the database is locked, the nonce is not rejected as used when the request is sent again
+    store = nonce_store.NonceStore(retention=60, shared=True)
+    with patch.object(db.nonces, "claim", side_effect=TransactionError):
+        with patch("aaa.nonce_store.DAOAggregator", return_value=db):
+            with pytest.raises(TransactionError):
+                store.use("nonce", 100)
+    assert len(store) == 0
+    assert store.use("nonce", 101)
+    assert not store.use("nonce", 102)
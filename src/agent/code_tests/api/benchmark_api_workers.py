@@ -0,0 +1,103 @@
+"""
+Throughput of the API server started with a different number of worker processes.
+Every worker count runs the real server (python main.py -t server) on a copy of the configuration
+with a temporary database, the clients send authenticated requests with a unique nonce from several processes.
+The clients run on the same machine, so the scaling is limited by the cores left for the server.
+
+Run from the agent folder: python -m code_tests.api.benchmark_api_workers [--workers 1 2 4] [--clients 8] [--requests 500]
+"""
+import argparse
+import configparser
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from pathlib import Path
+from typing import List
+
+import requests
+
+from code_tests.api import connection
+
+PORT = 20101
+DOMAIN = f"http://127.0.0.1:{PORT}"
+START_TIMEOUT = 30.0
+
+
+def create_persistent_folder(folder: Path, workers: int) -> None:
+    parser = configparser.ConfigParser()
+    parser.read(connection.get_path_to_config_file())
+    parser.set("api", "server_port", str(PORT))
+    parser.set("api", "workers_int", str(workers))
+    parser.set("database", "type", "sqlite")
+    parser.set("database", "sqlite_file", str(folder / "sqlite.db"))
+    parser.set("logging", "console_level", "critical")
+    parser.set("logging", "logs_file", str(folder / "debug.log"))
+    parser.set("logging", "logs_file_level", "warning")
+    parser.set("accounting", "logs_file", str(folder / "accounting.log"))
+    with open(folder / "config.ini", "w") as fh:
+        parser.write(fh)
+
+
+def run_task(folder: Path, task: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "main.py", "-t", task, "-p", str(folder)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_for_server(server: subprocess.Popen) -> None:
+    started = time.monotonic()
+    while time.monotonic() - started < START_TIMEOUT:
+        if server.poll() is not None:
+            raise RuntimeError("The server exited during the start.")
+        try:
+            requests.get(DOMAIN + "/auth/time")
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError("The server did not start in time.")
+
+
+def send_requests(requests_count: int) -> None:
+    for _ in range(requests_count):
+        response = connection.send_request(DOMAIN, "/system/config", "GET")
+        assert response.status_code == 200, response.text
+
+
+def measure(workers: int, clients: int, requests_count: int) -> float:
+    with tempfile.TemporaryDirectory() as folder_name:
+        folder = Path(folder_name)
+        create_persistent_folder(folder, workers)
+        run_task(folder, "init_database").wait()
+        server = run_task(folder, "server")
+        try:
+            wait_for_server(server)
+            connection.AUTH_TOKEN = None  # the token is issued for the server time of every start
+            connection.get_auth_token(DOMAIN)
+            with Pool(clients) as pool:
+                started = time.perf_counter()
+                pool.map(send_requests, [requests_count] * clients)
+                duration = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+    return clients * requests_count / duration
+
+
+def main(workers_counts: List[int], clients: int, requests_count: int) -> None:
+    print(f"{os.cpu_count()} cores")
+    print(f"{'workers':>7s} | {'requests/s':>10s}")
+    for workers in workers_counts:
+        throughput = measure(workers, clients, requests_count)
+        print(f"{workers:7d} | {throughput:10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500)
+    arguments = parser.parse_args()
+    main(arguments.workers, arguments.clients, arguments.requests)
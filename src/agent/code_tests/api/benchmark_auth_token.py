@@ -0,0 +1,113 @@
+"""
+Throughput of authenticated requests through an application with the token checked the same way as the agent API,
+by the middleware, by the dependency of the router and by the dependency of the endpoint.
+Decoding the token on every check is compared with the token cache. The requests are sent directly
+to the ASGI application, so the numbers contain only the framework and the authentication.
+
+Run from the agent folder: python -m code_tests.api.benchmark_auth_token [--requests 5000]
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Callable
+
+from fastapi import APIRouter, Depends, FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import aaa.authentication as authentication
+import aaa.encryption as encryption
+import api.schemas.all as schemas
+
+CLIENT_IP = "127.0.0.1"
+
+
+async def previous_get_data_from_auth_token(
+    request: Request, token: str = Depends(authentication.oauth2_scheme)
+) -> schemas.TokenData:
+    data = encryption.decrypt(token, authentication.token_key)
+    token_data = schemas.TokenData(**data)
+    assert str(request.client.host) == token_data.orchestrator_ip
+    return token_data
+
+
+def create_app(get_data_from_auth_token: Callable) -> FastAPI:
+    router = APIRouter(prefix="/multi-results", dependencies=[Depends(get_data_from_auth_token)])
+
+    @router.post("/init")
+    async def post_init(token_data: schemas.TokenData = Depends(get_data_from_auth_token)) -> dict:
+        return {"orchestrator_name": token_data.orchestrator_name}
+
+    class Accounting(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next: Callable) -> Any:
+            bearer_token = request.headers.get("Authorization").split("Bearer")[1].strip()
+            await get_data_from_auth_token(request, bearer_token)
+            return await call_next(request)
+
+    app = FastAPI()
+    app.add_middleware(Accounting)
+    app.include_router(router)
+    return app
+
+
+async def send_requests(app: FastAPI, token: str, requests_count: int) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/multi-results/init",
+        "raw_path": b"/multi-results/init",
+        "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode("utf-8"))],
+        "client": (CLIENT_IP, 50000),
+        "server": ("127.0.0.1", 20001),
+    }
+
+    for _ in range(requests_count):
+        await send_request(app, dict(scope))
+
+
+async def send_request(app: FastAPI, scope: dict) -> None:
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    response_sent = asyncio.Event()
+
+    async def receive() -> dict:
+        if len(messages):
+            return messages.pop()
+        await response_sent.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif not message.get("more_body", False):
+            response_sent.set()
+
+    await app(scope, receive, send)
+
+
+def measure(app: FastAPI, token: str, requests_count: int) -> float:
+    started = time.perf_counter()
+    asyncio.run(send_requests(app, token, requests_count))
+    return requests_count / (time.perf_counter() - started)
+
+
+def main(requests_count: int) -> None:
+    authentication.token_key = "benchmark_key"
+    token = authentication.create_auth_token("orchestrator", CLIENT_IP, 3600)
+    print(f"{'variant':>8s} | {'requests/s':>10s}")
+    for name, dependency in (
+        ("previous", previous_get_data_from_auth_token),
+        ("cached", authentication.get_data_from_auth_token),
+    ):
+        authentication.token_cache.clear()
+        throughput = measure(create_app(dependency), token, requests_count)
+        print(f"{name:>8s} | {throughput:10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    arguments = parser.parse_args()
+    main(arguments.requests)
@@ -0,0 +1,103 @@
+"""
+Latency of short requests while another orchestrator downloads a large backlog of results, with the database called
+directly from the async endpoints compared with the calls in the database threads. The database is a temporary
+SQLite file and the requests are sent directly to the ASGI application.
+
+Run from the agent folder: python -m code_tests.api.benchmark_db_threads [--results 5000] [--requests 100]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi import Depends, FastAPI
+
+from code_tests.api.benchmark_auth_token import send_request
+from code_tests.api.benchmark_results_stream import prepare_database
+from database import daoaggregator
+from database.daoaggregator import DAOAggregator, run_in_db_thread
+
+
+def get_dao_aggregator_blocking():
+    db = DAOAggregator()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def create_app(offloaded: bool) -> FastAPI:
+    app = FastAPI()
+    get_dao_aggregator = daoaggregator.get_dao_aggregator if offloaded else get_dao_aggregator_blocking
+
+    @app.get("/backlog")
+    async def get_backlog(db: DAOAggregator = Depends(get_dao_aggregator)) -> int:
+        if offloaded:
+            return len(await run_in_db_thread(db.results.get_all_since_id, 1, 0))
+        return len(db.results.get_all_since_id(1, 0))
+
+    @app.get("/test")
+    async def get_test(db: DAOAggregator = Depends(get_dao_aggregator)) -> str:
+        if offloaded:
+            return (await run_in_db_thread(db.tests.get_by_id, 1)).name
+        return db.tests.get_by_id(1).name
+
+    return app
+
+
+def create_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 20001),
+    }
+
+
+async def download_backlog(app: FastAPI, stopped: asyncio.Event) -> None:
+    while not stopped.is_set():
+        await send_request(app, create_scope("/backlog"))
+
+
+async def measure_latencies(app: FastAPI, requests_count: int) -> List[float]:
+    stopped = asyncio.Event()
+    downloading = asyncio.create_task(download_backlog(app, stopped))
+    await asyncio.sleep(0.1)
+    latencies = []
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        await send_request(app, create_scope("/test"))
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+    stopped.set()
+    await downloading
+    return latencies
+
+
+def main(results_count: int, requests_count: int) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        engine = prepare_database(Path(folder) / "benchmark.db", results_count)
+        print(f"{'variant':>9s} | {'p50 [ms]':>8s} | {'p99 [ms]':>8s} | {'max [ms]':>8s}")
+        for name, offloaded in (("blocking", False), ("offloaded", True)):
+            latencies = asyncio.run(measure_latencies(create_app(offloaded), requests_count))
+            percentiles = statistics.quantiles(latencies, n=100)
+            print(f"{name:>9s} | {percentiles[49]:8.1f} | {percentiles[98]:8.1f} | {max(latencies):8.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=100)
+    arguments = parser.parse_args()
+    main(arguments.results, arguments.requests)
@@ -0,0 +1,75 @@
+"""
+Compression ratio, CPU time and peak memory of extracting the logs with every compression algorithm.
+zlib_base85 and no compression build the whole JSON data in memory, gzip and zstd are streamed from the file.
+The log is a generated file with records in the format of the debug log.
+
+Run from the agent folder: python -m code_tests.api.benchmark_logs_compression [--size-mb 100]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from api import logs_processing
+from utils import enums
+
+SINCE = "1970-01-01"
+
+
+def create_log(file: Path, size: int) -> None:
+    with open(file, "w") as fh:
+        i = 0
+        while fh.tell() < size:
+            fh.write(
+                f"2024-02-10 {i // 3600000 % 24:02d}:{i // 60000 % 60:02d}:{i // 1000 % 60:02d},{i % 1000:03d} | api      "
+                f"|    DEBUG | main_modules/tests_manager.py    | start_new_tests                                  "
+                f"| {i % 300:3d} | Started the test {i % 97} in the worker with PID {10000 + i % 13}.\n"
+            )
+            i += 1
+
+
+def extract_document(file: Path, max_size: int, algorithm: Optional[enums.CompressionAlg]) -> int:
+    return len(logs_processing.get_lines_from_file(file, SINCE, max_size, algorithm).lines)
+
+
+def extract_stream(file: Path, max_size: int, algorithm: enums.CompressionAlg) -> int:
+    lines_range = logs_processing.find_lines_range(file, SINCE, max_size)
+    chunks = logs_processing.compress_stream(logs_processing.read_lines_range(lines_range), algorithm)
+    return sum(len(chunk) for chunk in chunks)  # the chunk is sent and released
+
+
+def measure(function: Callable[[], int]) -> Tuple[int, float, float]:
+    tracemalloc.start()
+    started = time.process_time()
+    size = function()
+    duration = time.process_time() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, duration, peak / 2**20
+
+
+def main(size_mb: int) -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        file = Path(folder) / "debug.log"
+        create_log(file, size_mb * 2**20)
+        max_size = file.stat().st_size
+        variants = [
+            ("none", lambda: extract_document(file, max_size, None)),
+            ("zlib_base85", lambda: extract_document(file, max_size, enums.CompressionAlg.zlib_base85)),
+            ("gzip", lambda: extract_stream(file, max_size, enums.CompressionAlg.gzip)),
+        ]
+        if logs_processing.compression_available(enums.CompressionAlg.zstd):
+            variants.append(("zstd", lambda: extract_stream(file, max_size, enums.CompressionAlg.zstd)))
+        print(f"{'algorithm':>11s} | {'size [MB]':>9s} | {'ratio':>6s} | {'CPU [s]':>7s} | {'peak memory [MB]':>16s}")
+        for name, function in variants:
+            size, duration, peak = measure(function)
+            print(f"{name:>11s} | {size / 2**20:9.1f} | {max_size / size:6.1f} | {duration:7.2f} | {peak:16.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=100)
+    arguments = parser.parse_args()
+    main(arguments.size_mb)
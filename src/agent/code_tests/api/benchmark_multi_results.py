@@ -0,0 +1,99 @@
+"""
+Latency of GET /multi-results/{id} for 10, 100 and 1000 tests in one multi result. The previous implementation
+(one results query and one committed UPDATE per test, encoded by pydantic) is compared with the endpoint, which
+loads the results by one query, updates the download times by one statement and encodes the rows by orjson.
+The authorization is skipped, the database is a temporary SQLite file with 10 new results per test.
+
+Run from the agent folder: python -m code_tests.api.benchmark_multi_results [--tests 10 100 1000]
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import create_engine, insert
+
+import api.schemas.all as schemas
+import database.connection as connection
+import database.models.all as models
+from api.endpoints import multi_result as multi_result_endpoints
+from database.daoaggregator import DAOAggregator
+from utils import enums
+
+RESULTS_PER_TEST = 10
+REPEATS = 5
+
+
+def prepare_database(database_file: Path, tests_count: int):
+    engine = create_engine(f"sqlite:///{database_file}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    now = time.time()
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), [
+            {"id_test": i, "name": f"test {i}", "description": "benchmark", "state": enums.TestState.enabled,
+             "created": now, "test_params": "{}", "timeout": 60, "key_ro": "RO", "key_rw": "RW"}
+            for i in range(1, tests_count + 1)
+        ])
+        db_connection.execute(insert(models.Result), [
+            {"fk_tests": i, "version": 1, "planned": now, "started": now, "finished": now,
+             "status": enums.ResultStatus.success, "recovery_attempt": 0, "data": '{"value": 1}'}
+            for _ in range(RESULTS_PER_TEST) for i in range(1, tests_count + 1)
+        ])
+        db_connection.execute(insert(models.MultiResult).values(id_multi_result=1, orchestrator_name="o", key="KEY"))
+        db_connection.execute(insert(models.MultiResultTest), [
+            {"fk_multi_results": 1, "fk_tests": i} for i in range(1, tests_count + 1)
+        ])
+    return engine
+
+
+def per_test_queries() -> bytes:
+    now = time.time()
+    db = DAOAggregator()
+    db.multi_results.update_last_used_time(1, now)
+    last_result_id = db.results.get_last_used_id()
+    results_api = {}
+    for id_test in db.multi_results.get_test_ids(1):
+        db.tests.update_last_downloaded_time(id_test, now)
+        results = db.results.get_all_in_id_range(id_test, 0, last_result_id)
+        results_api[id_test] = schemas.Results(results=[schemas.Result(**r.__dict__) for r in results])
+    db.close()
+    return schemas.MultiResult(results=results_api, last_checked_id=last_result_id).model_dump_json(by_alias=True).encode()
+
+
+def endpoint() -> bytes:
+    db = DAOAggregator()
+    with patch("aaa.authorization.authorize_request", new=AsyncMock()), patch("utils.configuration.config.get"):
+        result = asyncio.run(
+            multi_result_endpoints.get_multi_results(1, MagicMock(), schemas.ResultsRequest(since_id=0), db)
+        )
+    db.close()
+    return result.body
+
+
+def main(tests_counts: List[int]) -> None:
+    print(f"{'tests':>6s} | {'per test [ms]':>13s} | {'endpoint [ms]':>13s} | {'speed-up':>8s}")
+    for tests_count in tests_counts:
+        with tempfile.TemporaryDirectory() as folder:
+            engine = prepare_database(Path(folder) / "benchmark.db", tests_count)
+            measured = []
+            for function in (per_test_queries, endpoint):
+                started = time.perf_counter()
+                for _ in range(REPEATS):
+                    result = function()
+                measured.append((time.perf_counter() - started) / REPEATS * 1000)
+                results = json.loads(result)["results"].values()
+                assert sum(len(r["results"]) for r in results) == tests_count * RESULTS_PER_TEST
+            engine.dispose()
+        print(f"{tests_count:6d} | {measured[0]:13.1f} | {measured[1]:13.1f} | {measured[0] / measured[1]:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tests", type=int, nargs="+", default=[10, 100, 1000])
+    arguments = parser.parse_args()
+    main(arguments.tests)
@@ -0,0 +1,71 @@
+"""
+Rows per second of GET /test/{id_test}/results, the previous endpoint (ORM objects converted to the pydantic
+models, validated again against the response model and encoded by FastAPI) compared with the plain rows mapped
+to dicts and encoded by orjson. The requests are sent directly to the ASGI application, the authorization is
+skipped and the database is a temporary SQLite file, every result carries about 1 kB of data.
+
+Run from the agent folder: python -m code_tests.api.benchmark_results_serialization [--results 1000 10000]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
+
+import api.schemas.all as schemas
+from api import serialization
+from code_tests.api.benchmark_auth_token import send_request
+from code_tests.api.benchmark_db_threads import create_scope
+from code_tests.api.benchmark_results_stream import prepare_database
+from database import daoaggregator
+from database.daoaggregator import DAOAggregator, run_in_db_thread
+
+REPEATS = 5
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/previous", response_model=schemas.Results)
+    async def get_previous(db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)) -> schemas.Results:
+        results = await run_in_db_thread(db.results.get_all_since_id, 1, 0)
+        results_api = [schemas.Result(**r.__dict__) for r in results]
+        return schemas.Results(results=results_api)
+
+    @app.get("/rows", response_model=schemas.Results)
+    async def get_rows(db: DAOAggregator = Depends(daoaggregator.get_dao_aggregator)) -> ORJSONResponse:
+        results = await run_in_db_thread(db.results.get_rows_since_id, 1, 0)
+        return ORJSONResponse({"results": serialization.results.rows(results)})
+
+    return app
+
+
+async def send_requests(app: FastAPI, path: str) -> None:
+    for _ in range(REPEATS):
+        await send_request(app, create_scope(path))
+
+
+def main(results_counts: List[int]) -> None:
+    app = create_app()
+    print(f"{'results':>7s} | {'previous [rows/s]':>17s} | {'rows [rows/s]':>13s} | {'speed-up':>8s}")
+    for results_count in results_counts:
+        with tempfile.TemporaryDirectory() as folder:
+            engine = prepare_database(Path(folder) / "benchmark.db", results_count)
+            measured = []
+            for path in ("/previous", "/rows"):
+                started = time.perf_counter()
+                asyncio.run(send_requests(app, path))
+                measured.append(results_count * REPEATS / (time.perf_counter() - started))
+            engine.dispose()
+        print(f"{results_count:7d} | {measured[0]:17.0f} | {measured[1]:13.0f} | {measured[1] / measured[0]:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, nargs="+", default=[1000, 10000])
+    arguments = parser.parse_args()
+    main(arguments.results)
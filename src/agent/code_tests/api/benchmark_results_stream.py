@@ -0,0 +1,88 @@
+"""
+Peak memory and time of downloading the results of one test, the JSON document built from the ORM objects
+(GET /test/{id_test}/results) compared with the NDJSON stream (GET /test/{id_test}/results/stream).
+The database is a temporary SQLite file, every result carries about 1 kB of data.
+
+Run from the agent folder: python -m code_tests.api.benchmark_results_stream [--results 10000 100000]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, insert
+
+import api.schemas.all as schemas
+import database.connection as connection
+import database.models.all as models
+from api.endpoints import test as test_endpoints
+from database.daoaggregator import DAOAggregator
+from utils import enums
+
+RESULT_DATA = '{"value": "' + "x" * 1000 + '"}'
+
+
+def prepare_database(database_file: Path, results_count: int):
+    engine = create_engine(f"sqlite:///{database_file}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), [{
+            "id_test": 1, "name": "test", "description": "benchmark", "state": enums.TestState.enabled,
+            "created": time.time(), "test_params": "{}", "timeout": 60, "key_ro": "RO", "key_rw": "RW",
+        }])
+        db_connection.execute(insert(models.Result), [
+            {"fk_tests": 1, "version": 1, "planned": 1, "started": 2, "finished": 3,
+             "status": enums.ResultStatus.success, "recovery_attempt": 0, "data": RESULT_DATA}
+            for _ in range(results_count)
+        ])
+    return engine
+
+
+def download_document() -> int:
+    db = DAOAggregator()
+    results = db.results.get_all_since_id(1, 0)
+    results_api = [schemas.Result(**r.__dict__) for r in results]
+    body = schemas.Results(results=results_api).model_dump_json(by_alias=True)
+    db.close()
+    return len(body)
+
+
+def download_stream() -> int:
+    db = DAOAggregator()
+    rows = db.results.iterate_in_id_range(1, 0)
+    size = 0
+    while chunk := test_endpoints.fetch_json_lines(rows):
+        size += len(chunk)  # the chunk is sent and released
+    db.close()
+    return size
+
+
+def measure(function: Callable[[], int]) -> Tuple[float, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    duration = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak / 2**20
+
+
+def main(results_counts: List[int]) -> None:
+    print(f"{'results':>8s} | {'variant':>8s} | {'time [s]':>8s} | {'peak memory [MB]':>16s}")
+    for results_count in results_counts:
+        with tempfile.TemporaryDirectory() as folder:
+            engine = prepare_database(Path(folder) / "benchmark.db", results_count)
+            for name, function in (("document", download_document), ("stream", download_stream)):
+                duration, peak = measure(function)
+                print(f"{results_count:8d} | {name:>8s} | {duration:8.2f} | {peak:16.1f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, nargs="+", default=[10000, 100000])
+    arguments = parser.parse_args()
+    main(arguments.results)
@@ -103,6 +103,12 @@ def get_auth_token(domain):
 
 
 def call_endpoint(domain: str, endpoint: str, method: str, password_type: Optional[str] = None, data: Optional[Dict] = None):
+    response = send_request(domain, endpoint, method, password_type, data)
+    data = response.json()
+    return response.status_code, data
+
+
+def send_request(domain: str, endpoint: str, method: str, password_type: Optional[str] = None, data: Optional[Dict] = None) -> requests.Response:
     auth_token = get_auth_token(domain)
     request_time = get_current_server_time()
     request_nonce = get_random_nonce()
@@ -143,5 +149,4 @@ def call_endpoint(domain: str, endpoint: str, method: str, password_type: Option
         response = requests.delete(domain + endpoint, json=data, headers=headers)
     else:
         raise Exception(f"Unknown method {method}")
-    data = response.json()
-    return response.status_code, data
+    return response
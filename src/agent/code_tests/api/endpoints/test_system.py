@@ -4,11 +4,13 @@ import pytest
 import zlib
 import base64
 import requests
+import zstandard
 
-from code_tests.api.connection import call_endpoint
+from code_tests.api.connection import call_endpoint, send_request
 import api.schemas.all as schemas
 
 DOMAIN = "http://127.0.0.1:20001"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
 
 
 @pytest.mark.parametrize("method, endpoint, data", [
@@ -17,6 +19,7 @@ DOMAIN = "http://127.0.0.1:20001"
     ("GET", "/system/logs?since=1970-01-01", None),
     ("GET", "/system/logs/stats?minutes=10", None),
     ("GET", "/system/accounting?since=1970-01-01", None),
+    ("GET", "/system/metrics", None),
     ("PATCH", "/system/config", {"tests_0": {"test": "Fail"}}),
 ])
 def test_system_missing_root_password(method, endpoint, data):
@@ -34,6 +37,14 @@ def test_system_config():
     assert "version" in data.options["public"]
 
 
+def test_system_metrics():
+    response = send_request(DOMAIN, "/system/metrics", "GET", "root")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "# TYPE agent_runs gauge" in response.text
+    assert 'agent_runs{state="waiting"}' in response.text
+
+
 def test_system_config_patch():
     option_section = "tests_" + str(time.time())
     option_name = "test"
@@ -186,6 +197,29 @@ def test_system_accounting_compression(endpoint_part):
     assert len(decompressed_data) > compressed_size
 
 
+@pytest.mark.parametrize("endpoint_part, compression_alg", [
+    ("logs", "gzip"),
+    ("logs", "zstd"),
+    ("accounting", "gzip"),
+    ("accounting", "zstd"),
+])
+def test_system_accounting_streamed_compression(endpoint_part, compression_alg):
+    params = {"since": "1970-01-01", "max_size": 1000}
+    status_code, data_raw = call_endpoint(DOMAIN, f"/system/{endpoint_part}", "GET", "root", data=params)
+    data = schemas.Accounting(**data_raw)
+
+    params["compression_alg"] = compression_alg
+    response = send_request(DOMAIN, f"/system/{endpoint_part}", "GET", "root", data=params)
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == compression_alg
+    assert response.headers["X-Last-Datetime"] == data.last_datetime
+    assert response.headers["X-More-Data"] == str(data.more_data).lower()
+    content = response.content  # gzip is decompressed by the client
+    if content.startswith(ZSTD_MAGIC):  # zstd only by the clients with the support
+        content = zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    assert content.decode("utf-8") == data.data
+
+
 @pytest.mark.parametrize("endpoint_part", [
     "logs",
     "accounting",
@@ -187,6 +187,20 @@ def test_get_test_results():
     assert data.results[0].id_result == 1
 
 
+def test_get_test_results_stream():
+    id_test = 1
+    params = {"since_id": 0, "limit": 10}
+    status_code, data_raw = call_endpoint(DOMAIN, f"/test/{id_test}/results/stream", "GET", password_type="", data=params)
+    assert status_code == 403
+
+    # only one result is stored, so the NDJSON response contains one line
+    status_code, data_raw = call_endpoint(DOMAIN, f"/test/{id_test}/results/stream", "GET", password_type="RO", data=params)
+    assert status_code == 200
+    data = schemas.Result(**data_raw)
+    assert data.id_result == 1
+    assert data.data == '{"data":"ok"}'
+
+
 def test_get_test_events():
     id_test = 1
     # retrieve all test events with not password
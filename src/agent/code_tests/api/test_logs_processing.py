@@ -1,14 +1,24 @@
+import gzip
+
 import pytest
+import zstandard
 from unittest.mock import patch
 import api.logs_processing
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable
 from mock_open import MockOpen
 
 from utils import enums
 from utils.exceptions import TransactionError
 
 
+def write_log(folder: Path, lines: Iterable[str], name: str = "debug.log") -> Path:
+    log_file = folder / name
+    log_file.write_text("".join(line + "\n" for line in lines))
+    return log_file
+
+
 @pytest.mark.parametrize(
     "file_content, expected_lines",
     [
@@ -161,12 +171,52 @@ def test_statistics(mock_error, read_lines, threshold_time, expected_result):
         (["2024-02-16 data", "2024-02-14 data", "2024-02-12 data", "2024-02-10 data"], "2024-02-17", False, []),
     ]
 )
-def test_find_lines_from_datetime(read_lines, since, include_since, expected_result):
-    with patch('api.logs_processing.reverse_readline') as mock_reverse_readline:
-        mock_reverse_readline.return_value = iter(read_lines)
-        result = api.logs_processing.find_lines_from_datetime(Path("."), since, include_since)
+def test_find_lines_from_datetime(tmp_path, read_lines, since, include_since, expected_result):
+    log_file = write_log(tmp_path, reversed(read_lines))
+    result = list(api.logs_processing.find_lines_from_datetime(log_file, since, include_since))
+
+    assert result == expected_result[::-1]
+
+
+@pytest.mark.parametrize("lines_count", [1, 2, 3, 10, 257])
+def test_find_lines_from_datetime_binary_search(tmp_path, lines_count):
+    lines = [f"2024-02-10 00:{i // 60:02d}:{i % 60:02d},000 | INFO | record {i}" for i in range(lines_count)]
+    log_file = write_log(tmp_path, lines)
+    for i, line in enumerate(lines):
+        since = line[:len("1970-01-01 00:00:00,000")]
+        assert list(api.logs_processing.find_lines_from_datetime(log_file, since, False)) == lines[i + 1:]
+        assert list(api.logs_processing.find_lines_from_datetime(log_file, since, True)) == lines[i:]
+
+
+def test_find_lines_from_datetime_multiline_records(tmp_path):
+    lines = [
+        "2024-02-10 00:00:00,000 | ERROR | first",
+        "Traceback (most recent call last):",
+        "  File \"main.py\", line 1",
+        "2024-02-12 00:00:00,000 | ERROR | second",
+        "Traceback (most recent call last):",
+        "2024-02-14 00:00:00,000 | INFO | third",
+    ]
+    log_file = write_log(tmp_path, lines)
+    assert list(api.logs_processing.find_lines_from_datetime(log_file, "2024-02-11", True)) == lines[3:]
+    assert list(api.logs_processing.find_lines_from_datetime(log_file, "2024-02-09", True)) == lines
+
+
+def test_find_lines_from_datetime_rotated_segments(tmp_path):
+    write_log(tmp_path, ["2024-02-10 00:00:00,000 data", "2024-02-11 00:00:00,000 data"], "debug.log.2")
+    write_log(tmp_path, ["2024-02-12 00:00:00,000 data", "2024-02-13 00:00:00,000 data"], "debug.log.1")
+    write_log(tmp_path, ["ignored"], "debug.log.old")
+    log_file = write_log(tmp_path, ["2024-02-14 00:00:00,000 data"])
+
+    result = list(api.logs_processing.find_lines_from_datetime(log_file, "2024-02-10 12", True))
+    assert result == [
+        "2024-02-11 00:00:00,000 data", "2024-02-12 00:00:00,000 data",
+        "2024-02-13 00:00:00,000 data", "2024-02-14 00:00:00,000 data",
+    ]
+    assert api.logs_processing.get_log_segments(log_file) == [
+        tmp_path / "debug.log.2", tmp_path / "debug.log.1", log_file,
+    ]
 
-    assert result == expected_result
 
 
 @pytest.mark.parametrize(
@@ -207,7 +257,7 @@ def test_compress_data(data, algorithm, expected_result):
     ]
 )
 def test_adding_line_doesnt_reach_limit(data, line, max_size, expected):
-    result = api.logs_processing.adding_line_doesnt_reach_limit(data, line, max_size)
+    result = api.logs_processing.adding_line_doesnt_reach_limit(len(data), line, max_size)
     assert result == expected
 
 
@@ -256,7 +306,7 @@ def test_adding_line_doesnt_reach_limit(data, line, max_size, expected):
     ]
 )
 def test_select_lines_until_limit_is_reached(lines, max_size, expected_lines, expected_last_datetime, expected_more_data):
-    result = api.logs_processing.select_lines_until_limit_is_reached(lines, max_size)
+    result = api.logs_processing.select_lines_until_limit_is_reached(reversed(lines), max_size)
 
     assert result.lines == expected_lines
     assert result.last_datetime == expected_last_datetime
@@ -304,9 +354,44 @@ def test_select_lines_until_limit_is_reached(lines, max_size, expected_lines, ex
         ),
     ]
 )
-def test_get_lines_from_file(read_lines, since, max_size, compression_alg, expected_result):
-    with patch('api.logs_processing.reverse_readline') as mock_reverse_readline:
-        mock_reverse_readline.return_value = iter(read_lines)
-        result = api.logs_processing.get_lines_from_file(Path("."), since, max_size, compression_alg)
+def test_get_lines_from_file(tmp_path, read_lines, since, max_size, compression_alg, expected_result):
+    log_file = write_log(tmp_path, reversed(read_lines))
+    result = api.logs_processing.get_lines_from_file(log_file, since, max_size, compression_alg)
 
     assert result == expected_result
+
+
+@pytest.mark.parametrize("max_size", [0, 40, 100, 1000])
+def test_find_lines_range(tmp_path, max_size):
+    write_log(tmp_path, ["2024-02-10 00:00:00,000 data", "2024-02-11 00:00:00,000 data"], "debug.log.1")
+    log_file = tmp_path / "debug.log"
+    log_file.write_text("2024-02-12 00:00:00,000 data\nTraceback\n2024-02-13 00:00:00,000 data")  # the last line is being written
+    expected = api.logs_processing.get_lines_from_file(log_file, "2024-02-10 00:00:00,000", max_size)
+
+    lines_range = api.logs_processing.find_lines_range(log_file, "2024-02-10 00:00:00,000", max_size)
+    assert lines_range.last_datetime == expected.last_datetime
+    assert lines_range.more_data == expected.more_data
+    assert b"".join(api.logs_processing.read_lines_range(lines_range)).decode("utf-8") == expected.lines
+
+
+@pytest.mark.parametrize(
+    "algorithm, decompress",
+    [
+        (enums.CompressionAlg.gzip, gzip.decompress),
+        (enums.CompressionAlg.zstd, lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)),
+    ]
+)
+def test_compress_stream(algorithm, decompress):
+    chunks = [b"2024-02-10 00:00:00,000 data\n" * 100, b"", b"2024-02-11 00:00:00,000 data\n"]
+    compressed = b"".join(api.logs_processing.compress_stream(iter(chunks), algorithm))
+    assert decompress(compressed) == b"".join(chunks)
+    assert len(compressed) < len(b"".join(chunks))
+
+
+def test_compress_stream_unknown_algorithm():
+    with pytest.raises(TransactionError):
+        list(api.logs_processing.compress_stream(iter([b"data"]), enums.CompressionAlg.zlib_base85))
+    with patch("api.logs_processing.zstandard", None):
+        assert not api.logs_processing.compression_available(enums.CompressionAlg.zstd)
+        with pytest.raises(TransactionError):
+            list(api.logs_processing.compress_stream(iter([b"data"]), enums.CompressionAlg.zstd))
@@ -1,4 +1,5 @@
-from unittest.mock import patch, AsyncMock, MagicMock
+from typing import List, Tuple
+from unittest.mock import patch, MagicMock
 
 import pytest
 from fastapi import Request, status, HTTPException
@@ -7,37 +8,6 @@ import api.middleware
 from utils.exceptions import TransactionError
 
 
-@pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "body_data, call_result_code, expected_log_body, exception_code",
-    [
-        ("data", status.HTTP_200_OK, "data", None),
-        ("data\ndata", status.HTTP_200_OK, "data\\ndata", None),
-        ("", status.HTTP_400_BAD_REQUEST, "", None),
-        ("data", None, "data", status.HTTP_400_BAD_REQUEST),
-        ("data\ndata", None, "data\\ndata", status.HTTP_400_BAD_REQUEST),
-    ]
-)
-async def test_middleware_accounting(body_data, call_result_code, expected_log_body, exception_code):
-    orchestrator_name = "orchestrator_name"
-    request = MagicMock()
-    request.body = AsyncMock(return_value=body_data.encode("utf-8"))
-    call_result = MagicMock()
-    call_result.status_code = call_result_code
-    call_next = AsyncMock(return_value=call_result)
-
-    with patch("aaa.accounting.record") as mock_accounting:
-        if exception_code is not None:
-            call_next.side_effect = HTTPException(exception_code)
-            with pytest.raises(HTTPException) as exception_info:
-                await api.middleware.middleware_accounting(request, call_next, orchestrator_name)
-            assert exception_info.value.status_code == exception_code
-        else:
-            result = await api.middleware.middleware_accounting(request, call_next, orchestrator_name)
-            assert result.status_code == call_result.status_code
-            mock_accounting.assert_called_once_with(orchestrator_name, request, expected_log_body, call_result_code)
-
-
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "auth_header, orchestrator_name",
@@ -90,53 +60,85 @@ def test_user_is_authenticated(auth_header, expected_result):
     assert result == expected_result
 
 
+def http_scope(headers: List[Tuple[bytes, bytes]]) -> dict:
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/test",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+async def call_middleware(scope: dict, body_chunks: List[bytes], app_status: int) -> List[dict]:
+    messages = [{"type": "http.request", "body": chunk, "more_body": i + 1 < len(body_chunks)} for i, chunk in enumerate(body_chunks)]
+    sent = []
+
+    async def app(scope, receive, send):
+        more_body = True
+        while more_body:
+            more_body = (await receive()).get("more_body", False)
+        if app_status is None:
+            raise RuntimeError("endpoint crashed")
+        await send({"type": "http.response.start", "status": app_status, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await api.middleware.Accounting(app)(scope, receive, send)
+    return sent
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
-    "user_is_authenticated, orchestrator_name, accounting_result, call_next_result, expected_result",
+    "headers, body_chunks, app_status, expected_record",
     [
-        (True, "orchestrator", "result1", "result2", "result1"),
-        (False, "orchestrator", "result1", "result2", "result2"),
+        ([(b"authorization", b"Bearer token")], [b"data"], status.HTTP_200_OK, ("orchestrator", "data", status.HTTP_200_OK)),
+        ([(b"authorization", b"Bearer token")], [b"da", b"ta\ndata"], status.HTTP_200_OK, ("orchestrator", "data\\ndata", status.HTTP_200_OK)),
+        ([(b"authorization", b"Bearer token")], [b""], status.HTTP_400_BAD_REQUEST, ("orchestrator", "", status.HTTP_400_BAD_REQUEST)),
+        ([], [b"data"], status.HTTP_200_OK, None),  # not authenticated, not recorded
     ]
 )
-async def test_process_request(user_is_authenticated, orchestrator_name, accounting_result, call_next_result, expected_result):
-    mock_request = MagicMock(spec=Request)
-    call_next = AsyncMock(return_value=call_next_result)
-    mock_dao_aggregator = MagicMock()
-    mock_dao_aggregator.orchestrators.update.return_value = None
-    current_time = 123456.7
-    with patch("api.middleware.user_is_authenticated", return_value=user_is_authenticated):
-        with patch("api.middleware.get_orchestrator_name_from_token", return_value=orchestrator_name):
-            with patch("api.middleware.middleware_accounting", return_value=accounting_result):
-                with patch("database.daoaggregator.get_dao_aggregator", return_value=mock_dao_aggregator):
-                    with patch("time.time", return_value=current_time):
-                        result = await api.middleware.process_request(mock_request, call_next)
-                        assert result == expected_result
+async def test_Accounting(headers, body_chunks, app_status, expected_record):
+    mock_store = MagicMock()
+    with patch("api.middleware.get_orchestrator_name_from_token", return_value="orchestrator"), \
+         patch("aaa.last_seen.store", mock_store), \
+         patch("aaa.accounting.record") as mock_record, \
+         patch("time.time", return_value=123456.7):
+        sent = await call_middleware(http_scope(headers), body_chunks, app_status)
+
+    assert sent[0]["status"] == app_status
+    if expected_record:
+        orchestrator_name, body, status_code = expected_record
+        assert mock_record.call_args.args[0] == orchestrator_name
+        assert mock_record.call_args.args[2:] == (body, status_code)
+        mock_store.touch.assert_called_once_with(orchestrator_name, 123456.7)
+    else:
+        mock_record.assert_not_called()
+        mock_store.touch.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_dispatch_valid():
-    expected_response = "successful_response"
-    with patch("api.middleware.process_request", return_value=expected_response):
-        request = AsyncMock(spec=Request)
-        call_next = AsyncMock()
-
-        middleware = api.middleware.Accounting(app=None)
-        response = await middleware.dispatch(request, call_next)
-
-        assert response == expected_response
+async def test_Accounting_endpoint_error():
+    with patch("api.middleware.get_orchestrator_name_from_token", return_value="orchestrator"), \
+         patch("aaa.last_seen.store"), \
+         patch("aaa.accounting.record") as mock_record:
+        with pytest.raises(RuntimeError):
+            await call_middleware(http_scope([(b"authorization", b"Bearer token")]), [b"data"], None)
+    assert mock_record.call_args.args[2:] == ("data", status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @pytest.mark.asyncio(loop_scope="function")
-async def test_dispatch_error():
-    with patch("api.middleware.process_request") as mock_process_request:
-        mock_process_request.side_effect = TransactionError()
-
-        # Mock objects
-        request = AsyncMock(spec=Request)  # Mock the Request object
-        call_next = AsyncMock()  # Mock the call_next function
-
-        # Instantiate the middleware and call dispatch
-        middleware = api.middleware.Accounting(app=None)
-        response = await middleware.dispatch(request, call_next)
-
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+async def test_Accounting_invalid_token():
+    with patch("api.middleware.get_orchestrator_name_from_token", side_effect=TransactionError()), \
+         patch("aaa.accounting.record") as mock_record:
+        sent = await call_middleware(http_scope([(b"authorization", b"Bearer token")]), [b"data"], status.HTTP_200_OK)
+
+    assert sent[0]["status"] == status.HTTP_401_UNAUTHORIZED
+    assert len(sent) == 2  # the response of the middleware, the endpoint is not called
+    mock_record.assert_not_called()
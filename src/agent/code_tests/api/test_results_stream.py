@@ -0,0 +1,66 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import api.schemas.all as schemas
+from api.endpoints import test as test_endpoints
+from utils import enums
+from utils.exceptions import TransactionError
+
+
+def result_row(id_result: int) -> MagicMock:
+    return MagicMock(
+        fk_tests=1, version=2, planned=1.0, started=2.0, finished=3.0, status=enums.ResultStatus.success,
+        recovery_attempt=0, data='{"data": "ok", "text": "a\\nb"}', id_result=id_result,
+    )
+
+
+async def get_stream(mock_db: MagicMock):
+    params = schemas.ResultsStreamRequest(since_id=0)
+    with patch("api.endpoints.test.DAOAggregator", return_value=mock_db):
+        with patch("aaa.authorization.authorize_request", new=AsyncMock()):
+            with patch("utils.configuration.config.get", return_value="password"):
+                return await test_endpoints.get_test_results_stream(1, MagicMock(), params)
+
+
+@pytest.mark.asyncio
+async def test_get_test_results_stream():
+    mock_db = MagicMock()
+    mock_db.results.iterate_in_id_range.return_value.fetchmany.side_effect = [
+        [result_row(1), result_row(2)], [result_row(3)], [],
+    ]
+    response = await get_stream(mock_db)
+    chunks = [chunk async for chunk in response.body_iterator]
+
+    assert len(chunks) == 2
+    lines = b"".join(chunks).splitlines(keepends=True)
+    assert all(line.endswith(b"\n") and line.count(b"\n") == 1 for line in lines)
+    results = [schemas.Result(**json.loads(line)) for line in lines]
+    assert [result.id_result for result in results] == [1, 2, 3]
+    assert results[0].data == '{"data": "ok", "text": "a\\nb"}'
+    assert results[0].status == enums.ResultStatus.success
+    mock_db.close.assert_not_called()
+    await response.background()  # also after a client disconnected
+    mock_db.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_test_results_stream_query_fails():
+    mock_db = MagicMock()
+    mock_db.results.iterate_in_id_range.side_effect = TransactionError("Unable to get records")
+    # raised before the response starts, the client gets an error status instead of a truncated stream
+    with pytest.raises(TransactionError):
+        await get_stream(mock_db)
+    mock_db.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_stream_results_fetch_fails():
+    mock_db, rows = MagicMock(), MagicMock()
+    rows.fetchmany.side_effect = TransactionError("Unable to get records")
+    stream = test_endpoints.stream_results(mock_db, rows, b"first\n")
+    assert await stream.__anext__() == b"first\n"
+    with pytest.raises(TransactionError):
+        await stream.__anext__()
+    mock_db.close.assert_called_once()
@@ -0,0 +1,55 @@
+import json
+
+import orjson
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+import api.schemas.all as schemas
+import database.connection as connection
+import database.models.all as models
+from api import serialization
+from utils import enums
+
+TEST = {
+    "id_test": 1, "name": "test", "description": "description", "version": 2, "state": enums.TestState.enabled,
+    "created": 10.0, "test_params": '{"count": 3}', "timeout": 60, "recovery_interval": 30, "key_ro": "RO",
+    "key_rw": "RW", "last_result_status": enums.ResultStatus.error,
+}
+RESULT = {
+    "id_result": 5, "fk_tests": 1, "version": 2, "planned": 1.5, "started": 2.0, "finished": 3.25,
+    "status": enums.ResultStatus.success, "recovery_attempt": 0, "data": '{"data": "ok", "text": "a\\nb"}',
+}
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    connection.Base.metadata.create_all(engine)
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), [TEST])
+        db_connection.execute(insert(models.Result), [RESULT])
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.mark.parametrize(
+    "serializer, schema, table",
+    [
+        (serialization.tests, schemas.Test, models.Test),
+        (serialization.results, schemas.Result, models.Result),
+    ]
+)
+def test_rows_encoded_as_schema(session, serializer, schema, table):
+    rows = session.execute(select(*table.__table__.columns)).all()
+    record = session.scalars(select(table)).one()
+    expected = schema(**record.__dict__).model_dump_json(by_alias=True)
+
+    assert orjson.dumps(serializer.rows(rows)[0]) == expected.encode()
+    assert orjson.dumps(serializer.record(record)) == expected.encode()
+
+
+def test_stored_data_not_parsed(session):
+    rows = session.execute(select(*models.Result.__table__.columns)).all()
+    result = json.loads(orjson.dumps(serialization.results.rows(rows)))[0]
+    assert result["data"] == RESULT["data"]
@@ -0,0 +1,102 @@
+"""
+Longest wait of a writer process while the cleaner deletes the expired results. The results are deleted
+with one statement and in chunks by the ID ranges, the writer inserts a result every few milliseconds
+and measures how long every insert waits for the write lock.
+
+Run from the agent folder: python -m code_tests.database.benchmark_cleaner [--results 1000000] [--chunk-size 10000]
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from sqlalchemy import insert
+
+import database.connection as connection
+import database.models.all as models
+from database.daoaggregator import DAOAggregator
+from main_modules import cleaner
+from utils import enums
+
+WRITE_INTERVAL = 0.005  # s
+BATCH_SIZE = 10000
+
+
+def create_result(finished: float) -> dict:
+    return {
+        "fk_tests": 1, "version": 1, "planned": finished, "started": finished, "finished": finished,
+        "status": enums.ResultStatus.success, "recovery_attempt": 0, "data": '{"value": 1}',
+    }
+
+
+def prepare_database(file: Path, results_count: int) -> None:
+    engine = connection.create_sqlite_engine(file)
+    connection.Base.metadata.create_all(engine)
+    with engine.begin() as db_connection:
+        for i in range(0, results_count, BATCH_SIZE):
+            batch = [create_result(0) for _ in range(min(BATCH_SIZE, results_count - i))]
+            db_connection.execute(insert(models.Result), batch)
+    engine.dispose()
+
+
+def write_results(file: Path, stop: multiprocessing.Event, waits: multiprocessing.Queue) -> None:
+    engine = connection.create_sqlite_engine(file)
+    longest_wait = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        with engine.begin() as db_connection:
+            db_connection.execute(insert(models.Result), [create_result(time.time())])
+        longest_wait = max(longest_wait, time.perf_counter() - started)
+        time.sleep(WRITE_INTERVAL)
+    engine.dispose()
+    waits.put(longest_wait)
+
+
+def delete_results(file: Path, chunk_size: int) -> Iterator[int]:
+    engine = connection.create_sqlite_engine(file)
+    connection.Session.configure(bind=engine)
+    db = DAOAggregator()
+    if chunk_size:
+        for deleted_rows in db.results.delete_old_records_in_chunks(1, chunk_size):
+            yield deleted_rows
+            time.sleep(cleaner.DEFAULT_CHUNK_PAUSE)
+    else:
+        yield db.results.delete_old_records(1)
+    db.close()
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+def measure(results_count: int, chunk_size: int) -> Tuple[int, float, float]:
+    with tempfile.TemporaryDirectory() as folder:
+        file = Path(folder) / "cleaner.db"
+        prepare_database(file, results_count)
+        stop = multiprocessing.Event()
+        waits = multiprocessing.Queue()
+        writer = multiprocessing.Process(target=write_results, args=(file, stop, waits))
+        writer.start()
+        time.sleep(0.5)
+        started = time.perf_counter()
+        deleted_rows = sum(delete_results(file, chunk_size))
+        duration = time.perf_counter() - started
+        stop.set()
+        longest_wait = waits.get()
+        writer.join()
+    return deleted_rows, duration, longest_wait
+
+
+def main(results_count: int, chunk_size: int) -> None:
+    print(f"{'variant':>9s} | {'rows/s':>9s} | {'longest write wait [s]':>22s}")
+    for name, size in (("statement", 0), ("chunks", chunk_size)):
+        deleted_rows, duration, longest_wait = measure(results_count, size)
+        print(f"{name:>9s} | {deleted_rows / duration:9.0f} | {longest_wait:22.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    arguments = parser.parse_args()
+    main(arguments.results, arguments.chunk_size)
@@ -0,0 +1,98 @@
+"""
+Cost of writing N rows through the generic DAO, one statement per row (create, update, delete) compared with
+the bulk variants (create_many, update_many, delete_by_ids). The database is a temporary SQLite file.
+
+Run from the agent folder: python -m code_tests.database.benchmark_generic [--rows 1000 10000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, insert
+
+import database.connection as connection
+import database.models.all as models
+from database.daoaggregator import DAOAggregator
+from utils import enums
+
+
+def prepare_database(database_file: Path):
+    engine = create_engine(f"sqlite:///{database_file}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), [{
+            "id_test": 1, "name": "test", "description": "benchmark", "state": enums.TestState.enabled,
+            "created": time.time(), "test_params": "{}", "timeout": 60, "key_ro": "RO", "key_rw": "RW",
+        }])
+    return engine
+
+
+def new_runs(rows: int) -> List[Dict]:
+    return [
+        {"id_test": 1, "version": 1, "state": enums.RunState.waiting, "planned": time.time(), "recovery_attempt": 0}
+        for _ in range(rows)
+    ]
+
+
+def single_rows(db: DAOAggregator, rows: int) -> Dict[str, float]:
+    measured = {}
+    started = time.perf_counter()
+    run_ids = [db.runs.create(**run).id_run for run in new_runs(rows)]
+    measured["insert"] = time.perf_counter() - started
+    started = time.perf_counter()
+    for run_id in run_ids:
+        db.runs.update(run_id, 1, 100, enums.RunState.running, time.time(), time.time() + 60)
+    measured["update"] = time.perf_counter() - started
+    started = time.perf_counter()
+    for run_id in run_ids:
+        db.runs.delete(run_id)
+    measured["delete"] = time.perf_counter() - started
+    return measured
+
+
+def bulk(db: DAOAggregator, rows: int) -> Dict[str, float]:
+    measured = {}
+    started = time.perf_counter()
+    run_ids = db.runs.create_many_returning_ids(new_runs(rows))
+    measured["insert"] = time.perf_counter() - started
+    started = time.perf_counter()
+    db.runs.update_many([
+        {"id_run": run_id, "version": 1, "pid": 100, "state": enums.RunState.running, "started": time.time(),
+         "deadline": time.time() + 60}
+        for run_id in run_ids
+    ])
+    measured["update"] = time.perf_counter() - started
+    started = time.perf_counter()
+    db.runs.delete_by_ids(run_ids)
+    measured["delete"] = time.perf_counter() - started
+    return measured
+
+
+def measure(function: Callable[[DAOAggregator, int], Dict[str, float]], rows: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as folder:
+        engine = prepare_database(Path(folder) / "benchmark.db")
+        db = DAOAggregator()
+        measured = function(db, rows)
+        db.close()
+        engine.dispose()
+    return measured
+
+
+def main(rows_counts: List[int]) -> None:
+    print(f"{'rows':>6s} | {'operation':>9s} | {'single [s]':>10s} | {'bulk [s]':>8s} | {'speed-up':>8s}")
+    for rows in rows_counts:
+        single_measured = measure(single_rows, rows)
+        bulk_measured = measure(bulk, rows)
+        for operation in ("insert", "update", "delete"):
+            single_time, bulk_time = single_measured[operation], bulk_measured[operation]
+            print(f"{rows:6d} | {operation:>9s} | {single_time:10.3f} | {bulk_time:8.3f} | {single_time / bulk_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    arguments = parser.parse_args()
+    main(arguments.rows)
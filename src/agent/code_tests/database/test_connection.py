@@ -0,0 +1,78 @@
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import database.connection as connection
+from utils.exceptions import GlobalError
+
+
+def test_create_sqlite_engine(tmp_path):
+    engine = connection.create_sqlite_engine(tmp_path / "test.db", busy_timeout=1234, mmap_size=2**20)
+    with engine.connect() as db_connection:
+        assert db_connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert db_connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert db_connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+    engine.dispose()
+
+
+def test_optimize_database(tmp_path, monkeypatch):
+    engine = connection.create_sqlite_engine(tmp_path / "test.db")
+    monkeypatch.setattr(connection, "engine", engine)
+    with engine.begin() as db_connection:
+        db_connection.exec_driver_sql("CREATE TABLE records (data TEXT)")
+        db_connection.exec_driver_sql(
+            "WITH RECURSIVE ids(id) AS (SELECT 1 UNION ALL SELECT id + 1 FROM ids WHERE id < 1000) "
+            "INSERT INTO records SELECT hex(randomblob(500)) FROM ids"
+        )
+        db_connection.exec_driver_sql("DELETE FROM records")
+    with patch("time.sleep") as mock_sleep:
+        connection.optimize_database(time.monotonic() + 60, vacuum_pages=50)
+    with engine.connect() as db_connection:
+        assert db_connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2  # INCREMENTAL
+        assert db_connection.exec_driver_sql("PRAGMA freelist_count").scalar() == 0
+    assert mock_sleep.call_count > 1  # released in several steps
+    engine.dispose()
+
+
+def test_optimize_database_deadline(tmp_path, monkeypatch):
+    engine = connection.create_sqlite_engine(tmp_path / "test.db")
+    monkeypatch.setattr(connection, "engine", engine)
+    with engine.begin() as db_connection:
+        db_connection.exec_driver_sql("CREATE TABLE records (data TEXT)")
+        db_connection.exec_driver_sql("INSERT INTO records VALUES (hex(randomblob(100000)))")
+        db_connection.exec_driver_sql("DELETE FROM records")
+    connection.optimize_database(time.monotonic())
+    with engine.connect() as db_connection:
+        assert db_connection.exec_driver_sql("PRAGMA freelist_count").scalar() > 0  # released in the next run
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "options, create_function, expected_args",
+    [
+        ({}, "create_sqlite_engine", (connection.DATABASE_FILE, connection.SQLITE_BUSY_TIMEOUT, connection.SQLITE_MMAP_SIZE)),
+        ({"type": "sqlite", "sqlite_file": Path("other.db"), "sqlite_busy_timeout_int": 10}, "create_sqlite_engine",
+         (Path("other.db"), 10, connection.SQLITE_MMAP_SIZE)),
+        ({"type": "postgresql", "ip": "10.0.0.1", "port": 5432, "username": "user", "password": "pass", "database": "db",
+          "pool_size_int": 20}, "create_postgresql_engine",
+         ("10.0.0.1", 5432, "user", "pass", "db", 20, connection.POSTGRESQL_MAX_OVERFLOW,
+          connection.POSTGRESQL_POOL_RECYCLE, connection.POSTGRESQL_PREPARE_THRESHOLD)),
+    ]
+)
+def test_create_engine_from_config(options, create_function, expected_args):
+    with patch("utils.configuration.config.exists", side_effect=lambda section, option: option in options):
+        with patch("utils.configuration.config.get", side_effect=lambda section, option, required=False: options[option]):
+            with patch(f"database.connection.{create_function}") as mock_create_function:
+                connection.create_engine_from_config()
+    mock_create_function.assert_called_once_with(*expected_args)
+
+
+def test_create_engine_from_config_unknown_type():
+    with patch("utils.configuration.config.exists", return_value=True):
+        with patch("utils.configuration.config.get", return_value="oracle"):
+            with patch("utils.logs.critical", side_effect=GlobalError) as mock_logs_critical:
+                with pytest.raises(GlobalError):
+                    connection.create_engine_from_config()
+    mock_logs_critical.assert_called_once()
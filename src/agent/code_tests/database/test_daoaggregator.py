@@ -0,0 +1,45 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from database import daoaggregator
+
+
+@pytest.mark.asyncio
+async def test_run_in_db_thread():
+    result = await daoaggregator.run_in_db_thread(lambda x, y: (x + y, threading.current_thread()), 1, 2)
+    assert result[0] == 3
+    assert result[1] is not threading.current_thread()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("exception", [None, ValueError])
+async def test_get_dao_aggregator_closes_session(exception):
+    mock_db = MagicMock()
+    with patch("database.daoaggregator.DAOAggregator", return_value=mock_db):
+        dependency = daoaggregator.get_dao_aggregator()
+        assert await dependency.__anext__() is mock_db
+        mock_db.close.assert_not_called()
+        if exception is None:
+            with pytest.raises(StopAsyncIteration):
+                await dependency.__anext__()
+        else:
+            with pytest.raises(exception):
+                await dependency.athrow(exception())
+    mock_db.close.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "option_exists, expected_threads",
+    [
+        (False, daoaggregator.DB_THREADS),
+        (True, 3),
+    ]
+)
+def test_setup_db_threads(option_exists, expected_threads):
+    with patch("utils.configuration.config.exists", return_value=option_exists):
+        with patch("utils.configuration.config.get", return_value=3):
+            daoaggregator.setup_db_threads()
+    assert daoaggregator.db_threads.total_tokens == expected_threads
+    daoaggregator.db_threads.total_tokens = daoaggregator.DB_THREADS
@@ -0,0 +1,154 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+import database.connection as connection
+import database.models.all as models
+from database.dao import generic
+from database.daoaggregator import DAOAggregator
+from utils import enums
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'generic.db'}")
+    connection.Base.metadata.create_all(engine)
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), [{
+            "id_test": 1, "name": "test", "description": "", "state": enums.TestState.enabled, "created": 0,
+            "test_params": "{}", "timeout": 60, "key_ro": "RO", "key_rw": "RW",
+        }])
+    connection.Session.configure(bind=engine)
+    db = DAOAggregator()
+    yield db
+    db.close()
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+def create_runs(db: DAOAggregator, count: int):
+    runs = [
+        {"id_test": 1, "version": 1, "state": enums.RunState.waiting, "planned": i, "recovery_attempt": 0}
+        for i in range(count)
+    ]
+    return db.runs.create_many_returning_ids(runs)
+
+
+def test_create_many_returning_ids(db):
+    run_ids = create_runs(db, 5)
+    assert len(set(run_ids)) == 5
+    # the IDs are in the order of the created runs
+    assert [db.runs.get_by_id(run_id).planned for run_id in run_ids] == [0, 1, 2, 3, 4]
+    assert create_runs(db, 0) == []
+
+
+def test_update_many(db):
+    run_ids = create_runs(db, 3)
+    now = time.time()
+    changes = [
+        {"id_run": run_id, "pid": 100 + i, "state": enums.RunState.running, "started": now, "deadline": now + i}
+        for i, run_id in enumerate(run_ids[:2])
+    ]
+    assert db.runs.update_many(changes) == 2
+    runs = {run.id_run: run for run in db.runs.get_all_by_ids(run_ids)}
+    assert [runs[run_id].pid for run_id in run_ids] == [100, 101, None]
+    assert [runs[run_id].state for run_id in run_ids] == [enums.RunState.running] * 2 + [enums.RunState.waiting]
+
+
+def test_update_many_deleted_record(db):
+    # the run can be deleted by the results drain before its start is stored
+    run_ids = create_runs(db, 2)
+    db.runs.delete_by_ids(run_ids[:1])
+    assert db.runs.update_many([{"id_run": run_id, "pid": 100} for run_id in run_ids]) == 1
+    assert db.runs.get_by_id(run_ids[1]).pid == 100
+
+
+@pytest.mark.parametrize("chunk_size", [2, 100])
+def test_delete_by_ids(db, chunk_size):
+    run_ids = create_runs(db, 5)
+    with patch("database.dao.generic.IDS_CHUNK_SIZE", chunk_size):
+        assert db.runs.delete_by_ids(run_ids[:3] + [12345]) == 3
+        assert db.runs.delete_by_ids(run_ids[3:], transaction_finished=False) is None
+        db.rollback()
+    assert [run.id_run for run in db.runs.get_all_by_state(enums.RunState.waiting)] == run_ids[3:]
+
+
+@pytest.mark.parametrize(
+    "threshold, chunk_size, expected_chunks",
+    [
+        (3, 2, [2, 1]),
+        (5, 10, [5]),
+        (0, 2, []),
+    ]
+)
+def test_delete_old_records_in_chunks(db, threshold, chunk_size, expected_chunks):
+    run_ids = create_runs(db, 5)
+    assert list(db.runs.delete_old_records_in_chunks(threshold, chunk_size)) == expected_chunks
+    assert [run.id_run for run in db.runs.get_all_by_state(enums.RunState.waiting)] == run_ids[threshold:]
+
+
+@pytest.mark.parametrize(
+    "since_id, until_id, limit, expected",
+    [
+        (0, None, None, [1, 2, 3, 4, 5]),
+        (2, None, None, [3, 4, 5]),
+        (0, 3, None, [1, 2, 3]),
+        (1, 4, 2, [2, 3]),
+        (5, None, None, []),
+    ]
+)
+def test_results_iterate_in_id_range(db, since_id, until_id, limit, expected):
+    db.results.create_many([
+        {"id_test": 1, "version": 1, "planned": 0, "started": 0, "finished": 0, "status": enums.ResultStatus.success,
+         "recovery_attempt": 0, "data": f'{{"value": {i}}}'}
+        for i in range(5)
+    ])
+    with patch("database.dao.generic.STREAM_CHUNK_SIZE", 2):
+        rows = list(db.results.iterate_in_id_range(1, since_id, until_id, limit))
+    assert [row.id_result for row in rows] == expected
+    assert all(row.data == f'{{"value": {row.id_result - 1}}}' for row in rows)
+
+
+def test_nonces_create_many_and_delete(db):
+    assert db.nonces.create_many([{"nonce": "a", "used_at": 1}, {"nonce": "b", "used_at": 2}]) == 2
+    assert db.nonces.delete_by_nonces(["a", "c"]) == 1
+    assert db.nonces.count_records_in_table().counter == 1
+
+
+def test_orchestrators_update_last_seen_many_keeps_newer_time(db):
+    db.orchestrators.create_or_update("first", 100)
+    db.orchestrators.create_or_update("second", 100)
+    assert db.orchestrators.update_last_seen_many({"first": 200, "second": 50}) == 1
+    last_seen = {orchestrator.name: orchestrator.last_seen for orchestrator in db.orchestrators.get_all()}
+    assert last_seen == {"first": 200, "second": 100}
+
+
+def test_label_dao_methods():
+    with patch("utils.metrics.enabled", return_value=False):
+        class Dummy(generic.Generic):
+            def create(self):
+                pass
+
+    # the methods are wrapped only for the metrics
+    assert not hasattr(Dummy.create, "dao_method")
+    generic.label_dao_methods(Dummy)
+    generic.label_dao_methods(Dummy)  # already labelled, nothing happens
+    assert Dummy.create.dao_method == "Dummy.create"
+    assert Dummy.create.unlabelled.__qualname__.endswith("Dummy.create")
+    assert Dummy.delete_old_records_in_chunks.dao_method == "Dummy.delete_old_records_in_chunks"  # inherited
+    assert generic.Generic.delete_old_records_in_chunks.__qualname__ == "Generic.delete_old_records_in_chunks"
+
+
+def test_statement_metrics_per_dao_method(db):
+    generic.label_dao_methods()
+    run_ids = create_runs(db, 3)
+    with patch("utils.metrics.enabled", return_value=True):
+        with patch("utils.metrics.observe") as mock_observe:
+            db.runs.get_all_by_ids(run_ids)
+            list(db.runs.delete_old_records_in_chunks(10, 2))  # the statements run during the iteration
+    methods = [call.kwargs["method"] for call in mock_observe.call_args_list]
+    assert methods[0] == "Runs.get_all_by_ids"
+    assert set(methods[1:]) == {"Runs.delete_old_records_in_chunks"}
+    assert db.runs._dao_method is None
@@ -0,0 +1,101 @@
+from typing import List, Tuple
+
+import pytest
+from sqlalchemy import create_engine, event, insert, inspect, select, text
+
+import database.connection as connection
+import database.init as database_init
+import database.models.all as models
+from database.daoaggregator import DAOAggregator
+from main_modules.deadline_tracker import TRACKED_STATES
+from utils import enums
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indexes.db'}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    yield engine
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+def capture_statements(engine) -> List[Tuple[str, tuple]]:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE", "UPDATE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+@pytest.mark.parametrize(
+    "dao, method, args, table, index",
+    [
+        ("runs", "get_all_by_state_and_deadline", (enums.RunState.running, 10), "runs", "ix_runs_state_deadline"),
+        ("runs", "get_all_by_states", (TRACKED_STATES,), "runs", "ix_runs_state_deadline"),
+        ("runs", "get_test_ids_by_state", (enums.RunState.waiting,), "runs", "ix_runs_state_deadline"),
+        ("runs", "get_all_by_test_id", (1,), "runs", "ix_runs_fk_tests"),
+        ("results", "get_all_since_id", (1, 10), "results", "ix_results_fk_tests_id_result"),
+        ("results", "get_all_in_id_range", (1, 10, 20), "results", "ix_results_fk_tests_id_result"),
+        ("results", "get_all_in_id_range_for_tests", ([1, 2], 10, 20), "results", "ix_results_fk_tests_id_result"),
+        ("multi_results", "get_test_ids", (1,), "multi_result_tests", "sqlite_autoindex_multi_result_tests_1"),
+        ("results", "delete_old_records", (10,), "results", "ix_results_finished"),
+        ("events", "get_all_until_run_threshold", (10,), "events", "ix_events_run_at"),
+        ("events", "get_all_with_tests_until_run_threshold", (10,), "events", "ix_events_run_at"),
+        ("events", "delete_all_by_test_ids", ([1, 2],), "events", "ix_events_fk_tests"),
+        ("requests", "get_all_by_test_id", (1,), "requests", "ix_requests_fk_tests"),
+        ("nonces", "get_by_nonce", ("nonce",), "nonces", "sqlite_autoindex_nonces_1"),
+        ("nonces", "delete_old_records", (10,), "nonces", "ix_nonces_used_at"),
+    ]
+)
+def test_hot_queries_use_indexes(engine, dao, method, args, table, index):
+    statements = capture_statements(engine)
+    db = DAOAggregator()
+    getattr(getattr(db, dao), method)(*args)
+    db.close()
+
+    assert len(statements)
+    with engine.connect() as db_connection:
+        for statement, parameters in statements:
+            plan = [row.detail for row in db_connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            assert not any(detail.startswith(f"SCAN {table}") for detail in plan), plan
+            assert any(f"INDEX {index} " in f"{detail} " for detail in plan), plan
+
+
+def test_migrate_database(engine, monkeypatch):
+    monkeypatch.setattr(connection, "engine", engine)
+    # the baseline schema without the indexes and the version table
+    for table in connection.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(engine)
+    models.SchemaVersion.__table__.drop(engine)
+    models.MultiResultTest.__table__.drop(engine)
+    with engine.begin() as db_connection:
+        db_connection.execute(text("ALTER TABLE multi_results ADD COLUMN test_ids VARCHAR NOT NULL DEFAULT ''"))
+        db_connection.execute(text(
+            "INSERT INTO multi_results (orchestrator_name, test_ids, key) VALUES ('first', '3,1,2,3', 'KEY'), ('second', '', 'KEY')"
+        ))
+        db_connection.execute(insert(models.Test), [  # the test 2 was deleted
+            {"id_test": id_test, "name": "test", "description": "", "state": enums.TestState.enabled, "created": 1,
+             "test_params": "{}", "timeout": 60, "key_ro": "RO", "key_rw": "RW"}
+            for id_test in (1, 3)
+        ])
+        db_connection.execute(insert(models.Nonce).values(nonce="kept", used_at=1))
+
+    database_init.migrate_database()
+    database_init.migrate_database()  # already migrated, nothing happens
+
+    assert {i["name"] for i in inspect(engine).get_indexes("runs")} == {"ix_runs_state_deadline", "ix_runs_fk_tests"}
+    with engine.connect() as db_connection:
+        assert database_init.get_schema_version(db_connection) == database_init.SCHEMA_VERSION
+        assert [row.version for row in db_connection.execute(models.SchemaVersion.__table__.select())] == [2, 3]
+        memberships = db_connection.execute(select(models.MultiResultTest.fk_multi_results, models.MultiResultTest.fk_tests))
+        assert memberships.all() == [(1, 3), (1, 1)]
+    assert "test_ids" not in {column["name"] for column in inspect(engine).get_columns("multi_results")}
+    db = DAOAggregator()
+    assert db.nonces.count_records_in_table().counter == 1  # the data are kept
+    db.close()
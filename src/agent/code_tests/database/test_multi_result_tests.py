@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import create_engine, insert
+
+import api.schemas.all as schemas
+import database.connection as connection
+import database.models.all as models
+from database.daoaggregator import DAOAggregator
+from utils import enums
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'multi_results.db'}")
+    connection.Base.metadata.create_all(engine)
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), [
+            {"id_test": id_test, "name": "test", "description": "", "state": enums.TestState.enabled, "created": 1,
+             "test_params": "{}", "timeout": 60, "key_ro": "RO", "key_rw": "RW", "last_downloaded_time": downloaded}
+            for id_test, downloaded in ((1, 10), (2, 10), (3, 30))
+        ])
+    connection.Session.configure(bind=engine)
+    db = DAOAggregator()
+    yield db
+    db.close()
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+def test_MultiResults_tests(db):
+    first = db.multi_results.create("first", schemas.MultiResultCreate(key="KEY"))
+    second = db.multi_results.create("second", schemas.MultiResultCreate(key="KEY"))
+    for id_test in (3, 1, 2):
+        db.multi_results.add_test(first.id_multi_result, id_test)
+    db.multi_results.add_test(second.id_multi_result, 1)
+
+    # the tests are kept in the order in which they were added
+    assert db.multi_results.get_test_ids(first.id_multi_result) == [3, 1, 2]
+    assert db.multi_results.get_test_ids(second.id_multi_result) == [1]
+
+    assert db.multi_results.delete_by_orchestrator("first") == 1
+    assert db.multi_results.get_test_ids(first.id_multi_result) == []
+    assert db.multi_results.get_test_ids(second.id_multi_result) == [1]
+
+
+def test_MultiResults_delete_old_records(db):
+    old = db.multi_results.create("old", schemas.MultiResultCreate(key="KEY"), last_used_time=10)
+    new = db.multi_results.create("new", schemas.MultiResultCreate(key="KEY"), last_used_time=30)
+    db.multi_results.add_test(old.id_multi_result, 1)
+    db.multi_results.add_test(new.id_multi_result, 1)
+    db.multi_results.add_test(new.id_multi_result, 3)
+    db.multi_results.add_test(new.id_multi_result, 4)  # the test was already deleted
+
+    assert db.multi_results.delete_old_records(20) == 1
+    assert db.multi_results.get_test_ids(old.id_multi_result) == []
+    assert db.multi_results.get_test_ids(new.id_multi_result) == [1, 3]
+
+
+def test_Tests_delete_old_records(db):
+    multi_result = db.multi_results.create("first", schemas.MultiResultCreate(key="KEY"))
+    for id_test in (3, 1, 2):
+        db.multi_results.add_test(multi_result.id_multi_result, id_test)
+
+    assert db.tests.delete_old_records(20) == 2
+    assert db.multi_results.get_test_ids(multi_result.id_multi_result) == [3]
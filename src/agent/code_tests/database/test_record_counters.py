@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine
+
+import database.connection as connection
+from database.daoaggregator import DAOAggregator
+from utils import enums
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'record_counters.db'}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    db = DAOAggregator()
+    yield db
+    db.close()
+    connection.Session.configure(bind=connection.engine)
+    engine.dispose()
+
+
+def create_runs(db: DAOAggregator, count: int, state: enums.RunState):
+    runs = [{"id_test": 1, "version": 1, "state": state, "planned": i, "recovery_attempt": 0} for i in range(count)]
+    return db.runs.create_many_returning_ids(runs)
+
+
+def test_count_records_in_table_by_category(db):
+    create_runs(db, 2, enums.RunState.waiting)
+    create_runs(db, 1, enums.RunState.running)
+    counts = dict(db.runs.count_records_in_table().iterate())
+    assert counts[enums.RunState.waiting] == 2
+    assert counts[enums.RunState.running] == 1
+    assert counts["all"] == 3
+    assert len(counts) == len(enums.RunState) + 1  # the empty categories are counted too
+
+
+def test_RecordCounters_follow_changes(db):
+    waiting_ids = create_runs(db, 3, enums.RunState.waiting)  # counted when the counting starts
+    db.nonces.create("first", 1.0)
+    db.record_counters.update_counted_tables([db.runs, db.nonces])
+    assert db.record_counters.get_counted_tables() == {"runs", "nonces"}
+
+    create_runs(db, 2, enums.RunState.running)
+    db.runs.update_state(waiting_ids[0], enums.RunState.running, 100.0)
+    db.runs.delete_by_ids(waiting_ids[1:2])
+    db.nonces.create_many([{"nonce": "second", "used_at": 2.0}, {"nonce": "third", "used_at": 3.0}])
+    db.nonces.delete_old_records(2)
+
+    for sub_db in (db.runs, db.nonces):
+        counted = list(db.record_counters.get_records_counter(sub_db).iterate())
+        assert counted == list(sub_db.count_records_in_table().iterate())
+
+    db.record_counters.update_counted_tables([db.nonces])
+    assert db.record_counters.get_counted_tables() == {"nonces"}
+    assert db.record_counters.get_records_counter(db.runs).categories[enums.RunState.running] == 0
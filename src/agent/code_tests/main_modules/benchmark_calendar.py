@@ -0,0 +1,85 @@
+"""
+Cost of one calendar tick when many events are due at the same time, for the per-event and the batched processing.
+The database is a temporary SQLite file, debug logging is muted so only the database work is measured.
+
+Run from the agent folder: python -m code_tests.main_modules.benchmark_calendar [--events 1000 10000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, insert, select, func
+
+import database.connection as connection
+import database.models.all as models
+from main_modules import calendar
+from utils import enums
+
+
+def mute(*args, **kwargs) -> None:
+    pass
+
+
+def prepare_database(database_file: Path, events_count: int):
+    engine = create_engine(f"sqlite:///{database_file}")
+    connection.Base.metadata.create_all(engine)
+    connection.Session.configure(bind=engine)
+    now = time.time()
+    tests = [
+        {
+            "id_test": i,
+            "name": f"test {i}",
+            "description": "benchmark",
+            "state": enums.TestState.enabled,
+            "created": now,
+            "test_params": "{}",
+            "timeout": 60,
+            "scheduling_interval": 60,
+            "key_ro": "RO",
+            "key_rw": "RW",
+        }
+        for i in range(1, events_count + 1)
+    ]
+    events = [
+        {"fk_tests": i, "run_at": now - 1, "source": enums.EventSource.calendar, "recovery_attempt": 0}
+        for i in range(1, events_count + 1)
+    ]
+    with engine.begin() as db_connection:
+        db_connection.execute(insert(models.Test), tests)
+        db_connection.execute(insert(models.Event), events)
+    return engine
+
+
+def measure_tick(events_count: int, batch_processing: bool) -> float:
+    with tempfile.TemporaryDirectory() as folder:
+        engine = prepare_database(Path(folder) / "benchmark.db", events_count)
+        with patch("main_modules.calendar.is_batch_processing_enabled", return_value=batch_processing):
+            with patch("utils.logs.debug", new=mute), patch("utils.logs.warning", new=mute):
+                started = time.perf_counter()
+                calendar.process_events()
+                duration = time.perf_counter() - started
+        with engine.connect() as db_connection:
+            runs_count = db_connection.execute(select(func.count()).select_from(models.Run)).scalar()
+        if runs_count != events_count:
+            raise RuntimeError(f"Expected {events_count} runs, the calendar created {runs_count}.")
+        engine.dispose()
+    return duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calendar tick benchmark.")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'events':>8s} | {'mode':>9s} | {'tick [s]':>9s} | {'per event [ms]':>14s}")
+    for events_count in args.events:
+        for batch_processing in (False, True):
+            duration = measure_tick(events_count, batch_processing)
+            mode = "batched" if batch_processing else "per-event"
+            print(f"{events_count:8d} | {mode:>9s} | {duration:9.3f} | {duration / events_count * 1000:14.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
 from pathlib import Path
-from code_tests.timeout import function_timeout, TimeoutException
 from main_modules import calendar
 import pytest
 from unittest.mock import patch, MagicMock
-from utils import enums
+from utils import enums, wakeup
 import api.schemas.all as schemas
 
 
@@ -230,7 +229,7 @@ def test_RequestsForNewEvents_process_update_request(mock_db, mock_test, mock_re
         processor._process_update_request(mock_request, mock_test)
 
     if delete_planned_events:
-        mock_db.events.delete.assert_called_once_with(1)
+        mock_db.events.delete_all_by_test_ids.assert_called_once_with([1])
 
     if plan_new_event:
         mock_process_new_request.assert_called_once()
@@ -354,32 +353,221 @@ def test_PlannedEvents_start_a_new_run(mock_db, mock_test, mock_event, run_at, t
                                                     transaction_finished)
 
 
-def test_process_events():
-    with patch.object(calendar.RequestsForNewEvents, "process_all_requests", return_value=None) as mock_new_events:
-        with patch.object(calendar.PlannedEvents, "process_all_events", return_value=None) as mock_planned_events:
-            calendar.process_events()
+@pytest.mark.parametrize(
+    "states, reasons, created_events, tests_without_events",
+    [
+        ([], [], 0, []),
+        ([enums.TestState.enabled], [enums.RequestReason.new], 1, []),
+        ([enums.TestState.disabled], [enums.RequestReason.new], 0, []),
+        ([enums.TestState.disabled], [enums.RequestReason.update], 0, [1]),
+        ([enums.TestState.enabled, enums.TestState.deleted], [enums.RequestReason.new, enums.RequestReason.update], 1, [2]),
+        ([enums.TestState.enabled] * 3, [enums.RequestReason.new] * 3, 3, []),
+    ]
+)
+def test_BatchedRequestsForNewEvents_process_all_requests(mock_db, states, reasons, created_events, tests_without_events):
+    requests, tests = [], []
+    for i, (state, reason) in enumerate(zip(states, reasons), start=1):
+        requests.append(MagicMock(id_request=10 + i, id_test=i, reason=reason))
+        tests.append(MagicMock(id_test=i, state=state, scheduling_from=None, scheduling_interval=10, scheduling_until=None))
+    mock_db.requests.get_all_with_tests.return_value = list(zip(requests, tests))
+    queue = calendar.PlannedEventsQueue()
+
+    with patch("main_modules.calendar.planned_events_queue", queue):
+        processor = calendar.BatchedRequestsForNewEvents(mock_db)
+        processor.process_all_requests()
+
+    mock_db.tests.get_by_id.assert_not_called()
+    mock_db.events.create.assert_not_called()
+    if not requests:
+        mock_db.requests.delete_by_ids.assert_not_called()
+        return
+    if created_events:
+        assert len(mock_db.events.create_many.call_args.args[0]) == created_events
+    else:
+        mock_db.events.create_many.assert_not_called()
+    assert len(queue) == created_events
+    if tests_without_events:
+        mock_db.events.delete_all_by_test_ids.assert_called_once_with(tests_without_events, transaction_finished=False)
+    else:
+        mock_db.events.delete_all_by_test_ids.assert_not_called()
+    mock_db.requests.delete_by_ids.assert_called_once_with([r.id_request for r in requests], transaction_finished=True)
+
+
+@pytest.mark.parametrize(
+    "events_count, waiting_tests, created_runs",
+    [
+        (0, set(), 0),
+        (1, set(), 1),
+        (5, set(), 5),
+        (5, {1, 3}, 3),  # tests with a waiting run don't get another one
+    ]
+)
+def test_BatchedPlannedEvents_process_all_events(mock_db, events_count, waiting_tests, created_runs):
+    events, tests = [], []
+    for i in range(1, events_count + 1):
+        events.append(MagicMock(id_event=100 + i, id_test=i, run_at=1000, source=enums.EventSource.calendar, recovery_attempt=0))
+        tests.append(MagicMock(id_test=i, version=1, state=enums.TestState.enabled, scheduling_interval=10, scheduling_until=None))
+    mock_db.events.get_all_with_tests_until_run_threshold.return_value = list(zip(events, tests))
+    mock_db.runs.get_test_ids_by_state.return_value = set(waiting_tests)
+
+    with patch("main_modules.calendar.planned_events_queue", calendar.PlannedEventsQueue()):
+        processor = calendar.BatchedPlannedEvents(mock_db)
+        processor.process_all_events()
+
+    mock_db.runs.create.assert_not_called()
+    mock_db.events.delete.assert_not_called()
+    if not events_count:
+        mock_db.runs.create_many.assert_not_called()
+        return
+    runs = mock_db.runs.create_many.call_args.args[0]
+    assert len(runs) == created_runs
+    assert all(run["state"] == enums.RunState.waiting for run in runs)
+    # every processed event plans the next one
+    assert len(mock_db.events.create_many.call_args.args[0]) == events_count
+    mock_db.events.delete_by_ids.assert_called_once_with([e.id_event for e in events], transaction_finished=True)
+
+
+def test_BatchedPlannedEvents_one_run_per_test(mock_db, mock_test, mock_event):
+    mock_test.scheduling_interval = None
+    mock_db.events.get_all_with_tests_until_run_threshold.return_value = [(mock_event, mock_test), (mock_event, mock_test)]
+    mock_db.runs.get_test_ids_by_state.return_value = set()
+
+    with patch("main_modules.calendar.planned_events_queue", calendar.PlannedEventsQueue()):
+        with patch("utils.logs.warning") as mock_logs_warning:
+            processor = calendar.BatchedPlannedEvents(mock_db)
+            processor.process_all_events()
+
+    assert len(mock_db.runs.create_many.call_args.args[0]) == 1
+    mock_logs_warning.assert_called_once()
+
+
+@pytest.mark.parametrize("process_planned_events", [True, False])
+@pytest.mark.parametrize(
+    "batch_processing, requests_processor, events_processor",
+    [
+        (False, calendar.RequestsForNewEvents, calendar.PlannedEvents),
+        (True, calendar.BatchedRequestsForNewEvents, calendar.BatchedPlannedEvents),
+    ]
+)
+def test_process_events(process_planned_events, batch_processing, requests_processor, events_processor):
+    with patch("main_modules.calendar.is_batch_processing_enabled", return_value=batch_processing):
+        with patch.object(requests_processor, "process_all_requests", return_value=None) as mock_new_events:
+            with patch.object(events_processor, "process_all_events", return_value=None) as mock_planned_events:
+                calendar.process_events(process_planned_events)
     mock_new_events.assert_called_once()
-    mock_planned_events.assert_called_once()
+    assert mock_planned_events.call_count == int(process_planned_events)
+
+
+@pytest.mark.parametrize(
+    "run_times, now, due_events, remaining",
+    [
+        ([], 1000, 0, 0),
+        ([1001, 1002], 1000, 0, 2),
+        ([1000, 999, 1001], 1000, 2, 1),  # events exactly at the current time are due
+        ([5, 3, 4], 1000, 3, 0),
+    ]
+)
+def test_PlannedEventsQueue_pop_due(run_times, now, due_events, remaining):
+    queue = calendar.PlannedEventsQueue()
+    for run_at in run_times:
+        queue.push(run_at)
+    assert queue.pop_due(now) == due_events
+    assert len(queue) == remaining
+
+
+@pytest.mark.parametrize(
+    "run_times, now, max_sleep, expected_result",
+    [
+        ([], 1000, 1.0, 1.0),  # nothing planned, sleeping the maximum time
+        ([1000.25], 1000, 1.0, 0.25),
+        ([1005, 1000.5], 1000, 1.0, 0.5),
+        ([1005], 1000, 1.0, 1.0),  # sleep is limited by the maximum time
+        ([990], 1000, 1.0, 0.0),  # overdue event, not sleeping at all
+    ]
+)
+def test_PlannedEventsQueue_seconds_until_next_event(run_times, now, max_sleep, expected_result):
+    queue = calendar.PlannedEventsQueue()
+    for run_at in run_times:
+        queue.push(run_at)
+    assert queue.seconds_until_next_event(now, max_sleep) == expected_result
+
+
+def test_PlannedEventsQueue_load(mock_db):
+    mock_db.events.get_all.return_value = [MagicMock(run_at=run_at) for run_at in [300, 100, 200]]
+    queue = calendar.PlannedEventsQueue()
+    queue.push(50)
+    queue.load(mock_db)
+    assert len(queue) == 3
+    assert queue.seconds_until_next_event(0, 1000) == 100
+
+
+def test_insert_into_calendar_updates_planned_events_queue(mock_db, mock_test):
+    queue = calendar.PlannedEventsQueue()
+    with patch("main_modules.calendar.planned_events_queue", queue):
+        calendar.insert_into_calendar(mock_db, mock_test, 1000, enums.EventSource.calendar)
+        mock_test.state = enums.TestState.disabled
+        calendar.insert_into_calendar(mock_db, mock_test, 2000, enums.EventSource.calendar)
+    assert len(queue) == 1
+    assert queue.pop_due(1000) == 1
 
 
 def test_main():
     with patch("utils.configuration.config.load_config", return_value='doesnt_matter') as mock_load_config:
         with patch("utils.logs.setup_logging", return_value='doesnt_matter') as mock_setup_logging:
-            with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
-                with patch("main_modules.calendar.infinite_loop_for_processing_events", return_value='doesnt_matter') as mock_infinite_loop:
-                    calendar.main(Path("."))
+            with patch("utils.metrics.setup") as mock_metrics_setup:
+                with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
+                    with patch("main_modules.calendar.infinite_loop_for_processing_events", return_value='doesnt_matter') as mock_infinite_loop:
+                        calendar.main(Path("."))
     mock_load_config.assert_called_once()
     mock_setup_logging.assert_called_once()
+    mock_metrics_setup.assert_called_once()
     mock_pre_running_check.assert_called_once()
     mock_infinite_loop.assert_called_once()
 
 
+class StopLoop(Exception):
+    pass
+
+
 def test_infinite_loop_for_processing_events_loop_test():
-    with patch("main_modules.calendar.process_events", return_value="doesnt_matter") as mock_process_events:
-        func = function_timeout(timeout=1.0)(calendar.infinite_loop_for_processing_events)
-        try:
-            func()
-        except TimeoutException:
-            pass
-    call_count = mock_process_events.call_count
-    assert 5 < call_count < 12
+    queue = calendar.PlannedEventsQueue()
+    for run_at in [1005, 990, 1000.5]:
+        queue.push(run_at)
+    listener = MagicMock()
+    with patch("main_modules.calendar.process_events", side_effect=[None, None, StopLoop]) as mock_process_events:
+        with patch("main_modules.calendar.planned_events_queue", queue):
+            with patch("main_modules.calendar.load_planned_events", return_value=None) as mock_load_planned_events:
+                with patch("main_modules.calendar.get_max_sleep", return_value=1.0):
+                    with patch("main_modules.calendar.time.time", side_effect=[1000, 1000, 1000.5, 1000.5, 1001]):
+                        with patch("utils.wakeup.get_listener", return_value=listener):
+                            with pytest.raises(StopLoop):
+                                calendar.infinite_loop_for_processing_events()
+    mock_load_planned_events.assert_called_once()
+    assert [c.kwargs["process_planned_events"] for c in mock_process_events.call_args_list] == [True, True, False]
+    # sleeping until the next planned event, but never longer than the maximum sleep
+    assert [c.args[0] for c in listener.wait.call_args_list] == [0.5, 1.0]
+    assert len(queue) == 1
+
+
+@pytest.mark.parametrize("listener", [None, MagicMock()])
+def test_wait_for_next_event(listener):
+    with patch("main_modules.calendar.time.sleep") as mock_sleep:
+        calendar.wait_for_next_event(listener, 0.5)
+    if listener is None:
+        mock_sleep.assert_called_once_with(0.5)
+    else:
+        mock_sleep.assert_not_called()
+        listener.wait.assert_called_once_with(0.5)
+
+
+def test_wakeup_notify_calendar():
+    listener = wakeup.WakeUpListener(("127.0.0.1", 0))
+    address = listener._socket.getsockname()
+    assert listener.wait(0) is False
+    with patch("utils.wakeup.get_calendar_address", return_value=address):
+        wakeup.notify_calendar()
+        wakeup.notify_calendar()
+    assert listener.wait(1.0) is True
+    # all the notifications are consumed by one wake-up
+    assert listener.wait(0) is False
+    listener.close()
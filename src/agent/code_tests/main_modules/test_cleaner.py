@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 from code_tests.timeout import function_timeout, TimeoutException
 from main_modules import cleaner
@@ -10,45 +11,73 @@ from database.daoaggregator import DAOAggregator
 def mock_sub_db():
     mock_db = MagicMock()
     mock_db.table = MagicMock(__tablename__="table")
-    mock_db.delete_old_records.return_value = 0
+    mock_db.delete_old_records_in_chunks.return_value = iter([0])
     return mock_db
 
 
 @pytest.mark.parametrize(
-    "rows_deleted",
+    "chunks, expected_sleeps",
     [
-        0,
-        1,
-        10,
+        ([0], 0),
+        ([1], 1),
+        ([10, 0, 5], 2),
     ]
 )
-def test_delete_old_records_for_table(mock_sub_db, rows_deleted):
+def test_delete_old_records_for_table(mock_sub_db, chunks, expected_sleeps):
+    mock_sub_db.delete_old_records_in_chunks.return_value = iter(chunks)
     with patch("utils.configuration.config.get", return_value=10):
         with patch("utils.logs.info", return_value="doesnt_matter") as mock_log:
-            mock_sub_db.delete_old_records.return_value = rows_deleted
-            cleaner.delete_old_records_for_table(mock_sub_db, 1000)
-    mock_sub_db.delete_old_records.assert_called_with(990)
-    if rows_deleted > 0:
-        mock_log.assert_called_once()
+            with patch("time.sleep") as mock_sleep:
+                cleaner.delete_old_records_for_table(mock_sub_db, 1000, time.monotonic() + 60)
+    mock_sub_db.delete_old_records_in_chunks.assert_called_with(990, cleaner.DEFAULT_CHUNK_SIZE)
+    assert mock_sleep.call_count == expected_sleeps
+    if sum(chunks) > 0:
+        assert f"Cleaned {sum(chunks)} rows" in mock_log.call_args.args[0]
     else:
         mock_log.assert_not_called()
 
 
+def test_delete_old_records_for_table_time_budget(mock_sub_db):
+    chunks = iter([10, 10, 10])
+    mock_sub_db.delete_old_records_in_chunks.return_value = chunks
+    with patch("utils.configuration.config.get", return_value=10):
+        with patch("utils.logs.warning") as mock_warning:
+            cleaner.delete_old_records_for_table(mock_sub_db, 1000, time.monotonic())
+    mock_warning.assert_called_once()
+    assert list(chunks) == [10, 10, 10]  # no chunk is deleted after the deadline
+
+
 def test_delete_old_records():
     with patch("main_modules.cleaner.delete_old_records_for_table", return_value="doesnt_matter") as mock_delete:
         with patch("time.time", return_value=123) as mock_time:
             db = DAOAggregator()
-            cleaner.delete_old_records(db)
+            cleaner.delete_old_records(db, time.monotonic() + 60)
     mock_time.assert_called_once()
-    mock_delete.assert_called_with(ANY, 123)
+    mock_delete.assert_called_with(ANY, 123, ANY)
     assert mock_delete.call_count == 10
 
 
+def test_delete_old_records_time_budget():
+    deadline = time.monotonic() + 60
+    with patch("main_modules.cleaner.delete_old_records_for_table") as mock_delete:
+        with patch("utils.logs.warning") as mock_warning:
+            # the budget is spent by the deletes of the first two tables
+            with patch("time.monotonic", side_effect=[0, 0, deadline]):
+                cleaner.delete_old_records(DAOAggregator(), deadline)
+    assert mock_delete.call_count == 2
+    mock_warning.assert_called_once()
+    assert "tables multi_results" not in mock_warning.call_args.args[0]
+    assert "tables nonces, old_params" in mock_warning.call_args.args[0]
+
+
 def test_clean_database():
     with patch("main_modules.cleaner.delete_old_records", return_value="doesnt_matter") as mock_delete:
-        with patch("utils.logs.debug", return_value="doesnt_matter") as mock_log:
-            cleaner.clean_database()
+        with patch("database.connection.optimize_database") as mock_optimize:
+            with patch("utils.logs.debug", return_value="doesnt_matter") as mock_log:
+                cleaner.clean_database()
     mock_delete.assert_called_once()
+    # the vacuum has the same deadline as the deletes
+    mock_optimize.assert_called_once_with(mock_delete.call_args.args[1], ANY, ANY)
     mock_log.assert_called_once()
 
 
@@ -67,10 +96,12 @@ def test_infinite_loop_for_cleaning_database():
 def test_main():
     with patch("utils.configuration.config.load_config", return_value='doesnt_matter') as mock_load_config:
         with patch("utils.logs.setup_logging", return_value='doesnt_matter') as mock_setup_logging:
-            with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
-                with patch("main_modules.cleaner.infinite_loop_for_cleaning_database", return_value='doesnt_matter') as mock_infinite_loop:
-                    cleaner.main(Path("."))
+            with patch("utils.metrics.setup") as mock_metrics_setup:
+                with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
+                    with patch("main_modules.cleaner.infinite_loop_for_cleaning_database", return_value='doesnt_matter') as mock_infinite_loop:
+                        cleaner.main(Path("."))
     mock_load_config.assert_called_once()
     mock_setup_logging.assert_called_once()
+    mock_metrics_setup.assert_called_once()
     mock_pre_running_check.assert_called_once()
     mock_infinite_loop.assert_called_once()
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from main_modules.deadline_tracker import DeadlineTracker, load_deadline_tracker
+from utils import enums
+
+
+@pytest.mark.parametrize(
+    "deadlines, now, expected",
+    [
+        ([], 10, []),
+        ([(1, 5), (2, 15), (3, 1)], 10, [3, 1]),  # ordered by the deadline
+        ([(1, 5), (2, 15)], 5, []),  # the deadline must be exceeded
+        ([(1, 5), (1, 20)], 10, []),  # the deadline was extended
+        ([(1, 20), (1, 5)], 10, [1]),  # the deadline was shortened
+    ]
+)
+def test_DeadlineTracker_pop_expired(deadlines, now, expected):
+    tracker = DeadlineTracker()
+    for id_run, deadline in deadlines:
+        tracker.set(id_run, enums.RunState.running, deadline)
+    assert tracker.pop_expired(enums.RunState.running, now) == expected
+    assert tracker.pop_expired(enums.RunState.running, now) == []
+
+
+def test_DeadlineTracker_state_change():
+    tracker = DeadlineTracker()
+    tracker.set(1, enums.RunState.running, 5)
+    tracker.set(1, enums.RunState.terminating, 8)
+    assert len(tracker) == 1
+    assert tracker.pop_expired(enums.RunState.running, 10) == []
+    assert tracker.pop_expired(enums.RunState.terminating, 10) == [1]
+    assert len(tracker) == 0
+
+
+def test_DeadlineTracker_remove():
+    tracker = DeadlineTracker()
+    tracker.set(1, enums.RunState.killing, 5)
+    tracker.remove(1)
+    tracker.remove(2)  # unknown runs are ignored
+    assert tracker.pop_expired(enums.RunState.killing, 10) == []
+
+
+def test_load_deadline_tracker():
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_states.return_value = [
+        MagicMock(id_run=1, state=enums.RunState.running, deadline=5),
+        MagicMock(id_run=2, state=enums.RunState.zombie, deadline=5),
+        MagicMock(id_run=3, state=enums.RunState.running, deadline=None),
+    ]
+    with patch("utils.logs.warning") as mock_logs_warning:
+        tracker = load_deadline_tracker(mock_db)
+    mock_logs_warning.assert_called_once()
+    assert len(tracker) == 2
+    assert tracker.pop_expired(enums.RunState.running, 10) == [1]
+    assert tracker.pop_expired(enums.RunState.zombie, 10) == [2]
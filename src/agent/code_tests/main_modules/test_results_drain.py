@@ -0,0 +1,176 @@
+import queue
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from main_modules import results_drain
+from utils import enums
+from utils.exceptions import TransactionError
+from utils.result_message import ResultMessage
+
+
+def message(run_id: int, status: str = "success") -> ResultMessage:
+    return ResultMessage({"run_id": run_id, "status": status, "data": "{}"})
+
+
+@pytest.fixture
+def mock_db():
+    mock_instance = MagicMock()
+    mock_instance.runs.get_all_by_ids.side_effect = lambda run_ids: [
+        MagicMock(id_run=run_id, id_test=run_id * 10, recovery_attempt=0) for run_id in run_ids if run_id < 100
+    ]
+    return mock_instance
+
+
+@pytest.mark.parametrize(
+    "raw_message, valid",
+    [
+        ({"run_id": 1, "status": "success", "data": {"value": 1}}, True),
+        ({"run_id": 1, "status": "unknown", "data": {}}, False),  # unknown status
+        ({"run_id": "1", "status": "success", "data": {}}, False),  # non-numeric run ID
+        ({"run_id": 1, "status": "success", "data": "text"}, False),  # data is not a dict
+        ({"run_id": 1, "status": "success"}, False),  # missing data
+        ("not a message", False),
+    ]
+)
+def test_parse_result_message(raw_message, valid):
+    with patch("utils.logs.error", side_effect=TransactionError) as mock_logs_error:
+        if valid:
+            result = results_drain.parse_result_message(raw_message)
+            assert result.data == '{"value": 1}'
+        else:
+            with pytest.raises(TransactionError):
+                results_drain.parse_result_message(raw_message)
+    assert mock_logs_error.call_count == int(not valid)
+
+
+@pytest.mark.parametrize(
+    "messages_count, batch_size, expected_batch",
+    [
+        (0, 10, 0),
+        (1, 10, 1),
+        (5, 10, 5),
+        (25, 10, 10),  # limited by the batch size
+    ]
+)
+def test_ResultsDrain_collect_batch(messages_count, batch_size, expected_batch):
+    results_queue = queue.Queue()
+    for i in range(messages_count):
+        results_queue.put({"run_id": i, "status": "success", "data": {}})
+    drain = results_drain.ResultsDrain(results_queue, batch_size=batch_size, batch_delay=0.01)
+    batch = drain.collect_batch(timeout=0.01)
+    assert len(batch) == expected_batch
+    assert results_queue.qsize() == messages_count - expected_batch
+
+
+def test_ResultsDrain_collect_batch_skips_invalid_messages():
+    results_queue = queue.Queue()
+    results_queue.put({"run_id": 1, "status": "success", "data": {}})
+    results_queue.put({"run_id": 2, "status": "unknown", "data": {}})
+    drain = results_drain.ResultsDrain(results_queue, batch_delay=0.01)
+    with patch("utils.logs.error", side_effect=TransactionError):
+        batch = drain.collect_batch(timeout=0.01)
+    assert [m.run_id for m in batch] == [1]
+
+
+@pytest.mark.parametrize(
+    "messages, results_count, requests_count, last_results_count",
+    [
+        ([message(1)], 1, 0, 1),
+        ([message(1), message(2, "error")], 2, 1, 2),
+        ([message(1), message(100)], 1, 0, 1),  # run 100 doesn't exist anymore
+        ([message(100)], 0, 0, 0),
+    ]
+)
+def test_ResultsDrain_write_batch(mock_db, messages, results_count, requests_count, last_results_count):
+    drain = results_drain.ResultsDrain(queue.Queue())
+    with patch("main_modules.results_drain.DAOAggregator", return_value=mock_db):
+        with patch("utils.wakeup.notify_calendar") as mock_notify_calendar:
+            drain.write_batch(messages)
+
+    mock_db.runs.get_all_by_ids.assert_called_once_with([m.run_id for m in messages])
+    if results_count:
+        assert len(mock_db.results.create_many.call_args.args[0]) == results_count
+        assert len(mock_db.requests.create_many.call_args.args[0]) == requests_count
+        assert len(mock_db.tests.update_last_results.call_args.args[0]) == last_results_count
+        mock_db.runs.delete_by_ids.assert_called_once_with([m.run_id for m in messages], transaction_finished=True)
+    else:
+        mock_db.results.create_many.assert_not_called()
+    assert mock_notify_calendar.call_count == int(requests_count > 0)
+    mock_db.runs.delete.assert_not_called()
+    assert drain.metrics.batches == 1
+    assert drain.metrics.messages == len(messages)
+
+
+def test_ResultsDrain_write_batch_fallback(mock_db):
+    # the first (bulk) write fails, every message is then stored separately
+    mock_db.results.create_many.side_effect = [TransactionError, None, None]
+    drain = results_drain.ResultsDrain(queue.Queue())
+    with patch("main_modules.results_drain.DAOAggregator", return_value=mock_db):
+        drain.write_batch([message(1), message(2)])
+
+    assert mock_db.results.create_many.call_count == 3
+    assert mock_db.rollback.call_count == 1
+    assert mock_db.runs.delete_by_ids.call_count == 2
+
+
+def test_ResultsDrain_write_batch_holds_waiting_run(mock_db):
+    # the result arrived before the tests manager stored the start of the run
+    waiting_run = MagicMock(id_run=2, id_test=20, recovery_attempt=0, state=enums.RunState.waiting)
+    mock_db.runs.get_all_by_ids.side_effect = None
+    mock_db.runs.get_all_by_ids.return_value = [MagicMock(id_run=1, id_test=10, recovery_attempt=0), waiting_run]
+    drain = results_drain.ResultsDrain(queue.Queue())
+    with patch("main_modules.results_drain.DAOAggregator", return_value=mock_db):
+        drain.write_batch([message(1), message(2)])
+    assert len(mock_db.results.create_many.call_args.args[0]) == 1
+    mock_db.runs.delete_by_ids.assert_called_once_with([1], transaction_finished=True)
+    assert [m.run_id for m in drain._held] == [2]
+
+    waiting_run.state = enums.RunState.running
+    mock_db.runs.get_all_by_ids.return_value = [waiting_run]
+    with patch("main_modules.results_drain.DAOAggregator", return_value=mock_db):
+        drain.write_batch(drain._held)
+    assert mock_db.results.create_many.call_args.args[0][0]["id_test"] == 20
+    assert drain.metrics.messages == 2
+
+
+def test_ResultsDrain_write_batch_drops_held_after_timeout(mock_db):
+    mock_db.runs.get_all_by_ids.side_effect = None
+    mock_db.runs.get_all_by_ids.return_value = [MagicMock(id_run=1, state=enums.RunState.waiting)]
+    drain = results_drain.ResultsDrain(queue.Queue())
+    with patch("main_modules.results_drain.DAOAggregator", return_value=mock_db):
+        with patch("time.monotonic", side_effect=[0, results_drain.HOLD_TIMEOUT]):
+            drain.write_batch([message(1)])
+            assert len(drain._held) == 1
+            with patch("utils.logs.warning") as mock_logs_warning:
+                drain.write_batch(drain._held)
+    assert drain._held == []
+    mock_logs_warning.assert_called_once()
+    mock_db.results.create_many.assert_not_called()
+
+
+def test_DrainMetrics():
+    metrics = results_drain.DrainMetrics()
+    assert metrics.average_write_latency() == 0
+    metrics.add_batch(10, 0.5)
+    metrics.add_batch(20, 0.1)
+    assert metrics.batches == 2
+    assert metrics.messages == 30
+    assert metrics.last_write_latency == 0.1
+    assert metrics.max_write_latency == 0.5
+    assert metrics.average_write_latency() == pytest.approx(0.3)
+
+
+@pytest.mark.parametrize(
+    "options, batch_size, batch_delay",
+    [
+        ({}, results_drain.DEFAULT_BATCH_SIZE, results_drain.DEFAULT_BATCH_DELAY),
+        ({"results_batch_size_int": 10, "results_batch_delay_float": 0.5}, 10, 0.5),
+    ]
+)
+def test_create_results_drain(options, batch_size, batch_delay):
+    with patch("utils.configuration.config.exists", side_effect=lambda section, option: option in options):
+        with patch("utils.configuration.config.get", side_effect=lambda section, option, required: options[option]):
+            drain = results_drain.create_results_drain(queue.Queue())
+    assert drain._batch_size == batch_size
+    assert drain._batch_delay == batch_delay
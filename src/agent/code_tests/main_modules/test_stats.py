@@ -1,6 +1,6 @@
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import patch, ANY, MagicMock, call
+from unittest.mock import patch, ANY, MagicMock
 
 import pytest
 
@@ -19,34 +19,71 @@ from main_modules import stats
 )
 def test_calculate_statistics_for_table(records_values, call_count):
     mock_db = MagicMock()
-    mock_db.stats.create = MagicMock()
 
     records = RecordsCounter()
-    expected_calls = []
+    expected_rows = []
     records_summary = 0
     for records_value in records_values:
         records.add(records_value[0], records_value[1])
-        expected_calls.append(call(123, "name", records_value[0], records_value[1]))
+        expected_rows.append({"time": 123, "table": "name", "category": records_value[0], "value": records_value[1]})
         records_summary += records_value[1]
+    expected_rows.append({"time": 123, "table": "name", "category": "all", "value": records_summary})
 
     mock_sub_db = MagicMock()
     mock_sub_db.table.__tablename__ = "name"
     mock_sub_db.count_records_in_table.return_value = records
 
-    stats.calculate_statistics_for_table(mock_db, mock_sub_db, 123)
+    rows = stats.calculate_statistics_for_table(mock_db, mock_sub_db, 123)
 
-    mock_db.stats.create.assert_has_calls(expected_calls, any_order=True)
-    assert mock_db.stats.create.call_count == call_count
+    assert rows == expected_rows
+    assert len(rows) == call_count
+    mock_db.record_counters.get_records_counter.assert_not_called()
+
+
+def test_calculate_statistics_for_table_incremental():
+    mock_db = MagicMock()
+    mock_db.record_counters.get_records_counter.return_value = RecordsCounter(5)
+    mock_sub_db = MagicMock()
+    mock_sub_db.table.__tablename__ = "name"
+
+    rows = stats.calculate_statistics_for_table(mock_db, mock_sub_db, 123, incremental=True)
+
+    assert rows == [{"time": 123, "table": "name", "category": "all", "value": 5}]
+    mock_sub_db.count_records_in_table.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "configured, supported, expected_tables, expected",
+    [
+        (None, True, [], False),
+        (False, True, [], False),
+        (True, True, ["table"], True),
+        (True, False, None, False),
+    ]
+)
+def test_setup_record_counters(configured, supported, expected_tables, expected):
+    mock_db = MagicMock()
+    mock_db.record_counters.is_supported.return_value = supported
+    with patch("utils.configuration.config.exists", return_value=configured is not None):
+        with patch("utils.configuration.config.get", return_value=configured):
+            assert stats.setup_record_counters(mock_db, ["table"]) == expected
+    if expected_tables is None:
+        mock_db.record_counters.update_counted_tables.assert_not_called()
+    else:
+        mock_db.record_counters.update_counted_tables.assert_called_once_with(expected_tables)
 
 
 def test_calculate_statistics_for_tables():
-    with patch("main_modules.stats.calculate_statistics_for_table", return_value="doesnt_matter") as mock_calculate:
-        with patch("time.time", return_value=123) as mock_time:
-            db = DAOAggregator()
-            stats.calculate_statistics_for_tables(db)
+    with patch("main_modules.stats.calculate_statistics_for_table", return_value=[{"row": 1}]) as mock_calculate:
+        with patch("main_modules.stats.setup_record_counters", return_value=False):
+            with patch("time.time", return_value=123) as mock_time:
+                db = DAOAggregator()
+                with patch.object(db.stats, "create_many") as mock_create_many:
+                    stats.calculate_statistics_for_tables(db)
     mock_time.assert_called_once()
-    mock_calculate.assert_called_with(db, ANY, 123)
+    mock_calculate.assert_called_with(db, ANY, 123, False)
     assert mock_calculate.call_count == 9
+    mock_create_many.assert_called_once_with([{"row": 1}] * 9)
 
 
 @pytest.mark.parametrize(
@@ -80,22 +117,26 @@ def test_infinite_loop_for_calculating_database_statistics():
     with patch("main_modules.stats.wait_until_next_hour", return_value="doesnt_matter"):
         with patch("main_modules.stats.calculate_statistics_for_database", return_value="doesnt_matter") as mock_stats:
             with patch("utils.configuration.config.get", return_value=0.1):
-                func = function_timeout(timeout=2.0)(stats.infinite_loop_for_calculating_database_statistics)
-                try:
-                    func()
-                except TimeoutException:
-                    pass
+                with patch("utils.configuration.config.reload_if_changed") as mock_reload:
+                    func = function_timeout(timeout=2.0)(stats.infinite_loop_for_calculating_database_statistics)
+                    try:
+                        func()
+                    except TimeoutException:
+                        pass
     call_count = mock_stats.call_count
     assert 10 < call_count < 22
+    assert mock_reload.call_count >= call_count
 
 
 def test_main():
     with patch("utils.configuration.config.load_config", return_value='doesnt_matter') as mock_load_config:
         with patch("utils.logs.setup_logging", return_value='doesnt_matter') as mock_setup_logging:
-            with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
-                with patch("main_modules.stats.infinite_loop_for_calculating_database_statistics", return_value='doesnt_matter') as mock_infinite_loop:
-                    stats.main(Path("."))
+            with patch("utils.metrics.setup") as mock_metrics_setup:
+                with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
+                    with patch("main_modules.stats.infinite_loop_for_calculating_database_statistics", return_value='doesnt_matter') as mock_infinite_loop:
+                        stats.main(Path("."))
     mock_load_config.assert_called_once()
     mock_setup_logging.assert_called_once()
+    mock_metrics_setup.assert_called_once()
     mock_pre_running_check.assert_called_once()
     mock_infinite_loop.assert_called_once()
@@ -1,8 +1,14 @@
 from pathlib import Path
+from multiprocessing import Queue
 from unittest.mock import patch, MagicMock
 
+import pytest
+
 from code_tests.timeout import function_timeout, TimeoutException
 from main_modules import tests_manager
+from main_modules.deadline_tracker import DeadlineTracker
+from utils import enums, processes, worker_pool
+from utils.exceptions import TransactionError
 
 
 def test_check_tests():
@@ -12,6 +18,223 @@ def test_check_tests():
     mock_test_manager.assert_called_once()
 
 
+@pytest.mark.parametrize(
+    "executor_exists, executor, expected_class",
+    [
+        (False, None, "utils.processes.ProcessExecutor"),
+        (True, "process", "utils.processes.ProcessExecutor"),
+        (True, "pool", "main_modules.tests_manager.WorkerPool"),
+    ]
+)
+def test_create_executor(executor_exists, executor, expected_class):
+    with patch("utils.configuration.config.exists", return_value=executor_exists):
+        with patch("utils.configuration.config.get", return_value=executor):
+            with patch(expected_class) as mock_executor:
+                tests_manager.create_executor(MagicMock())
+    mock_executor.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "alive, terminated",
+    [
+        (True, True),
+        (False, False),  # the run has already finished, it's only reported as crashed
+    ]
+)
+def test_TestsManager_terminate_old_tests(alive, terminated):
+    mock_db = MagicMock()
+    mock_run = MagicMock(id_run=1, pid=100, state=enums.RunState.running, deadline=10)
+    mock_db.runs.get_all_by_ids.return_value = [mock_run]
+    mock_executor = MagicMock()
+    mock_executor.is_alive.return_value = alive
+    deadlines = DeadlineTracker()
+    deadlines.set(mock_run.id_run, enums.RunState.running, mock_run.deadline)
+
+    with patch("utils.configuration.config.get", return_value=60):
+        manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor, deadlines)
+        manager.terminate_old_tests()
+
+    mock_db.runs.get_all_by_ids.assert_called_once_with([mock_run.id_run])
+    mock_executor.is_alive.assert_called_once_with(mock_run)
+    assert mock_executor.terminate.call_count == int(terminated)
+    assert mock_db.runs.update_state.call_count == int(terminated)
+    assert mock_db.runs.delete.call_count == int(not terminated)
+    # the terminated run waits for the next deadline
+    assert len(deadlines) == int(terminated)
+
+
+@pytest.mark.parametrize(
+    "method, state, next_state",
+    [
+        ("kill_old_tests", enums.RunState.terminating, enums.RunState.killing),
+        ("zombify_old_tests", enums.RunState.killing, enums.RunState.zombie),
+        ("check_zombies", enums.RunState.zombie, enums.RunState.zombie),
+    ]
+)
+@pytest.mark.parametrize("alive", [True, False])
+def test_TestsManager_deadline_states(method, state, next_state, alive):
+    mock_db = MagicMock()
+    mock_run = MagicMock(id_run=1, pid=100, state=state, deadline=10)
+    mock_db.runs.get_all_by_ids.return_value = [mock_run]
+    mock_executor = MagicMock()
+    mock_executor.is_alive.return_value = alive
+    deadlines = DeadlineTracker()
+    deadlines.set(mock_run.id_run, state, mock_run.deadline)
+
+    with patch("utils.configuration.config.get", return_value=60):
+        manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor, deadlines)
+        getattr(manager, method)()
+        # the run is processed only once for every deadline
+        getattr(manager, method)()
+
+    mock_executor.is_alive.assert_called_once_with(mock_run)
+    if alive:
+        mock_db.runs.update_state.assert_called_once()
+        assert mock_db.runs.update_state.call_args.args[1] == next_state
+        assert deadlines.pop_expired(next_state, float("inf")) == [mock_run.id_run]
+    else:
+        mock_db.runs.delete.assert_called_once_with(mock_run.id_run, transaction_finished=None)
+        assert len(deadlines) == 0
+
+
+def test_TestsManager_skips_finished_runs():
+    # the run has been deleted by the results drain before its deadline
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_ids.return_value = []
+    mock_executor = MagicMock()
+    deadlines = DeadlineTracker()
+    deadlines.set(1, enums.RunState.running, 10)
+
+    manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor, deadlines)
+    manager.terminate_old_tests()
+
+    mock_executor.is_alive.assert_not_called()
+    mock_db.results.create.assert_not_called()
+
+
+def test_TestsManager_start_new_tests_without_capacity():
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_state.return_value = [MagicMock(), MagicMock()]
+    mock_executor = MagicMock()
+    mock_executor.get_capacity.return_value = 0
+
+    manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor)
+    manager.start_new_tests()
+
+    mock_executor.start.assert_not_called()
+    mock_db.runs.update.assert_not_called()
+
+
+def test_TestsManager_start_new_tests_without_idle_worker():
+    # the executor has no worker left after the capacity check, the run waits for the next round
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_state.return_value = [MagicMock(id_run=1, id_test=10)]
+    mock_db.tests.get_all_by_ids.return_value = [MagicMock(id_test=10, state=enums.TestState.enabled, timeout=60)]
+    mock_executor = MagicMock()
+    mock_executor.get_capacity.return_value = None
+    mock_executor.start.return_value = None
+    deadlines = DeadlineTracker()
+
+    manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor, deadlines)
+    with patch.object(manager, "load_module"):
+        manager.start_new_tests()
+
+    mock_db.tests.update_state.assert_not_called()
+    changes = mock_db.runs.update_many.call_args.args[0]
+    assert changes == [{"id_run": 1, "pid": None, "state": enums.RunState.waiting, "started": None, "deadline": None}]
+    assert len(deadlines) == 0
+
+
+@pytest.mark.parametrize("executor_class", [processes.ProcessExecutor, worker_pool.WorkerPool])
+def test_TestsManager_start_new_tests_invalid_params(executor_class):
+    # the parameters of the test are not a JSON, the test is disabled by both executors
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_state.return_value = [MagicMock(id_run=1, id_test=10, planned=0)]
+    mock_db.tests.get_all_by_ids.return_value = [
+        MagicMock(id_test=10, state=enums.TestState.enabled, timeout=60, test_params="not a json")
+    ]
+    with patch("utils.logs.debug"):
+        if executor_class is worker_pool.WorkerPool:
+            executor = worker_pool.WorkerPool(Queue(), size=1, max_runs=10, max_memory=1024)
+        else:
+            executor = processes.ProcessExecutor(Queue())
+        manager = tests_manager.TestsManager(mock_db, MagicMock(), executor, DeadlineTracker())
+        try:
+            with patch.object(manager, "load_module"):
+                manager.start_new_tests()
+        finally:
+            executor.close()
+
+    mock_db.tests.update_state.assert_called_once_with(10, enums.TestState.disabled)
+    assert mock_db.runs.update_many.call_args.args[0][0]["state"] == enums.RunState.waiting
+
+
+@pytest.mark.parametrize(
+    "test_states, capacity, started, skipped",
+    [
+        ([enums.TestState.enabled, enums.TestState.enabled], 2, [1, 2], []),
+        ([enums.TestState.enabled, enums.TestState.disabled], 2, [1], [2]),
+        ([enums.TestState.enabled, enums.TestState.enabled], 1, [1], []),  # the second run waits for a worker
+    ]
+)
+def test_TestsManager_start_new_tests(test_states, capacity, started, skipped):
+    runs = [MagicMock(id_run=i, id_test=i * 10) for i in range(1, len(test_states) + 1)]
+    tests = [MagicMock(id_test=i * 10, state=state, version=3, timeout=60) for i, state in enumerate(test_states, 1)]
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_state.return_value = runs
+    mock_db.tests.get_all_by_ids.return_value = tests
+    mock_executor = MagicMock()
+    mock_executor.get_capacity.return_value = capacity
+    mock_executor.start.side_effect = lambda name, module, params, run_id: run_id + 1000
+    deadlines = DeadlineTracker()
+
+    manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor, deadlines)
+    with patch.object(manager, "load_module"):
+        with patch("utils.metrics.observe"):
+            manager.start_new_tests()
+
+    # the runs are stored as running before the tests are started, the PIDs after that
+    assert mock_db.runs.update_many.call_count == 2
+    starting, updates = [call.args[0] for call in mock_db.runs.update_many.call_args_list]
+    assert [run["id_run"] for run in starting] == started
+    assert all(run["pid"] is None and run["state"] == enums.RunState.running for run in starting)
+    assert all(run["version"] == 3 for run in starting)
+    assert [run["id_run"] for run in updates] == started
+    assert [run["pid"] for run in updates] == [run_id + 1000 for run_id in started]
+    assert all(run["state"] == enums.RunState.running for run in updates)
+    assert len(mock_db.tests.update_last_started_many.call_args.args[0]) == len(started)
+    mock_db.runs.delete_by_ids.assert_called_once_with(skipped, transaction_finished=True)
+    mock_db.runs.update.assert_not_called()
+    assert len(deadlines) == len(started)
+
+
+def test_TestsManager_start_new_tests_fallback():
+    mock_db = MagicMock()
+    mock_db.runs.get_all_by_state.return_value = [MagicMock(id_run=1, id_test=10), MagicMock(id_run=2, id_test=20)]
+    mock_db.tests.get_all_by_ids.return_value = [
+        MagicMock(id_test=10, state=enums.TestState.enabled, timeout=60),
+        MagicMock(id_test=20, state=enums.TestState.enabled, timeout=60),
+    ]
+    mock_db.runs.update_many.side_effect = [TransactionError, None]
+    mock_db.runs.update.side_effect = [None, TransactionError]
+    mock_executor = MagicMock()
+    mock_executor.get_capacity.return_value = None
+
+    deadlines = DeadlineTracker()
+    manager = tests_manager.TestsManager(mock_db, MagicMock(), mock_executor, deadlines)
+    with patch.object(manager, "load_module"):
+        with patch("utils.logs.warning"):
+            manager.start_new_tests()
+
+    assert mock_db.rollback.call_count == 2
+    # only the stored run is started
+    assert mock_executor.start.call_args.args[3] == 1
+    assert mock_db.runs.update.call_count == 2
+    # only the test of the run which couldn't be stored is disabled
+    mock_db.tests.update_state.assert_called_once_with(20, enums.TestState.disabled)
+    assert len(deadlines) == 1
+
+
 def test_infinite_loop_for_checking_tests():
     with patch("main_modules.tests_manager.check_tests", return_value="doesnt_matter") as mock_check_tests:
         func = function_timeout(timeout=1.0)(tests_manager.infinite_loop_for_checking_tests)
@@ -26,10 +249,12 @@ def test_infinite_loop_for_checking_tests():
 def test_main():
     with patch("utils.configuration.config.load_config", return_value='doesnt_matter') as mock_load_config:
         with patch("utils.logs.setup_logging", return_value='doesnt_matter') as mock_setup_logging:
-            with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
-                with patch("main_modules.tests_manager.infinite_loop_for_checking_tests", return_value='doesnt_matter') as mock_infinite_loop:
-                    tests_manager.main(Path("."))
+            with patch("utils.metrics.setup") as mock_metrics_setup:
+                with patch("main_modules.initialization.pre_running_check", return_value='doesnt_matter') as mock_pre_running_check:
+                    with patch("main_modules.tests_manager.infinite_loop_for_checking_tests", return_value='doesnt_matter') as mock_infinite_loop:
+                        tests_manager.main(Path("."))
     mock_load_config.assert_called_once()
     mock_setup_logging.assert_called_once()
+    mock_metrics_setup.assert_called_once()
     mock_pre_running_check.assert_called_once()
     mock_infinite_loop.assert_called_once()
@@ -0,0 +1,61 @@
+"""
+Cost of one call of the logging functions, for records below the level of every handler and for emitted records.
+The previous functions inspected the whole stack on every call to get the location of the caller,
+now the location is taken from the record, only when a handler emits it.
+
+Run from the agent folder: python -m code_tests.utils.benchmark_logs [--calls 20000]
+"""
+import argparse
+import inspect
+import logging
+import os
+import time
+from typing import Callable
+
+from utils import logs
+
+
+def previous_get_info_about_calling_location() -> str:
+    frame = inspect.stack()[2]
+    file_name = os.path.relpath(frame[1])
+    return f"{file_name:32s} | {frame[3]:48s} | {frame[2]:3d}"
+
+
+def previous_debug(message: str) -> None:
+    logs.logger_debug.debug(f"{previous_get_info_about_calling_location()} | {message}")
+
+
+def previous_info(message: str) -> None:
+    logs.logger_debug.info(f"{previous_get_info_about_calling_location()} | {message}")
+
+
+def measure(function: Callable[[str], None], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        function("Started the test in the worker.")
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main(calls: int) -> None:
+    previous_handler = logging.StreamHandler(open(os.devnull, "w"))
+    previous_handler.setLevel(logging.INFO)
+    handler = logs.add_handler(logging.StreamHandler(open(os.devnull, "w")), logging.INFO)
+
+    print(f"{'variant':>8s} | {'record':>8s} | {'us/call':>7s}")
+    for name, log_handler, level, functions in (
+        ("previous", previous_handler, logging.DEBUG, (("filtered", previous_debug), ("emitted", previous_info))),
+        ("lazy", handler, logging.INFO, (("filtered", logs.debug), ("emitted", logs.info))),
+    ):
+        # the previous logger kept the DEBUG level, now it has the lowest level of the handlers
+        logs.logger_debug.setLevel(level)
+        logs.logger_debug.addHandler(log_handler)
+        for record, function in functions:
+            print(f"{name:>8s} | {record:>8s} | {measure(function, calls):7.1f}")
+        logs.logger_debug.removeHandler(log_handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    arguments = parser.parse_args()
+    main(arguments.calls)
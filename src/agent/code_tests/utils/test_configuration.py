@@ -0,0 +1,72 @@
+import pytest
+
+import utils.logs  # noqa: F401, the configuration is imported through the logs
+from utils import configuration
+from utils.exceptions import TransactionError
+
+CONFIG_FILE = """[tests]
+pool_size_int = 4
+executor = pool
+deadline_float = invalid
+"""
+
+
+@pytest.fixture
+def config(tmp_path):
+    config_file = tmp_path / "config.ini"
+    config_file.write_text(CONFIG_FILE)
+    config = configuration.Configuration()
+    config.load_config(config_file)
+    return config
+
+
+def test_snapshot_values(config):
+    assert config.tests_pool_size_int == 4
+    assert config.get("tests", "executor") == "pool"
+    assert dict(config._snapshot.values) == {"tests_pool_size_int": 4, "tests_executor": "pool"}
+    with pytest.raises(TypeError):
+        config._snapshot.values["tests_executor"] = "single"
+    with pytest.raises(TransactionError):
+        _ = config.tests_deadline_float
+
+
+def test_set_options_values_replaces_snapshot(config):
+    snapshot = config._snapshot
+    result = config.set_options_values({"tests": {"pool_size_int": "8", "max_runs_int": "100"}})
+
+    assert result == {"tests": {"pool_size_int": "updated", "max_runs_int": "added"}}
+    assert snapshot.values["tests_pool_size_int"] == 4  # the previous snapshot is not changed
+    assert config.tests_pool_size_int == 8
+    assert config.tests_max_runs_int == 100
+    assert "max_runs_int = 100" in config._config_file.read_text()
+    assert not config.reload_if_changed()  # the own change is not loaded again
+
+
+@pytest.mark.parametrize(
+    "content, reloaded, expected_pool_size",
+    [
+        ("[tests]\npool_size_int = 16\n", True, 16),
+        (CONFIG_FILE, False, 4),
+        ("[tests\n", False, 4),  # the invalid file is not loaded
+    ]
+)
+def test_reload_if_changed(config, monkeypatch, content, reloaded, expected_pool_size):
+    monkeypatch.setattr(configuration, "RELOAD_CHECK_INTERVAL", 0.0)
+    if content != CONFIG_FILE:
+        other = configuration.Configuration()  # another process
+        other.load_config(config._config_file)
+        config._config_file.with_name("new.ini").write_text(content)
+        config._config_file.with_name("new.ini").replace(config._config_file)
+
+    assert config.reload_if_changed() == reloaded
+    assert config.tests_pool_size_int == expected_pool_size
+
+
+def test_set_options_values_keeps_changes_of_other_processes(config):
+    other = configuration.Configuration()  # e.g. another API worker
+    other.load_config(config._config_file)
+    other.set_options_values({"tests": {"pool_size_int": "8"}})
+    config.set_options_values({"tests": {"max_runs_int": "100"}})
+
+    assert config.tests_pool_size_int == 8
+    assert config.tests_max_runs_int == 100
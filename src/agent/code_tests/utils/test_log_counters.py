@@ -0,0 +1,81 @@
+import logging
+import sqlite3
+import time
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+from utils import log_counters
+
+
+@pytest.fixture
+def ring(tmp_path):
+    return log_counters.LogCountersRing(tmp_path / "log_counters.db")
+
+
+def create_record(level: int, created: float) -> logging.LogRecord:
+    record = logging.LogRecord("test", level, __file__, 1, "message", None, None)
+    record.created = created
+    return record
+
+
+@pytest.mark.parametrize(
+    "since_minute, expected_error",
+    [
+        (100, 3),
+        (101, 1),
+        (102, 0),
+    ]
+)
+def test_LogCountersRing_add_and_read(ring, since_minute, expected_error):
+    ring.add({100: Counter(error=2, info=1)})
+    ring.add({100: Counter(error=0, info=1), 101: Counter(error=1)})
+    counters = ring.read(since_minute)
+    assert counters["error"] == expected_error
+    assert counters["info"] == (2 if since_minute <= 100 else 0)
+
+
+def test_LogCountersRing_reuses_slots(ring):
+    ring.add({100: Counter(error=5)})
+    ring.add({100 + log_counters.RING_MINUTES: Counter(error=1)})  # the same slot a day later
+    ring.add({100: Counter(error=7)})  # too old, the newer minute is kept
+    assert ring.read(0)["error"] == 1
+
+
+def test_LogCountersRing_shared_by_processes(tmp_path):
+    writer = log_counters.LogCountersRing(tmp_path / "log_counters.db")
+    reader = log_counters.LogCountersRing(tmp_path / "log_counters.db")
+    writer.add({100: Counter(warning=2)})
+    assert reader.read(100)["warning"] == 2
+
+
+def test_SeverityCountingHandler(ring):
+    handler = log_counters.SeverityCountingHandler(ring, flush_interval=60)
+    for level in (logging.INFO, logging.ERROR, logging.ERROR):
+        handler.handle(create_record(level, 6000.0))
+
+    assert ring.read(0)["error"] == 0  # not flushed yet
+    assert handler.statistics(minutes=1, now=6030.0) == {"debug": 0, "info": 1, "warning": 0, "error": 2, "critical": 0}
+    assert handler.statistics(minutes=1, now=6200.0)["error"] == 0  # outside the window
+
+
+def test_SeverityCountingHandler_flushes_periodically(ring):
+    # the count is added by the thread of the handler, without another record
+    handler = log_counters.SeverityCountingHandler(ring, flush_interval=0.01)
+    handler.handle(create_record(logging.WARNING, 6000.0))
+    until = time.time() + 5
+    while ring.read(0)["warning"] == 0 and time.time() < until:
+        time.sleep(0.01)
+    assert ring.read(0)["warning"] == 1
+    handler.close()
+
+
+def test_SeverityCountingHandler_keeps_counts_after_error(ring):
+    handler = log_counters.SeverityCountingHandler(ring, flush_interval=60)
+    handler.handle(create_record(logging.ERROR, 6000.0))
+    with patch.object(ring, "add", side_effect=sqlite3.OperationalError("database is locked")):
+        handler.flush()
+    handler.flush()
+    assert ring.read(0)["error"] == 1
+    handler.close()
@@ -0,0 +1,105 @@
+import logging
+import queue
+from unittest.mock import patch
+
+import pytest
+
+from utils import logs
+from utils.exceptions import GlobalError, TransactionError
+
+
+class RecordsHandler(logging.Handler):
+    def __init__(self, level: int) -> None:
+        super().__init__(level)
+        self.lines = []
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def handler():
+    handler = logs.add_handler(RecordsHandler(logging.INFO), logging.INFO)
+    logs.logger_debug.addHandler(handler)
+    yield handler
+    logs.logger_debug.removeHandler(handler)
+
+
+@pytest.mark.parametrize(
+    "function, exception",
+    [
+        (logs.info, None),
+        (logs.warning, None),
+        (logs.error, TransactionError),
+        (logs.critical, GlobalError),
+    ]
+)
+def test_location_of_the_caller(handler, function, exception):
+    if exception is None:
+        function("message")
+    else:
+        with pytest.raises(exception):
+            function("message")
+
+    location, message = handler.lines[0].rsplit(" | ", 1)
+    file_name, function_name, line_num = (part.strip() for part in location.split(" | "))
+    assert file_name.endswith("test_logs.py")
+    assert function_name == "test_location_of_the_caller"
+    assert int(line_num) > 0
+    assert message == "message"
+
+
+def test_location_only_for_emitted_records(handler):
+    logs.debug("filtered")
+    logs.info("emitted")
+    assert len(handler.records) == 1
+    assert handler.records[0].getMessage() == "emitted"
+    assert hasattr(handler.records[0], "location")
+
+
+def test_remote_handlers_behind_queue():
+    remote_handler = logs.add_handler(RecordsHandler(logging.WARNING), logging.WARNING)
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    with patch("multiprocessing.util.Finalize") as mock_finalize:
+        logs.start_queue_listener(queue_handler, [remote_handler])
+        logs.logger_debug.addHandler(queue_handler)
+        try:
+            logs.info("not emitted")
+            logs.warning("emitted")
+        finally:
+            logs.logger_debug.removeHandler(queue_handler)
+            logs.queue_listener.stop()
+
+    mock_finalize.assert_called_once_with(logs.queue_listener, logs.queue_listener.stop, exitpriority=0)
+    assert len(remote_handler.lines) == 1
+    assert "| test_remote_handlers_behind_queue " in remote_handler.lines[0]
+    assert remote_handler.lines[0].endswith(" | emitted")
+
+
+def test_setup_logging_file_behind_queue(tmp_path):
+    options = {"console_level": "error", "logs_file": tmp_path / "debug.log", "logs_file_level": "info"}
+    handlers = list(logs.logger_debug.handlers)
+
+    def get_option(section, option, required=False):
+        return options.get(option)
+
+    with patch("utils.configuration.config.get", side_effect=get_option):
+        with patch("multiprocessing.util.Finalize"):
+            logs.setup_logging("test")
+    added = [handler for handler in logs.logger_debug.handlers if handler not in handlers]
+    try:
+        # the file is written by the listener thread, not by the logging call
+        assert not any(isinstance(handler, logging.FileHandler) for handler in added)
+        assert any(isinstance(handler, logging.handlers.QueueHandler) for handler in added)
+        logs.info("queued")
+    finally:
+        for handler in added:
+            logs.logger_debug.removeHandler(handler)
+            handler.close()
+        logs.queue_listener.stop()
+        for handler in logs.queue_listener.handlers:
+            handler.close()
+        logs.logger_debug.setLevel(logging.DEBUG)
+    assert (tmp_path / "debug.log").read_text().rstrip().endswith(" | queued")
@@ -0,0 +1,103 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from utils import metrics
+
+
+@pytest.fixture
+def store(tmp_path):
+    return metrics.MetricsStore(tmp_path / metrics.METRICS_FILE)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (1.0, "1"),
+        (0.25, "0.25"),
+        (3, "3"),
+    ]
+)
+def test_format_value(value, expected):
+    assert metrics.format_value(value) == expected
+
+
+def test_Histogram_samples():
+    histogram = metrics.Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.samples("duration", 'test="a"') == [
+        ("duration_bucket", 'test="a",le="0.1"', 2),
+        ("duration_bucket", 'test="a",le="1"', 3),
+        ("duration_bucket", 'test="a",le="+Inf"', 4),
+        ("duration_sum", 'test="a"', 2.65),
+        ("duration_count", 'test="a"', 4),
+    ]
+
+
+def test_MetricsRegistry_flush(store):
+    registry = metrics.MetricsRegistry(store)
+    registry.inc("agent_results_total", 2)
+    registry.inc("agent_results_total", 3)
+    registry.set("agent_results_queue_depth", 7)
+    registry.observe("agent_calendar_tick_seconds", 0.2, buckets=(1.0,))
+    registry.flush()
+    rows = {(sample, labels): value for _, _, _, sample, labels, value in store.read()}
+    assert rows[("agent_results_total", "")] == 5
+    assert rows[("agent_results_queue_depth", "")] == 7
+    assert rows[("agent_calendar_tick_seconds_count", "")] == 1
+    assert rows[("agent_calendar_tick_seconds_bucket", 'le="1"')] == 1
+
+
+def test_collect_sums_processes(store):
+    store.write(100, [("agent_results_total", "counter", "agent_results_total", "", 2.0)])
+    store.write(200, [
+        ("agent_results_total", "counter", "agent_results_total", "", 3.0),
+        ("agent_results_queue_depth", "gauge", "agent_results_queue_depth", "", 4.0),
+    ])
+    with patch("psutil.pid_exists", side_effect=lambda pid: pid == 100) as mock_pid_exists:
+        text = metrics.collect(store, {"agent_runs": {'state="waiting"': 1}})
+    assert mock_pid_exists.call_count == 2  # once per process
+    assert text.splitlines() == [
+        "# TYPE agent_results_total counter",
+        "agent_results_total 5",
+        "# TYPE agent_runs gauge",
+        'agent_runs{state="waiting"} 1',
+    ]
+    # the exited process is merged, its gauge is dropped
+    rows = {(pid, sample): value for pid, _, _, sample, _, value in store.read()}
+    assert rows == {(100, "agent_results_total"): 2.0, (metrics.RETIRED_PID, "agent_results_total"): 3.0}
+
+
+def test_MetricsRegistry_close_retires_process(store):
+    registry = metrics.MetricsRegistry(store)
+    registry.inc("agent_results_total")
+    registry.close()
+    assert [row[0] for row in store.read()] == [metrics.RETIRED_PID]
+
+
+def test_render_without_registry():
+    with patch("utils.metrics.registry", None):
+        assert metrics.render({"agent_runs": {}}) == "# TYPE agent_runs gauge\n"
+        metrics.observe("agent_calendar_tick_seconds", 1.0)  # ignored
+
+
+def test_add_setup_hook(tmp_path):
+    calls = []
+    with patch("utils.metrics.registry", None), patch("utils.metrics.setup_hooks", []):
+        metrics.add_setup_hook(lambda: calls.append("first"))
+        assert calls == []
+        metrics.setup(tmp_path / metrics.METRICS_FILE)
+        metrics.add_setup_hook(lambda: calls.append("second"))  # already set up
+        assert calls == ["first", "second"]
+        metrics.registry.close()
+
+
+def test_MetricsStore_shared_by_threads(store):
+    registry = metrics.MetricsRegistry(store)
+    registry.inc("agent_results_total")
+    thread = threading.Thread(target=registry.flush)  # e.g. a DB thread of the API
+    thread.start()
+    thread.join()
+    assert [row[3] for row in store.read()] == ["agent_results_total"]
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+from multiprocessing import Queue
+from unittest.mock import MagicMock, patch
+
+from tests.common import BaseTest
+from utils import processes
+
+
+class Test(BaseTest):
+    __test__ = False  # not a pytest class, the executor runs it as a test module
+
+    def run(self, params: dict, run_id: int) -> None:
+        time.sleep(params.get("sleep", 0))
+        self.process_message({"run_id": run_id, "status": "success", "data": {"pid": os.getpid()}})
+
+
+test_module = sys.modules[__name__]
+
+
+def test_ProcessExecutor_reaps_finished_processes():
+    executor = processes.ProcessExecutor(Queue())
+    with patch("utils.logs.debug"):
+        pid = executor.start("test", test_module, "{}", 1)
+    assert executor._results_queue.get(timeout=5)["data"]["pid"] == pid
+
+    until = time.time() + 5
+    while pid in executor._processes and time.time() < until:
+        executor.maintain()
+        time.sleep(0.01)
+    assert pid not in executor._processes
+    with patch("utils.processes.is_process_alive", return_value=False) as mock_is_process_alive:
+        assert not executor.is_alive(MagicMock(pid=pid))
+    mock_is_process_alive.assert_called_once_with(pid)
+
+
+def test_ProcessExecutor_is_alive():
+    executor = processes.ProcessExecutor(Queue())
+    with patch("utils.logs.debug"):
+        pid = executor.start("test", test_module, '{"sleep": 60}', 1)
+    run = MagicMock(pid=pid)
+    assert executor.is_alive(run)
+    executor.maintain()
+    assert pid in executor._processes  # still running
+
+    executor.kill(run)
+    executor._processes[pid].join(5)
+    assert not executor.is_alive(run)
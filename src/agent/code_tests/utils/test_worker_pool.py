@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+from multiprocessing import Queue
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tests.common import BaseTest
+from utils import worker_pool
+from utils.exceptions import TransactionError
+
+
+class Test(BaseTest):
+    __test__ = False  # not a pytest class, the workers run it as a test module
+
+    def run(self, params: dict, run_id: int) -> None:
+        time.sleep(params.get("sleep", 0))
+        if params.get("crash"):
+            raise RuntimeError("crashed test")
+        self.process_message({"run_id": run_id, "status": "success", "data": {"pid": os.getpid()}})
+
+
+test_module = sys.modules[__name__]
+
+
+def wait_for_idle_worker(pool: worker_pool.WorkerPool, timeout: float = 5.0) -> None:
+    until = time.time() + timeout
+    while time.time() < until:
+        pool.maintain()
+        if pool.get_capacity():
+            return
+        time.sleep(0.01)
+    raise TimeoutError("No worker became idle.")
+
+
+@pytest.fixture
+def pool():
+    with patch("utils.logs.debug"):
+        pool = worker_pool.WorkerPool(Queue(), size=1, max_runs=2, max_memory=1024)
+        yield pool
+        pool.close()
+
+
+def test_WorkerPool_runs_tests_in_the_same_worker(pool):
+    with patch("utils.logs.debug"):
+        first_pid = pool.start("test", test_module, "{}", 1)
+        assert pool.get_capacity() == 0
+        result = pool._results_queue.get(timeout=5)
+        assert result == {"run_id": 1, "status": "success", "data": {"pid": first_pid}}
+
+        wait_for_idle_worker(pool)
+        second_pid = pool.start("test", test_module, "{}", 2)
+        assert pool._results_queue.get(timeout=5)["data"]["pid"] == first_pid
+        assert second_pid == first_pid
+
+        # the worker is recycled after max_runs runs
+        wait_for_idle_worker(pool)
+        third_pid = pool.start("test", test_module, "{}", 3)
+        assert pool._results_queue.get(timeout=5)["data"]["pid"] == third_pid
+        assert third_pid != first_pid
+
+
+def test_WorkerPool_survives_crashed_test(pool):
+    with patch("utils.logs.debug"):
+        pid = pool.start("test", test_module, '{"crash": true}', 1)
+        wait_for_idle_worker(pool)
+        # the crashed run is not alive anymore, but the worker is ready for another one
+        assert not pool.is_alive(MagicMock(pid=pid, id_run=1))
+        assert pool.start("test", test_module, "{}", 2) == pid
+
+
+def test_WorkerPool_terminate_replaces_worker(pool):
+    with patch("utils.logs.debug"):
+        pid = pool.start("test", test_module, '{"sleep": 60}', 1)
+        run = MagicMock(pid=pid, id_run=1)
+        assert pool.is_alive(run)
+        # other runs in the same worker are not affected
+        assert not pool.is_alive(MagicMock(pid=pid, id_run=2))
+
+        pool.terminate(run)
+        wait_for_idle_worker(pool)
+        assert not pool.is_alive(run)
+        assert pool.start("test", test_module, "{}", 2) != pid
+
+
+def test_WorkerPool_invalid_params(pool):
+    with pytest.raises(TransactionError):
+        pool.start("test", test_module, "not a json", 1)
+    assert pool.get_capacity() == 1  # the worker is not used
+
+
+def test_WorkerPool_without_idle_worker(pool):
+    # the pipe of the only idle worker is broken
+    pool._workers[0].connection.close()
+    with patch("utils.logs.warning") as mock_logs_warning:
+        assert pool.start("test", test_module, "{}", 1) is None
+    mock_logs_warning.assert_called_once()
+    assert pool._workers[0].retiring
+
+
+@pytest.mark.parametrize("method, process_function", [("terminate", "terminate_process"), ("kill", "kill_process")])
+def test_WorkerPool_unknown_process(pool, method, process_function):
+    # runs started before the restart of the tests manager are handled directly
+    run = MagicMock(pid=123456789, id_run=1)
+    with patch(f"utils.processes.{process_function}") as mock_process_function:
+        with patch("utils.processes.is_process_alive", return_value=True) as mock_is_process_alive:
+            assert pool.is_alive(run)
+            getattr(pool, method)(run)
+    mock_is_process_alive.assert_called_once_with(run.pid)
+    mock_process_function.assert_called_once_with(run.pid)
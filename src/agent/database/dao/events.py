@@ -1,6 +1,7 @@
-from typing import Optional, Sequence
+from typing import Iterator, Optional, Sequence, Tuple
 
 from database.dao.generic import RecordsCounter
+from sqlalchemy import Row
 
 import api.schemas.all as schemas
 import database.connection as connection
@@ -24,14 +25,34 @@ class Events(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def create_many(
+        self,
+        events: Sequence[Tuple[int, schemas.EventCreate]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        data = [dict(event.model_dump(), id_test=id_test) for id_test, event in events]
+        created_rows = self._create_records(data, transaction_finished)
+        return created_rows
+
+    def get_all(self) -> Optional[Sequence[models.Event]]:
+        return self._get_records(True)
+
     def get_all_until_run_threshold(
         self, until: float
     ) -> Optional[Sequence[models.Event]]:
         return self._get_records(models.Event.run_at <= until)
 
+    def get_all_with_tests_until_run_threshold(
+        self, until: float
+    ) -> Optional[Sequence[Tuple[models.Event, models.Test]]]:
+        return self._get_records_with(models.Test, models.Event.run_at <= until)
+
     def get_all_by_test_id(self, id_test: int) -> Optional[Sequence[models.Event]]:
         return self._get_records(models.Event.id_test == id_test)
 
+    def get_rows_by_test_id(self, id_test: int) -> Sequence[Row]:
+        return self._get_rows(models.Event.id_test == id_test)
+
     def count_records_in_table(self) -> RecordsCounter:
         result = RecordsCounter(self._count_records())
         return result
@@ -42,6 +63,21 @@ class Events(generic.Generic):
         )
         return deleted_rows
 
+    def delete_by_ids(self, event_ids: Sequence[int], transaction_finished: Optional[bool] = None) -> Optional[int]:
+        deleted_rows = self._delete_records_by_ids(
+            models.Event.id_event, event_ids, transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
+    def delete_all_by_test_ids(self, test_ids: Sequence[int], transaction_finished: Optional[bool] = None) -> Optional[int]:
+        deleted_rows = self._delete_records(
+            models.Event.id_test.in_(test_ids), transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Event.run_at < threshold)
         return deleted_rows
+
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        return self._delete_records_in_chunks(models.Event.run_at < threshold, models.Event.id_event, chunk_size)
@@ -1,14 +1,20 @@
+import functools
+import inspect
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Type
 
 import sqlalchemy.orm
-from sqlalchemy import delete, func, literal_column, select, update
+from sqlalchemy import bindparam, delete, func, literal_column, select, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
 
 import database.connection as connection
-from utils import logs
+from utils import logs, metrics
+
+IDS_CHUNK_SIZE = 10000  # below the limit of the bound parameters in one SQLite statement
+STREAM_CHUNK_SIZE = 1000
 
 
 @dataclass
@@ -25,13 +31,73 @@ class RecordsCounter:
         for category, count in self.categories.items():
             total_count += count
             yield category, count
-        yield "all", total_count
+        # the tables without categories have only the total count
+        yield "all", total_count if len(self.categories) else self.counter
+
+
+def with_dao_method(function, method: str):
+    """
+    Sets the name of the running DAO method for the metrics of its statements, the stack is not inspected.
+    """
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        previous, self._dao_method = self._dao_method, method
+        try:
+            result = function(self, *args, **kwargs)
+        finally:
+            self._dao_method = previous
+        if inspect.isgenerator(result):
+            return iterate_with_dao_method(self, result, method)  # the statements run during the iteration
+        return result
+    wrapper.dao_method = method
+    wrapper.unlabelled = function
+    return wrapper
+
+
+def iterate_with_dao_method(dao: "Generic", iterator: Iterator, method: str) -> Iterator:
+    while True:
+        previous, dao._dao_method = dao._dao_method, method
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            dao._dao_method = previous
+        yield item
+
+
+def label_dao_methods(dao_class: Optional[Type["Generic"]] = None) -> None:
+    """
+    Wraps the public methods of the DAO class and its subclasses, also the inherited ones, to name them
+    in the metrics of their statements. Without the metrics the methods are called directly.
+    """
+    classes = [dao_class or Generic]
+    while len(classes):
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        if cls is Generic:
+            continue
+        for name in dir(cls):
+            function = getattr(cls, name)
+            if name.startswith("_") or not inspect.isfunction(function):
+                continue
+            method = f"{cls.__name__}.{name}"
+            if getattr(function, "dao_method", None) != method:
+                setattr(cls, name, with_dao_method(getattr(function, "unlabelled", function), method))
 
 
 class Generic(ABC):
+    _dao_method: Optional[str] = None
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if metrics.enabled():
+            label_dao_methods(cls)  # the DAO defined after the metrics setup
+
     def __init__(self, session: connection.Session) -> None:
         self._session = session
         self.table: Optional[connection.Base] = None
+        self.category_column = None  # the enum column counted by the statistics
 
     def __del__(self):
         self._session.close()
@@ -44,6 +110,10 @@ class Generic(ABC):
     def delete_old_records(self, threshold: int) -> int:
         pass
 
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        # the tables without many records are deleted at once
+        yield self.delete_old_records(threshold)
+
     @abstractmethod
     def count_records_in_table(self) -> RecordsCounter:
         pass
@@ -51,11 +121,16 @@ class Generic(ABC):
     def update_session(self, new_session: connection.Session) -> None:
         self._session = new_session
 
-    def __execute(self, query, error: str) -> Any:
+    def __execute(self, query, error: str, parameters: Optional[Sequence[Dict[str, Any]]] = None) -> Any:
+        started = time.perf_counter()
         try:
-            return self._session.execute(query)
+            return self._session.execute(query, parameters)
         except SQLAlchemyError:
             logs.error(error)
+        finally:
+            if metrics.enabled():
+                method = self._dao_method or type(self).__name__
+                metrics.observe("agent_db_statement_seconds", time.perf_counter() - started, method=method)
 
     def __commit(self) -> None:
         self._session.commit()
@@ -74,6 +149,41 @@ class Generic(ABC):
         result = self.table(**result)
         return result
 
+    def __translate_synonyms(self, data: Sequence[Dict[str, Any]]) -> Sequence[Dict[str, Any]]:
+        # bulk statements work with the columns, so the synonyms (e.g. id_test for fk_tests) must be translated
+        synonyms = {name: synonym.name for name, synonym in sqlalchemy.inspect(self.table).synonyms.items()}
+        if not len(synonyms):
+            return data
+        return [{synonyms.get(key, key): value for key, value in row.items()} for row in data]
+
+    def _create_records(
+        self, data: Sequence[Dict[str, Any]], transaction_finished: Optional[bool] = None
+    ) -> int:
+        if not len(data):
+            return 0
+        error = f"Unable to create records in the '{self.table.__tablename__}' table."
+        if transaction_finished is True:
+            error += " The query is part of the SQL transaction."
+        self.__execute(sqlalchemy.insert(self.table), error, self.__translate_synonyms(data))
+        if transaction_finished in (None, True):
+            self.__commit()
+        return len(data)
+
+    def _create_records_returning(
+        self, data: Sequence[Dict[str, Any]], columns: Sequence[Any], transaction_finished: Optional[bool] = None
+    ) -> Sequence[Tuple]:
+        if not len(data):
+            return []
+        error = f"Unable to create records in the '{self.table.__tablename__}' table."
+        if transaction_finished is True:
+            error += " The query is part of the SQL transaction."
+        # the rows are inserted in batches of the dialect, the returned values keep the order of the data
+        query = sqlalchemy.insert(self.table).returning(*columns, sort_by_parameter_order=True)
+        result = self.__execute(query, error, self.__translate_synonyms(data)).all()
+        if transaction_finished in (None, True):
+            self.__commit()
+        return result
+
     def _change_records(
         self,
         query,
@@ -104,6 +214,52 @@ class Generic(ABC):
             logs.error(error)
         return result
 
+    def _get_records_with(
+        self, joined_table: connection.Base, condition=None
+    ) -> Optional[Sequence[Tuple[connection.Base, connection.Base]]]:
+        if condition is None:
+            condition = sqlalchemy.true()
+        query = select(self.table, joined_table).join(joined_table).where(condition)
+        error = f"Unable to get records from the '{self.table.__tablename__}' table joined with the '{joined_table.__tablename__}' table."
+        response = self.__execute(query, error)
+        result = response.tuples().all()
+        return result
+
+    def _get_rows(self, condition=None, order_by=None) -> Sequence[sqlalchemy.Row]:
+        if condition is None:
+            condition = sqlalchemy.true()
+        # plain tuples of all the columns in the order of the table, no ORM objects are built
+        query = select(*self.table.__table__.columns).where(condition).order_by(order_by)
+        error = f"Unable to get records from the '{self.table.__tablename__}' table."
+        response = self.__execute(query, error)
+        return response.all()
+
+    def _get_column_values(self, column, condition=None, order_by=None) -> Optional[Sequence[Any]]:
+        if condition is None:
+            condition = sqlalchemy.true()
+        query = select(column).where(condition).order_by(order_by)
+        error = f"Unable to get values of the '{column.key}' column from the '{self.table.__tablename__}' table."
+        response = self.__execute(query, error)
+        result = response.scalars().all()
+        return result
+
+    def _iterate_rows(
+        self, columns: Sequence[Any], condition=None, order_by=None, limit: Optional[int] = None
+    ) -> sqlalchemy.Result:
+        if condition is None:
+            condition = sqlalchemy.true()
+        # the statement runs now, the plain rows are fetched in chunks from a server-side cursor
+        # and the whole result is never held in memory
+        query = (
+            select(*columns)
+            .where(condition)
+            .order_by(order_by)
+            .limit(limit)
+            .execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        error = f"Unable to get records from the '{self.table.__tablename__}' table."
+        return self.__execute(query, error)
+
     def _get_record(self, condition=None) -> Optional[connection.Base]:
         records = self._get_records(condition)
         if len(records):
@@ -119,6 +275,20 @@ class Generic(ABC):
         result = response.scalar()
         return result
 
+    def _count_records_by_category(self) -> RecordsCounter:
+        # all the categories are counted by one scan of the table, the filtered counts don't need to sort like GROUP BY
+        categories = list(self.category_column.type.enum_class)
+        query = select(*(func.count().filter(self.category_column == category) for category in categories))
+        error = f"Unable to count rows from {self.table.__tablename__} table."
+        response = self.__execute(query, error)
+        return self.create_records_counter(dict(zip(categories, response.one())))
+
+    def create_records_counter(self, counts: Dict[Any, int]) -> RecordsCounter:
+        result = RecordsCounter()
+        for category in self.category_column.type.enum_class:
+            result.add(category, counts.get(category, 0))
+        return result
+
     def _get_last_record(self, column) -> Optional[connection.Base]:
         query = select(self.table).order_by(column.desc()).limit(1)
         error = f"Unable to get last ID from the '{self.table.__tablename__}' table."
@@ -142,6 +312,43 @@ class Generic(ABC):
         )
         return result
 
+    def _update_records_by_primary_key(
+        self,
+        changes: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        primary_key = self.table.__table__.primary_key.columns[0]
+        return self._update_records_by_key(primary_key, changes, transaction_finished)
+
+    def _update_records_by_key(
+        self,
+        key_column,
+        changes: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+        condition=None,
+    ) -> int:
+        if not len(changes):
+            return 0
+        if condition is None:
+            condition = sqlalchemy.true()
+        error = f"Unable to update records from the '{self.table.__tablename__}' table."
+        if transaction_finished is True:
+            error += " The query is part of the SQL transaction."
+        changes = self.__translate_synonyms(changes)
+        # Core executemany, unlike the ORM bulk update, doesn't fail when some of the records were deleted meanwhile
+        table = self.table.__table__
+        columns = [column for column in changes[0] if column != key_column.name]
+        query = (
+            update(table)
+            .where(key_column == bindparam(f"b_{key_column.name}"), condition)
+            .values({column: bindparam(f"b_{column}") for column in columns})
+        )
+        parameters = [{f"b_{column}": value for column, value in change.items()} for change in changes]
+        result = self.__execute(query, error, parameters)
+        if transaction_finished in (None, True):
+            self.__commit()
+        return result.rowcount
+
     def _delete_records(
         self,
         condition,
@@ -156,3 +363,51 @@ class Generic(ABC):
             query, error, transaction_finished, change_required
         )
         return result
+
+    def _delete_records_in_chunks(self, condition, id_column, chunk_size: int) -> Iterator[int]:
+        """
+        Deletes the records in ranges of chunk_size IDs and commits every range,
+        so the write lock is released between the chunks.
+        """
+        error = f"Unable to delete records from the '{self.table.__tablename__}' table."
+        query = select(func.min(id_column), func.max(id_column)).where(condition)
+        first_id, last_id = self.__execute(query, error).one()
+        self.__commit()
+        if first_id is None:
+            return
+        for chunk_start in range(first_id, last_id + 1, chunk_size):
+            query = (
+                delete(self.table)
+                .where(condition, id_column >= chunk_start, id_column < chunk_start + chunk_size)
+                .execution_options(synchronize_session=False)
+            )
+            deleted_rows = self.__execute(query, error).rowcount
+            self.__commit()
+            yield deleted_rows
+
+    def _delete_records_by_ids(
+        self,
+        column,
+        ids: Sequence[Any],
+        transaction_finished: Optional[bool] = None,
+    ) -> Optional[int]:
+        error = f"Unable to delete records from the '{self.table.__tablename__}' table."
+        if transaction_finished is True:
+            error += " The query is part of the SQL transaction."
+        ids = list(ids)
+        deleted_rows = 0
+        for i in range(0, len(ids), IDS_CHUNK_SIZE):
+            # the deleted objects are not synchronized with the session, evaluating a long IN list for every loaded object is slow
+            query = (
+                delete(self.table)
+                .where(column.in_(ids[i:i + IDS_CHUNK_SIZE]))
+                .execution_options(synchronize_session=False)
+            )
+            deleted_rows += self.__execute(query, error).rowcount
+        if transaction_finished in (None, True):
+            self.__commit()
+            return deleted_rows
+        return None
+
+
+metrics.add_setup_hook(label_dao_methods)
@@ -0,0 +1,67 @@
+from typing import Optional, Sequence
+
+from database.dao.generic import RecordsCounter
+from sqlalchemy import or_, select
+
+import database.connection as connection
+import database.dao.generic as generic
+import database.models.all as models
+
+
+class MultiResultTests(generic.Generic):
+    def __init__(self, session: connection.Session) -> None:
+        super().__init__(session)
+        self.table = models.MultiResultTest
+
+    def create(
+        self, id_multi_result: int, id_test: int, transaction_finished: Optional[bool] = None
+    ) -> Optional[models.MultiResultTest]:
+        data = {"fk_multi_results": id_multi_result, "fk_tests": id_test}
+        record = self._create_record(data, transaction_finished)
+        return record
+
+    def get_test_ids(self, id_multi_result: int) -> Optional[Sequence[int]]:
+        """
+        IDs of the tests in the order in which they were added.
+        """
+        return self._get_column_values(
+            models.MultiResultTest.id_test,
+            models.MultiResultTest.id_multi_result == id_multi_result,
+            models.MultiResultTest.id_multi_result_test,
+        )
+
+    def count_records_in_table(self) -> RecordsCounter:
+        result = RecordsCounter(self._count_records())
+        return result
+
+    def delete_by_multi_results(self, condition, transaction_finished: Optional[bool] = None) -> Optional[int]:
+        """
+        Deletes the tests of the multi results matching the condition.
+        """
+        multi_result_ids = select(models.MultiResult.id_multi_result).where(condition)
+        deleted_rows = self._delete_records(
+            models.MultiResultTest.id_multi_result.in_(multi_result_ids), transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
+    def delete_by_tests(self, condition, transaction_finished: Optional[bool] = None) -> Optional[int]:
+        """
+        Deletes the multi result tests of the tests matching the condition.
+        """
+        test_ids = select(models.Test.id_test).where(condition)
+        deleted_rows = self._delete_records(
+            models.MultiResultTest.id_test.in_(test_ids), transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
+    def delete_old_records(self, threshold: int) -> int:
+        # the records don't have any time, the records left without their multi result or test are removed
+        multi_result_ids = select(models.MultiResult.id_multi_result)
+        test_ids = select(models.Test.id_test)
+        deleted_rows = self._delete_records(
+            or_(
+                models.MultiResultTest.id_multi_result.not_in(multi_result_ids),
+                models.MultiResultTest.id_test.not_in(test_ids),
+            )
+        )
+        return deleted_rows
@@ -1,7 +1,8 @@
 import time
-from typing import Optional
+from typing import Optional, Sequence
 
 from database.dao.generic import RecordsCounter
+from database.dao.multi_result_tests import MultiResultTests
 
 import api.schemas.all as schemas
 import database.connection as connection
@@ -13,18 +14,21 @@ class MultiResults(generic.Generic):
     def __init__(self, session: connection.Session) -> None:
         super().__init__(session)
         self.table = models.MultiResult
+        self.__tests = MultiResultTests(session)
+
+    def update_session(self, new_session: connection.Session) -> None:
+        super().update_session(new_session)
+        self.__tests.update_session(new_session)
 
     def create(
         self,
         orchestrator_name: str,
-        test_ids: str,
         data: schemas.MultiResultCreate,
         last_used_time: Optional[float] = None,
         transaction_finished: Optional[bool] = None,
     ) -> Optional[models.MultiResult]:
         data = data.model_dump()
         data["orchestrator_name"] = orchestrator_name
-        data["test_ids"] = test_ids
         if last_used_time:
             data["last_used_time"] = last_used_time
         else:
@@ -33,33 +37,40 @@ class MultiResults(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def add_test(
+        self, multi_result_id: int, id_test: int, transaction_finished: Optional[bool] = None
+    ) -> None:
+        self.__tests.create(multi_result_id, id_test, transaction_finished)
+
     def get_by_id(self, multi_result_id: int) -> Optional[models.MultiResult]:
         return self._get_record(models.MultiResult.id_multi_result == multi_result_id)
 
-    def update_test_ids(self, multi_result_id: int, test_ids: str) -> int:
-        updated_rows = self._update_records(
-            {"test_ids": test_ids},
-            models.MultiResult.id_multi_result == multi_result_id,
-        )
-        return updated_rows
+    def get_test_ids(self, multi_result_id: int) -> Optional[Sequence[int]]:
+        return self.__tests.get_test_ids(multi_result_id)
 
     def count_records_in_table(self) -> RecordsCounter:
         result = RecordsCounter(self._count_records())
         return result
 
-    def update_last_used_time(self, multi_result_id: int, last_used_time: float) -> int:
+    def update_last_used_time(
+        self, multi_result_id: int, last_used_time: float, transaction_finished: Optional[bool] = None
+    ) -> int:
         updated_rows = self._update_records(
             {"last_used_time": last_used_time},
             models.MultiResult.id_multi_result == multi_result_id,
+            transaction_finished=transaction_finished,
         )
         return updated_rows
 
     def delete_by_orchestrator(self, orchestrator_name: str) -> int:
-        deleted_rows = self._delete_records(models.MultiResult.orchestrator_name == orchestrator_name)
+        condition = models.MultiResult.orchestrator_name == orchestrator_name
+        self.__tests.delete_by_multi_results(condition, transaction_finished=False)
+        deleted_rows = self._delete_records(condition)
         return deleted_rows
 
     def delete_old_records(self, threshold: int) -> int:
-        deleted_rows = self._delete_records(
-            models.MultiResult.last_used_time < threshold
-        )
+        condition = models.MultiResult.last_used_time < threshold
+        self.__tests.delete_by_multi_results(condition, transaction_finished=False)
+        deleted_rows = self._delete_records(condition)
+        self.__tests.delete_old_records(threshold)
         return deleted_rows
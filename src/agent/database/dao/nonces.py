@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Sequence
 
 from database.dao.generic import RecordsCounter
+from sqlalchemy.dialects.postgresql import insert
 
 import database.connection as connection
 import database.dao.generic as generic
@@ -19,13 +20,40 @@ class Nonces(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def create_many(
+        self, nonces: Sequence[Dict[str, Any]], transaction_finished: Optional[bool] = None
+    ) -> int:
+        created_rows = self._create_records(nonces, transaction_finished)
+        return created_rows
+
+    def claim(self, nonce: str, used_at: float) -> bool:
+        """
+        Returns False if the nonce is already stored, e.g. it has been used through another API worker.
+        """
+        query = (
+            insert(models.Nonce)
+            .values(nonce=nonce, used_at=used_at)
+            .on_conflict_do_nothing(index_elements=["nonce"])
+        )
+        error = "Unable to claim the nonce."
+        return self._change_records(query, error) == 1
+
     def get_by_nonce(self, nonce: str) -> Optional[models.Nonce]:
         return self._get_records(models.Nonce.nonce == nonce)
 
+    def get_all_used_since(self, threshold: float) -> Optional[Sequence[models.Nonce]]:
+        return self._get_records(models.Nonce.used_at >= threshold)
+
     def count_records_in_table(self) -> RecordsCounter:
         result = RecordsCounter(self._count_records())
         return result
 
+    def delete_by_nonces(self, nonces: Sequence[str], transaction_finished: Optional[bool] = None) -> Optional[int]:
+        deleted_rows = self._delete_records_by_ids(
+            models.Nonce.nonce, nonces, transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Nonce.used_at < threshold)
         return deleted_rows
@@ -1,7 +1,7 @@
-from typing import Optional, Sequence
+from typing import Iterator, Optional, Sequence
 
 from database.dao.generic import RecordsCounter
-from sqlalchemy import and_
+from sqlalchemy import Row, and_
 
 import database.connection as connection
 import database.dao.generic as generic
@@ -33,6 +33,9 @@ class OldParams(generic.Generic):
     def get_all_by_test_id(self, id_test: int) -> Optional[Sequence[models.OldParams]]:
         return self._get_records(models.OldParams.id_test == id_test)
 
+    def get_rows_by_test_id(self, id_test: int) -> Sequence[Row]:
+        return self._get_rows(models.OldParams.id_test == id_test)
+
     def get_by_test_id_and_version(
         self, id_test: int, version: int
     ) -> Optional[models.OldParams]:
@@ -50,3 +53,8 @@ class OldParams(generic.Generic):
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.OldParams.changed < threshold)
         return deleted_rows
+
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        return self._delete_records_in_chunks(
+            models.OldParams.changed < threshold, models.OldParams.id_old_params, chunk_size
+        )
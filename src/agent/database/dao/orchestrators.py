@@ -1,6 +1,7 @@
-from typing import Optional, Sequence
+from typing import Dict, Optional, Sequence
 
 from database.dao.generic import RecordsCounter
+from sqlalchemy import bindparam
 from sqlalchemy.dialects.postgresql import insert
 
 import database.connection as connection
@@ -41,6 +42,16 @@ class Orchestrators(generic.Generic):
         changes = {"last_seen": last_seen}
         self._update_records(changes, condition, change_required=True)
 
+    def update_last_seen_many(
+        self, last_seen: Dict[str, float], transaction_finished: Optional[bool] = None
+    ) -> int:
+        changes = [{"name": name, "last_seen": seen} for name, seen in last_seen.items()]
+        table = models.Orchestrator.__table__
+        # the API workers store their times independently, a newer time is never overwritten by an older one
+        newer = table.c.last_seen < bindparam("b_last_seen")
+        updated_rows = self._update_records_by_key(table.c.name, changes, transaction_finished, newer)
+        return updated_rows
+
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Orchestrator.last_seen < threshold)
         return deleted_rows
@@ -0,0 +1,111 @@
+from typing import Dict, Optional, Sequence, Set
+
+from sqlalchemy import column, func, insert, literal, select, table, text
+
+from database.dao.generic import RecordsCounter
+
+import database.connection as connection
+import database.dao.generic as generic
+import database.models.all as models
+
+TRIGGER_PREFIX = "record_counters_"
+ALL_CATEGORY = "all"
+
+sqlite_master = table("sqlite_master", column("type"), column("name"), column("tbl_name"))
+
+
+class RecordCounters(generic.Generic):
+    """
+    Numbers of the records per table and category kept up to date by the triggers of the counted tables,
+    the statistics are read from them instead of scanning the tables. Only SQLite is supported.
+    """
+
+    def __init__(self, session: connection.Session) -> None:
+        super().__init__(session)
+        self.table = models.RecordCounter
+
+    def create(
+        self, table_name: str, category: str, value: int, transaction_finished: Optional[bool] = None
+    ) -> Optional[models.RecordCounter]:
+        data = {"table": table_name, "category": category, "value": value}
+        record = self._create_record(data, transaction_finished)
+        return record
+
+    def count_records_in_table(self) -> RecordsCounter:
+        result = RecordsCounter(self._count_records())
+        return result
+
+    def delete_old_records(self, threshold: int) -> int:
+        return 0  # the counters are never old
+
+    def is_supported(self) -> bool:
+        return self._session.get_bind().dialect.name == "sqlite"
+
+    def get_counted_tables(self) -> Set[str]:
+        trigger_names = self._get_column_values(
+            sqlite_master.c.tbl_name,
+            (sqlite_master.c.type == "trigger") & sqlite_master.c.name.startswith(TRIGGER_PREFIX, autoescape=True),
+        )
+        return set(trigger_names)
+
+    def update_counted_tables(self, sub_dbs: Sequence[generic.Generic]) -> None:
+        """
+        Starts counting the records of the given tables and stops counting the other tables.
+        """
+        counted_tables = self.get_counted_tables()
+        table_names = {sub_db.table.__tablename__ for sub_db in sub_dbs}
+        for table_name in counted_tables - table_names:
+            self.__stop_counting(table_name)
+        for sub_db in sub_dbs:
+            if sub_db.table.__tablename__ not in counted_tables:
+                self.__start_counting(sub_db)
+
+    def __start_counting(self, sub_db: generic.Generic) -> None:
+        table_name = sub_db.table.__tablename__
+        error = f"Unable to start counting the records of the '{table_name}' table."
+        if sub_db.category_column is None:
+            new_category, old_category, category = f"'{ALL_CATEGORY}'", f"'{ALL_CATEGORY}'", literal(ALL_CATEGORY)
+        else:
+            name = sub_db.category_column.name
+            new_category, old_category, category = f"NEW.{name}", f"OLD.{name}", sub_db.category_column
+        increment = (
+            f'INSERT INTO record_counters ("table", category, value) VALUES (\'{table_name}\', {new_category}, 1) '
+            f'ON CONFLICT ("table", category) DO UPDATE SET value = value + 1;'
+        )
+        decrement = (
+            f'UPDATE record_counters SET value = value - 1 '
+            f'WHERE "table" = \'{table_name}\' AND category = {old_category};'
+        )
+        triggers = [
+            f"CREATE TRIGGER {TRIGGER_PREFIX}{table_name}_insert AFTER INSERT ON {table_name} BEGIN {increment} END",
+            f"CREATE TRIGGER {TRIGGER_PREFIX}{table_name}_delete AFTER DELETE ON {table_name} BEGIN {decrement} END",
+        ]
+        if sub_db.category_column is not None:
+            triggers.append(
+                f"CREATE TRIGGER {TRIGGER_PREFIX}{table_name}_update AFTER UPDATE OF {name} ON {table_name} "
+                f"WHEN {old_category} IS NOT {new_category} BEGIN {decrement} {increment} END"
+            )
+        # the first trigger takes the write lock, the records are counted before any other change
+        for trigger in triggers:
+            self._change_records(text(trigger), error, transaction_finished=False)
+        self._delete_records(models.RecordCounter.table == table_name, transaction_finished=False)
+        counts = select(literal(table_name), category, func.count()).select_from(sub_db.table).group_by(category)
+        query = insert(models.RecordCounter).from_select(["table", "category", "value"], counts)
+        self._change_records(query, error, transaction_finished=True)
+
+    def __stop_counting(self, table_name: str) -> None:
+        error = f"Unable to stop counting the records of the '{table_name}' table."
+        for operation in ("insert", "delete", "update"):
+            query = text(f"DROP TRIGGER IF EXISTS {TRIGGER_PREFIX}{table_name}_{operation}")
+            self._change_records(query, error, transaction_finished=False)
+        self._delete_records(models.RecordCounter.table == table_name, transaction_finished=True)
+
+    def get_records_counter(self, sub_db: generic.Generic) -> RecordsCounter:
+        rows = self._get_rows(models.RecordCounter.table == sub_db.table.__tablename__)
+        counts: Dict[str, int] = {row.category: row.value for row in rows}
+        if sub_db.category_column is None:
+            return RecordsCounter(counts.get(ALL_CATEGORY, 0))
+        categories = sub_db.category_column.type.enum_class
+        return sub_db.create_records_counter(
+            {categories[name]: value for name, value in counts.items() if name in categories.__members__}
+        )
@@ -1,6 +1,7 @@
-from typing import Optional, Sequence
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
 
 from database.dao.generic import RecordsCounter
+from sqlalchemy import Row
 
 import database.connection as connection
 import database.dao.generic as generic
@@ -30,12 +31,26 @@ class Requests(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def create_many(
+        self,
+        requests: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        created_rows = self._create_records(requests, transaction_finished)
+        return created_rows
+
     def get_all(self) -> Optional[Sequence[models.Request]]:
         return self._get_records(True)
 
+    def get_all_with_tests(self) -> Optional[Sequence[Tuple[models.Request, models.Test]]]:
+        return self._get_records_with(models.Test)
+
     def get_all_by_test_id(self, id_test: int) -> Optional[Sequence[models.Request]]:
         return self._get_records(models.Request.id_test == id_test)
 
+    def get_rows_by_test_id(self, id_test: int) -> Sequence[Row]:
+        return self._get_rows(models.Request.id_test == id_test)
+
     def count_records_in_table(self) -> RecordsCounter:
         result = RecordsCounter(self._count_records())
         return result
@@ -49,6 +64,21 @@ class Requests(generic.Generic):
         )
         return deleted_rows
 
+    def delete_by_ids(
+        self, request_ids: Sequence[int], transaction_finished: Optional[bool] = None
+    ) -> Optional[int]:
+        deleted_rows = self._delete_records_by_ids(
+            models.Request.id_request,
+            request_ids,
+            transaction_finished=transaction_finished,
+        )
+        return deleted_rows
+
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Request.added_time < threshold)
         return deleted_rows
+
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        return self._delete_records_in_chunks(
+            models.Request.added_time < threshold, models.Request.id_request, chunk_size
+        )
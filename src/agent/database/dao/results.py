@@ -1,7 +1,7 @@
-from typing import Optional, Sequence, Type
+from typing import Any, Dict, Iterator, Optional, Sequence, Type
 
 from database.dao.generic import RecordsCounter
-from sqlalchemy import and_
+from sqlalchemy import Result, Row, and_
 
 import database.connection as connection
 import database.dao.generic as generic
@@ -13,6 +13,7 @@ class Results(generic.Generic):
     def __init__(self, session: connection.Session) -> None:
         super().__init__(session)
         self.table = models.Result
+        self.category_column = models.Result.status
 
     def create(
         self,
@@ -39,6 +40,14 @@ class Results(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def create_many(
+        self,
+        results: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        created_rows = self._create_records(results, transaction_finished)
+        return created_rows
+
     def get_last_used_id(self) -> int:
         last_record = self._get_last_record(self.table.id_result)
         if last_record is None:
@@ -56,9 +65,33 @@ class Results(generic.Generic):
             )
         )
 
+    def get_all_in_id_range_for_tests(
+        self, test_ids: Sequence[int], since_id: int, until_id: int
+    ) -> Sequence[Type[models.Result]]:
+        return self._get_records(
+            and_(
+                models.Result.id_test.in_(test_ids),
+                models.Result.id_result > since_id,
+                models.Result.id_result <= until_id,
+            )
+        )
+
+    def get_rows_in_id_range_for_tests(self, test_ids: Sequence[int], since_id: int, until_id: int) -> Sequence[Row]:
+        return self._get_rows(
+            and_(
+                models.Result.id_test.in_(test_ids),
+                models.Result.id_result > since_id,
+                models.Result.id_result <= until_id,
+            ),
+            models.Result.id_result,
+        )
+
     def get_all_by_test_id(self, id_test: int) -> Optional[Sequence[models.Result]]:
         return self._get_records(models.Result.id_test == id_test)
 
+    def get_rows_by_test_id(self, id_test: int) -> Sequence[Row]:
+        return self._get_rows(models.Result.id_test == id_test, models.Result.id_result)
+
     def get_all_since_id(
         self, id_test: int, since_id: int
     ) -> Sequence[Type[models.Result]]:
@@ -66,13 +99,37 @@ class Results(generic.Generic):
             and_(models.Result.id_test == id_test, models.Result.id_result > since_id)
         )
 
+    def get_rows_since_id(self, id_test: int, since_id: int) -> Sequence[Row]:
+        return self._get_rows(
+            and_(models.Result.id_test == id_test, models.Result.id_result > since_id), models.Result.id_result
+        )
+
+    def iterate_in_id_range(
+        self, id_test: int, since_id: int, until_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> Result:
+        """
+        Rows ordered by id_result, the since_id is excluded and the until_id is included.
+        The statement is executed by the call, the rows are fetched from the returned result.
+        """
+        condition = and_(models.Result.id_test == id_test, models.Result.id_result > since_id)
+        if until_id is not None:
+            condition = and_(condition, models.Result.id_result <= until_id)
+        columns = [column for column in models.Result.__table__.columns]
+        return self._iterate_rows(columns, condition, models.Result.id_result, limit)
+
     def count_records_in_table(self) -> RecordsCounter:
-        result = RecordsCounter()
-        for category in enums.ResultStatus:
-            rows_count = self._count_records(models.Result.status == category)
-            result.add(category, rows_count)
+        result = self._count_records_by_category()
         return result
 
+    def delete_by_ids(self, result_ids: Sequence[int], transaction_finished: Optional[bool] = None) -> Optional[int]:
+        deleted_rows = self._delete_records_by_ids(
+            models.Result.id_result, result_ids, transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Result.finished < threshold)
         return deleted_rows
+
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        return self._delete_records_in_chunks(models.Result.finished < threshold, models.Result.id_result, chunk_size)
@@ -1,7 +1,7 @@
-from typing import Optional, Sequence, Type
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Type
 
 from database.dao.generic import RecordsCounter
-from sqlalchemy import and_
+from sqlalchemy import Row, and_
 
 import database.connection as connection
 import database.dao.generic as generic
@@ -13,6 +13,7 @@ class Runs(generic.Generic):
     def __init__(self, session: connection.Session) -> None:
         super().__init__(session)
         self.table = models.Run
+        self.category_column = models.Run.state
 
     def create(
         self,
@@ -39,14 +40,41 @@ class Runs(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def create_many(
+        self,
+        runs: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        created_rows = self._create_records(runs, transaction_finished)
+        return created_rows
+
+    def create_many_returning_ids(
+        self,
+        runs: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> List[int]:
+        """
+        IDs of the created runs are in the same order as the runs.
+        """
+        created_rows = self._create_records_returning(runs, [models.Run.id_run], transaction_finished)
+        return [row.id_run for row in created_rows]
+
     def get_by_id(self, run_id: int) -> Optional[models.Run]:
         return self._get_record(models.Run.id_run == run_id)
 
+    def get_all_by_ids(self, run_ids: Sequence[int]) -> Optional[Sequence[models.Run]]:
+        return self._get_records(models.Run.id_run.in_(run_ids))
+
     def get_all_by_state(
         self, state: enums.RunState
     ) -> Optional[Sequence[Type[models.Run]]]:
         return self._get_records((models.Run.state == state))
 
+    def get_all_by_states(
+        self, states: Sequence[enums.RunState]
+    ) -> Optional[Sequence[Type[models.Run]]]:
+        return self._get_records(models.Run.state.in_(states))
+
     def get_all_by_state_and_deadline(
         self, state: enums.RunState, deadline: float
     ) -> Optional[Sequence[Type[models.Run]]]:
@@ -57,16 +85,19 @@ class Runs(generic.Generic):
     def get_all_by_test_id(self, id_test: int) -> Optional[Sequence[models.Run]]:
         return self._get_records(models.Run.id_test == id_test)
 
+    def get_rows_by_test_id(self, id_test: int) -> Sequence[Row]:
+        return self._get_rows(models.Run.id_test == id_test)
+
     def get_all_by_test_id_and_state(self, id_test: int, state: enums.RunState) -> Optional[Sequence[models.Run]]:
         return self._get_records(
             and_(models.Run.id_test == id_test, models.Run.state == state)
         )
 
+    def get_test_ids_by_state(self, state: enums.RunState) -> Set[int]:
+        return set(self._get_column_values(models.Run.id_test, models.Run.state == state))
+
     def count_records_in_table(self) -> RecordsCounter:
-        result = RecordsCounter()
-        for category in enums.RunState:
-            rows_count = self._count_records(models.Run.state == category)
-            result.add(category, rows_count)
+        result = self._count_records_by_category()
         return result
 
     def update(
@@ -93,6 +124,17 @@ class Runs(generic.Generic):
         )
         return updated_rows
 
+    def update_many(
+        self,
+        changes: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        """
+        Every change contains id_run and the changed columns, all the changes must contain the same columns.
+        """
+        updated_rows = self._update_records_by_primary_key(changes, transaction_finished)
+        return updated_rows
+
     def update_state(
         self,
         run_id: int,
@@ -114,6 +156,15 @@ class Runs(generic.Generic):
         )
         return deleted_rows
 
+    def delete_by_ids(self, run_ids: Sequence[int], transaction_finished: Optional[bool] = None) -> Optional[int]:
+        deleted_rows = self._delete_records_by_ids(
+            models.Run.id_run, run_ids, transaction_finished=transaction_finished
+        )
+        return deleted_rows
+
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Run.planned < threshold)
         return deleted_rows
+
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        return self._delete_records_in_chunks(models.Run.planned < threshold, models.Run.id_run, chunk_size)
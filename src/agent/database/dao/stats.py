@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional, Sequence
 
 from database.dao.generic import RecordsCounter
 
@@ -24,6 +24,10 @@ class Stats(generic.Generic):
         record = self._create_record(data, transaction_finished)
         return record
 
+    def create_many(self, stats: Sequence[Dict[str, Any]], transaction_finished: Optional[bool] = None) -> int:
+        created_rows = self._create_records(stats, transaction_finished)
+        return created_rows
+
     def count_records_in_table(self) -> RecordsCounter:
         result = RecordsCounter(self._count_records())
         return result
@@ -31,3 +35,6 @@ class Stats(generic.Generic):
     def delete_old_records(self, threshold: int) -> int:
         deleted_rows = self._delete_records(models.Stats.time < threshold)
         return deleted_rows
+
+    def delete_old_records_in_chunks(self, threshold: int, chunk_size: int) -> Iterator[int]:
+        return self._delete_records_in_chunks(models.Stats.time < threshold, models.Stats.id_stats, chunk_size)
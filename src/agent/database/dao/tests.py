@@ -1,6 +1,8 @@
-from typing import Optional, Sequence
+from typing import Any, Dict, Optional, Sequence
 
 from database.dao.generic import RecordsCounter
+from database.dao.multi_result_tests import MultiResultTests
+from sqlalchemy import Row
 
 import api.schemas.all as schemas
 import database.connection as connection
@@ -13,6 +15,12 @@ class Tests(generic.Generic):
     def __init__(self, session: connection.Session) -> None:
         super().__init__(session)
         self.table = models.Test
+        self.category_column = models.Test.state
+        self.__multi_result_tests = MultiResultTests(session)
+
+    def update_session(self, new_session: connection.Session) -> None:
+        super().update_session(new_session)
+        self.__multi_result_tests.update_session(new_session)
 
     def create(
         self,
@@ -28,14 +36,17 @@ class Tests(generic.Generic):
     def get_by_id(self, id_test: int) -> Optional[models.Test]:
         return self._get_record(models.Test.id_test == id_test)
 
+    def get_all_by_ids(self, test_ids: Sequence[int]) -> Optional[Sequence[models.Test]]:
+        return self._get_records(models.Test.id_test.in_(test_ids))
+
     def get_all(self) -> Optional[Sequence[models.Test]]:
         return self._get_records(True)
 
+    def get_all_rows(self) -> Sequence[Row]:
+        return self._get_rows(order_by=models.Test.id_test)
+
     def count_records_in_table(self) -> RecordsCounter:
-        result = RecordsCounter()
-        for category in enums.TestState:
-            rows_count = self._count_records(models.Test.state == category)
-            result.add(category, rows_count)
+        result = self._count_records_by_category()
         return result
 
     def update(
@@ -109,6 +120,17 @@ class Tests(generic.Generic):
         )
         return updated_rows
 
+    def update_last_results(
+        self,
+        changes: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        """
+        Every change contains id_test, last_result_status and last_result_time.
+        """
+        updated_rows = self._update_records_by_primary_key(changes, transaction_finished)
+        return updated_rows
+
     def update_last_started(
         self,
         id_test: int,
@@ -123,6 +145,27 @@ class Tests(generic.Generic):
         )
         return updated_rows
 
+    def update_last_started_many(
+        self,
+        changes: Sequence[Dict[str, Any]],
+        transaction_finished: Optional[bool] = None,
+    ) -> int:
+        """
+        Every change contains id_test and last_started_time.
+        """
+        updated_rows = self._update_records_by_primary_key(changes, transaction_finished)
+        return updated_rows
+
+    def update_last_downloaded_time_many(
+        self, test_ids: Sequence[int], last_downloaded_time: float, transaction_finished: Optional[bool] = None
+    ) -> Optional[int]:
+        updated_rows = self._update_records(
+            {"last_downloaded_time": last_downloaded_time},
+            models.Test.id_test.in_(test_ids),
+            transaction_finished=transaction_finished,
+        )
+        return updated_rows
+
     def update_last_downloaded_time(
         self, id_test: int, last_downloaded_time: float
     ) -> int:
@@ -133,7 +176,8 @@ class Tests(generic.Generic):
         return updated_rows
 
     def delete_old_records(self, threshold: int) -> int:
-        deleted_rows = self._delete_records(
-            models.Test.last_downloaded_time < threshold
-        )
+        condition = models.Test.last_downloaded_time < threshold
+        # SQLite doesn't enforce the foreign keys, the multi result tests are deleted with the tests
+        self.__multi_result_tests.delete_by_tests(condition, transaction_finished=False)
+        deleted_rows = self._delete_records(condition)
         return deleted_rows
@@ -1,14 +1,26 @@
+from typing import Any, AsyncIterator, Callable
+
+import anyio.to_thread
+from anyio import CapacityLimiter
+
 from database import connection
 from database.dao.events import Events
 from database.dao.multi_results import MultiResults
 from database.dao.nonces import Nonces
 from database.dao.old_params import OldParams
 from database.dao.orchestrators import Orchestrators
+from database.dao.record_counters import RecordCounters
 from database.dao.requests import Requests
 from database.dao.results import Results
 from database.dao.runs import Runs
 from database.dao.stats import Stats
 from database.dao.tests import Tests
+from utils.configuration import config
+
+DB_THREADS = 8
+
+# the threads calling the database for the API, fewer than the connections in the pool of the engine
+db_threads = CapacityLimiter(DB_THREADS)
 
 
 class DAOAggregator:
@@ -19,6 +31,7 @@ class DAOAggregator:
         self.nonces = Nonces(self._session)
         self.old_params = OldParams(self._session)
         self.orchestrators = Orchestrators(self._session)
+        self.record_counters = RecordCounters(self._session)
         self.requests = Requests(self._session)
         self.results = Results(self._session)
         self.runs = Runs(self._session)
@@ -37,6 +50,7 @@ class DAOAggregator:
         self.nonces.update_session(new_session)
         self.old_params.update_session(new_session)
         self.orchestrators.update_session(new_session)
+        self.record_counters.update_session(new_session)
         self.requests.update_session(new_session)
         self.results.update_session(new_session)
         self.runs.update_session(new_session)
@@ -54,5 +68,22 @@ class DAOAggregator:
         self._session.rollback()
 
 
-def get_dao_aggregator():
-    return DAOAggregator()
+def setup_db_threads() -> None:
+    if config.exists("api", "db_threads_int"):
+        db_threads.total_tokens = config.api_db_threads_int
+
+
+async def run_in_db_thread(function: Callable[..., Any], *args: Any) -> Any:
+    """
+    Calls the blocking database function outside of the event loop, a slow query doesn't stall the other requests.
+    """
+    return await anyio.to_thread.run_sync(function, *args, limiter=db_threads)
+
+
+async def get_dao_aggregator() -> AsyncIterator[DAOAggregator]:
+    # one session per request, closed when the endpoint returns
+    db = DAOAggregator()
+    try:
+        yield db
+    finally:
+        await run_in_db_thread(db.close)
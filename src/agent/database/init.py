@@ -1,12 +1,74 @@
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import Connection, func, insert, inspect, select, text
+
 import database.connection as connection
+import database.models.all as models
 from database.daoaggregator import DAOAggregator
-from utils import enums
+from utils import enums, logs
 import api.schemas.all as schemas
 
+SCHEMA_VERSION = 3
+BASELINE_SCHEMA_VERSION = 1  # databases created before the schema versioning
+
 
 def create_tables():
     connection.Base.metadata.drop_all(connection.engine)
     connection.Base.metadata.create_all(connection.engine)
+    with connection.engine.begin() as db_connection:
+        set_schema_version(db_connection, SCHEMA_VERSION)
+
+
+def migrate_to_2(db_connection: Connection) -> None:
+    # indexes for the queries of the calendar, tests manager, results and cleaner
+    for table in (models.Event, models.Nonce, models.Request, models.Result, models.Run):
+        for index in table.__table__.indexes:
+            index.create(db_connection, checkfirst=True)
+
+
+def migrate_to_3(db_connection: Connection) -> None:
+    # the comma-separated test_ids of the multi results are moved to the multi_result_tests table
+    if "test_ids" not in {column["name"] for column in inspect(db_connection).get_columns("multi_results")}:
+        return
+    # the table was created with the cascading foreign keys, the IDs of the deleted tests are skipped
+    existing_ids = set(db_connection.execute(select(models.Test.id_test)).scalars())
+    memberships = []
+    for id_multi_result, test_ids in db_connection.execute(text("SELECT id_multi_result, test_ids FROM multi_results")):
+        for id_test in dict.fromkeys(test_ids.split(",")):
+            if len(id_test) and int(id_test) in existing_ids:
+                memberships.append({"fk_multi_results": id_multi_result, "fk_tests": int(id_test)})
+    if len(memberships):
+        db_connection.execute(insert(models.MultiResultTest), memberships)
+    db_connection.execute(text("ALTER TABLE multi_results DROP COLUMN test_ids"))
+
+
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    2: migrate_to_2,
+    3: migrate_to_3,
+}
+
+
+def get_schema_version(db_connection: Connection) -> int:
+    version = db_connection.execute(select(func.max(models.SchemaVersion.version))).scalar()
+    return version or BASELINE_SCHEMA_VERSION
+
+
+def set_schema_version(db_connection: Connection, version: int) -> None:
+    db_connection.execute(insert(models.SchemaVersion).values(version=version, applied=time.time()))
+
+
+def migrate_database():
+    # the missing tables are created, the existing ones keep their data
+    connection.Base.metadata.create_all(connection.engine)
+    with connection.engine.begin() as db_connection:
+        version = get_schema_version(db_connection)
+        for target_version in sorted(MIGRATIONS):
+            if target_version <= version:
+                continue
+            logs.info(f"Migrating the database schema to the version {target_version}.")
+            MIGRATIONS[target_version](db_connection)
+            set_schema_version(db_connection, target_version)
 
 
 def insert_values():
@@ -18,7 +80,8 @@ def insert_values():
     db.events.create(test.id_test, schemas.EventCreate(run_at=1, source=enums.EventSource.request, recovery_attempt=0))
     db.old_params.create(test.id_test, 1, 9, '{"params":"very old"}')
     db.old_params.create(test.id_test, 1, 10, '{"params":"old"}')
-    db.multi_results.create("orchestrator_1", "1", schemas.MultiResultCreate(key="KEY"), 1)
+    multi_result = db.multi_results.create("orchestrator_1", schemas.MultiResultCreate(key="KEY"), 1)
+    db.multi_results.add_test(multi_result.id_multi_result, test.id_test)
     db.nonces.create("random", 123.456)
     db.orchestrators.create("orchestrator_1", 123.456)
     db.stats.create(123.456, "stats", "all", 1)
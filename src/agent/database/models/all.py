@@ -1,10 +1,13 @@
 from database.models.event import Event
 from database.models.multi_result import MultiResult
+from database.models.multi_result_test import MultiResultTest
 from database.models.nonce import Nonce
 from database.models.old_params import OldParams
 from database.models.orchestrator import Orchestrator
+from database.models.record_counter import RecordCounter
 from database.models.request import Request
 from database.models.result import Result
 from database.models.run import Run
+from database.models.schema_version import SchemaVersion
 from database.models.stats import Stats
 from database.models.test import Test
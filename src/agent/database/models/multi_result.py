@@ -8,7 +8,6 @@ class MultiResult(connection.Base):
     __tablename__ = "multi_results"
     id_multi_result = Column(Integer, primary_key=True, autoincrement=True)
     orchestrator_name = Column(String, nullable=False, unique=True)
-    test_ids = Column(String, nullable=False)
     key = Column(String, nullable=False)
     last_used_time = Column(Double, nullable=True)
 
@@ -20,7 +19,6 @@ class MultiResult(connection.Base):
         return (
             f"<MultiResult(id_multi_result={self.id_multi_result}, "
             f"orchestrator_name='{self.orchestrator_name}', "
-            f"test_ids='{self.test_ids}', "
             f"key={self.key}, "
             f"last_used_time={last_used_time})>"
         )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.orm import synonym
+
+import database.connection as connection
+from database.models.common import BigInteger
+
+
+class MultiResultTest(connection.Base):
+    __tablename__ = "multi_result_tests"
+    __table_args__ = (
+        UniqueConstraint("fk_multi_results", "fk_tests", name="uq_multi_result_tests"),
+    )
+    id_multi_result_test = Column(BigInteger, primary_key=True, autoincrement=True)
+    fk_multi_results = Column(
+        Integer, ForeignKey("multi_results.id_multi_result", ondelete="CASCADE"), nullable=False
+    )
+    id_multi_result = synonym("fk_multi_results")
+    fk_tests = Column(BigInteger, ForeignKey("tests.id_test", ondelete="CASCADE"), nullable=False)
+    id_test = synonym("fk_tests")
+
+    class Config:  # Used in built-in configuration
+        orm_mode = True
+
+    def __repr__(self):
+        return (
+            f"<MultiResultTest(id_multi_result_test={self.id_multi_result_test}, "
+            f"fk_multi_results={self.fk_multi_results}, "
+            f"fk_tests={self.fk_tests})>"
+        )
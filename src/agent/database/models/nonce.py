@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Double, String
+from sqlalchemy import Column, Double, Index, String
 
 import database.connection as connection
 from database.models.common import timestamp_to_readable_datetime
@@ -6,6 +6,9 @@ from database.models.common import timestamp_to_readable_datetime
 
 class Nonce(connection.Base):
     __tablename__ = "nonces"
+    __table_args__ = (
+        Index("ix_nonces_used_at", "used_at"),
+    )
     nonce = Column(String, primary_key=True)
     used_at = Column(Double, nullable=False)
 
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String
+
+import database.connection as connection
+from database.models.common import BigInteger
+
+
+class RecordCounter(connection.Base):
+    __tablename__ = "record_counters"
+    table = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False)
+
+    class Config:  # Used in built-in configuration
+        orm_mode = True
+
+    def __repr__(self):
+        return f"<RecordCounter(table='{self.table}', category={self.category}, value={self.value})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Double, Enum, ForeignKey, Integer
+from sqlalchemy import Column, Double, Enum, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship, synonym
 
 import database.connection as connection
@@ -8,6 +8,9 @@ from utils import enums
 
 class Request(connection.Base):
     __tablename__ = "requests"
+    __table_args__ = (
+        Index("ix_requests_fk_tests", "fk_tests"),
+    )
     id_request = Column(BigInteger, primary_key=True, autoincrement=True)
     fk_tests = Column(BigInteger, ForeignKey("tests.id_test"), nullable=False)
     id_test = synonym("fk_tests")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Double, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, Double, Enum, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship, synonym
 
 import database.connection as connection
@@ -8,6 +8,10 @@ from utils import enums
 
 class Result(connection.Base):
     __tablename__ = "results"
+    __table_args__ = (
+        Index("ix_results_fk_tests_id_result", "fk_tests", "id_result"),
+        Index("ix_results_finished", "finished"),
+    )
     id_result = Column(BigInteger, primary_key=True, autoincrement=True)
     fk_tests = Column(BigInteger, ForeignKey("tests.id_test"), nullable=False)
     id_test = synonym("fk_tests")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Double, Integer
+
+import database.connection as connection
+from database.models.common import timestamp_to_readable_datetime
+
+
+class SchemaVersion(connection.Base):
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
+    applied = Column(Double, nullable=False)
+
+    class Config:  # Used in built-in configuration
+        orm_mode = True
+
+    def __repr__(self):
+        applied_human = timestamp_to_readable_datetime(self.applied)
+        return f"<SchemaVersion(version={self.version}, applied={applied_human})>"
@@ -1,14 +1,30 @@
+from pathlib import Path
+
 from utils import arguments
 
 
+def load_database_config(persistent_folder: Path) -> None:
+    import database.connection as connection
+    from utils.configuration import config
+
+    config.load_config(persistent_folder / "config.ini")
+    connection.setup_engine()
+
+
 def main():
     args = arguments.parse_args()
     match args.task:
         case "init_database":
             import database.init as database_init
 
+            load_database_config(args.persistent_folder)
             database_init.create_tables()
             database_init.insert_values()
+        case "migrate_database":
+            import database.init as database_init
+
+            load_database_config(args.persistent_folder)
+            database_init.migrate_database()
         case "calendar":
             from main_modules import calendar
 
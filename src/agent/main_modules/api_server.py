@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 import uvicorn as uvicorn
@@ -5,29 +6,51 @@ from fastapi import FastAPI
 
 import aaa.accounting as accounting
 import aaa.authentication as authentication
+import aaa.last_seen as last_seen
+import aaa.nonce_store as nonce_store
 import api.endpoints.auth
 import api.endpoints.multi_result
 import api.endpoints.system
 import api.endpoints.test
 import api.entrypoint
 import api.middleware
+import database.connection as connection
+import database.daoaggregator as daoaggregator
 from main_modules import initialization
-from utils import logs
+from utils import logs, metrics
 from utils.configuration import config
 from utils.exceptions import GlobalError
 
+PERSISTENT_FOLDER_VARIABLE = "AGENT_PERSISTENT_FOLDER"
+
 app: FastAPI
 
 
-def init(persistent_folder: Path) -> None:
+def get_workers_count() -> int:
+    if config.exists("api", "workers_int"):
+        return max(config.api_workers_int, 1)
+    return 1
+
+
+def init(persistent_folder: Path, worker: bool = False) -> None:
     global app
     config.load_config(persistent_folder / "config.ini")
     logs.setup_logging("api")
+    metrics.setup(persistent_folder / metrics.METRICS_FILE)
     accounting.setup()
+    if worker:
+        connection.setup_engine()  # the configuration and the database were checked by the main process
+    else:
+        initialization.pre_running_check()
     authentication.token_key = config.authentication_token_key
-    initialization.pre_running_check()
+    nonce_store.setup(shared=worker)
+    last_seen.setup()
+    daoaggregator.setup_db_threads()
 
     app = api.entrypoint.get_fastapi_object(config.public_version)
+    app.add_event_handler("shutdown", nonce_store.shutdown)
+    app.add_event_handler("shutdown", last_seen.shutdown)
+    app.add_event_handler("shutdown", accounting.shutdown)
     app.add_middleware(api.middleware.Accounting)
     app.include_router(api.endpoints.auth.router)
     app.include_router(api.endpoints.test.router)
@@ -35,18 +58,47 @@ def init(persistent_folder: Path) -> None:
     app.include_router(api.endpoints.system.router)
 
 
+def create_worker_app() -> FastAPI:
+    """
+    Called by uvicorn in every worker process.
+    """
+    init(Path(os.environ[PERSISTENT_FOLDER_VARIABLE]), worker=True)
+    return app
+
+
+def prepare_workers(persistent_folder: Path) -> None:
+    # the secrets are generated once, all the workers read the same token key and passwords
+    logs.setup_logging("api")
+    initialization.pre_running_check()
+    os.environ[PERSISTENT_FOLDER_VARIABLE] = str(persistent_folder.absolute())
+
+
 def main(persistent_folder: Path) -> None:
     global app
-    init(persistent_folder)
+    config.load_config(persistent_folder / "config.ini")
+    workers = get_workers_count()
+    if workers > 1:
+        prepare_workers(persistent_folder)
+    else:
+        init(persistent_folder)
     version = config.public_version
     uuid = config.public_uuid
     api_server_ip = config.api_server_ip
     api_server_port = config.api_server_port
     logs.debug(
-        f"Starting agent v{version} with UUID {uuid} on {api_server_ip}:{api_server_port}"
+        f"Starting agent v{version} with UUID {uuid} on {api_server_ip}:{api_server_port} ({workers} workers)"
     )
     try:
-        uvicorn.run(app, host=str(api_server_ip), port=api_server_port)
+        if workers > 1:
+            uvicorn.run(
+                f"{__name__}:create_worker_app",
+                factory=True,
+                workers=workers,
+                host=str(api_server_ip),
+                port=api_server_port,
+            )
+        else:
+            uvicorn.run(app, host=str(api_server_ip), port=api_server_port)
     except GlobalError:
         logs.error(f"Exiting the API endpoint program.")
     except SystemExit as e:
@@ -1,3 +1,4 @@
+import heapq
 import time
 from pathlib import Path
 from typing import Optional
@@ -6,9 +7,58 @@ import api.schemas.all as schemas
 import database.models.all as models
 import main_modules.initialization as initialization
 from database.daoaggregator import DAOAggregator
-from utils import enums, logs
+from utils import enums, logs, metrics, wakeup
 from utils.configuration import config
 
+DEFAULT_MAX_SLEEP = 1.0
+
+
+class PlannedEventsQueue:
+    """
+    In-memory copy of the planned run times. The events table stays the durable storage,
+    the queue only tells the calendar how long it can sleep.
+    """
+
+    def __init__(self) -> None:
+        self._run_times: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._run_times)
+
+    def load(self, db: DAOAggregator) -> None:
+        self._run_times = [event.run_at for event in db.events.get_all()]
+        heapq.heapify(self._run_times)
+
+    def push(self, run_at: float) -> None:
+        heapq.heappush(self._run_times, run_at)
+
+    def pop_due(self, now: float) -> int:
+        due_events = 0
+        while self._run_times and self._run_times[0] <= now:
+            heapq.heappop(self._run_times)
+            due_events += 1
+        return due_events
+
+    def seconds_until_next_event(self, now: float, max_sleep: float) -> float:
+        if not self._run_times:
+            return max_sleep
+        return min(max(self._run_times[0] - now, 0.0), max_sleep)
+
+
+planned_events_queue = PlannedEventsQueue()
+
+
+def prepare_event(test: models.Test,
+                  run_at: float,
+                  source: enums.EventSource,
+                  recovery_attempt: int = 0,
+    ) -> Optional[schemas.EventCreate]:
+    if test.state != enums.TestState.enabled:
+        logs.debug(f"(test {test.id_test}) new event not planned, because the state is {test.state}.")
+        return None
+    logs.debug(f"(test {test.id_test}) new event planned at {logs.friendly_time(run_at)}.")
+    return schemas.EventCreate(run_at=run_at, source=source.value, recovery_attempt=recovery_attempt)
+
 
 def insert_into_calendar(db: DAOAggregator,
                          test: models.Test,
@@ -17,16 +67,15 @@ def insert_into_calendar(db: DAOAggregator,
                          recovery_attempt: int = 0,
                          transaction_finished: Optional[bool] = None
     ) -> None:
-    if test.state != enums.TestState.enabled:
-        logs.debug(f"(test {test.id_test}) new event not planned, because the state is {test.state}.")
+    data = prepare_event(test, run_at, source, recovery_attempt)
+    if data is None:
         return
-    logs.debug(f"(test {test.id_test}) new event planned at {logs.friendly_time(run_at)}.")
-    data = schemas.EventCreate(run_at=run_at, source=source.value, recovery_attempt=recovery_attempt)
     db.events.create(
         id_test=test.id_test,
         data=data,
         transaction_finished=transaction_finished,
     )
+    planned_events_queue.push(run_at)
 
 
 class ProcessEvents:
@@ -34,6 +83,9 @@ class ProcessEvents:
         self._now = 0
         self._db = None
 
+    def _insert_into_calendar(self, *args, **kwargs) -> None:
+        insert_into_calendar(self._db, *args, **kwargs)
+
     def _calculate_next_event_time(
         self, test: models.Test, previous_run: float
     ) -> Optional[float]:
@@ -60,11 +112,41 @@ class ProcessEvents:
         next_event_time = self._calculate_next_event_time(test, previous_run)
         if next_event_time is not None:
             logs.debug(f"(test {test.id_test}) - new event planned at {logs.friendly_time(next_event_time)}.")
-            insert_into_calendar(self._db, test, next_event_time, enums.EventSource.calendar, transaction_finished=False)
+            self._insert_into_calendar(test, next_event_time, enums.EventSource.calendar, transaction_finished=False)
         else:
             logs.debug(f"(test {test.id_test}) - new event is not planned.")
 
 
+class BatchedProcessEvents(ProcessEvents):
+    """
+    Keeps the new events in memory, so all of them are inserted with one query at the end of the processing.
+    """
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self._new_events: list[tuple[int, schemas.EventCreate]] = []
+
+    def _insert_into_calendar(
+        self,
+        test: models.Test,
+        run_at: float,
+        source: enums.EventSource,
+        recovery_attempt: int = 0,
+        transaction_finished: Optional[bool] = None,
+    ) -> None:
+        data = prepare_event(test, run_at, source, recovery_attempt)
+        if data is not None:
+            self._new_events.append((test.id_test, data))
+
+    def _store_new_events(self) -> None:
+        if not len(self._new_events):
+            return
+        self._db.events.create_many(self._new_events, transaction_finished=False)
+        for _, data in self._new_events:
+            planned_events_queue.push(data.run_at)
+        self._new_events = []
+
+
 class RequestsForNewEvents(ProcessEvents):
 
     def __init__(self, db: DAOAggregator):
@@ -76,15 +158,23 @@ class RequestsForNewEvents(ProcessEvents):
         requests = self._db.requests.get_all()
         if len(requests):
             logs.debug(f"Found {len(requests)} new requests - tests: {','.join(str(r.id_test) for r in requests)}.")
-        for request in self._db.requests.get_all():
+        for request in requests:
             self._process_request(request)
 
     def _process_request(
         self,
         request: models.Request,
     ) -> None:
-        logs.debug(f"(test {request.id_test}) - processing a new request.")
         test = self._db.tests.get_by_id(request.id_test)
+        self._process_request_for_test(request, test)
+        self._db.requests.delete(request.id_request)
+
+    def _process_request_for_test(
+        self,
+        request: models.Request,
+        test: models.Test,
+    ) -> None:
+        logs.debug(f"(test {request.id_test}) - processing a new request.")
         match request.reason:
             case enums.RequestReason.new:
                 self._process_new_request(request, test)
@@ -92,7 +182,6 @@ class RequestsForNewEvents(ProcessEvents):
                 self._process_update_request(request, test)
             case enums.RequestReason.failed:
                 self._process_recovery_request(request, test)
-        self._db.requests.delete(request.id_request)
 
     def _process_new_request(
         self,
@@ -102,7 +191,7 @@ class RequestsForNewEvents(ProcessEvents):
         if test.scheduling_from is not None and self._now < test.scheduling_from:
             logs.debug(f"(test {request.id_test}) - request for a new event in the future.")
             # Test should start in the future, so we are just inserting the event into the calendar at the scheduling_from time.
-            insert_into_calendar(self._db, test, test.scheduling_from, enums.EventSource.request)
+            self._insert_into_calendar(test, test.scheduling_from, enums.EventSource.request)
         else:
             logs.debug(f"(test {request.id_test}) - request for a new event now, also creating a run.")
             self._plan_next_event(test, self._now)
@@ -114,12 +203,15 @@ class RequestsForNewEvents(ProcessEvents):
     ) -> None:
         if test.state in [enums.TestState.disabled, enums.TestState.deleted]:
             logs.debug(f"(test {request.id_test}) - new state {test.state}, removing all events from the calendar.")
-            self._db.events.delete(request.id_test)
+            self._remove_events(request.id_test)
         elif test.state == enums.TestState.enabled:
             logs.debug(f"(test {request.id_test}) - re-enabling the test, creating a new event.")
             # re-enabling the test behaves the same as a new request
             self._process_new_request(request, test)
 
+    def _remove_events(self, id_test: int) -> None:
+        self._db.events.delete_all_by_test_ids([id_test])
+
     def _process_recovery_request(
         self,
         request: models.Request,
@@ -137,7 +229,30 @@ class RequestsForNewEvents(ProcessEvents):
         if test.scheduling_until is not None and recovery_test_time > test.scheduling_until:
             logs.debug(f"(test {request.id_test}) - planned recovery time is after scheduling until.")
             return
-        insert_into_calendar(self._db, test, recovery_test_time, enums.EventSource.recovery, request.recovery_attempt)
+        self._insert_into_calendar(test, recovery_test_time, enums.EventSource.recovery, request.recovery_attempt)
+
+
+class BatchedRequestsForNewEvents(BatchedProcessEvents, RequestsForNewEvents):
+
+    def __init__(self, db: DAOAggregator):
+        super().__init__(db)
+        self._tests_without_events: list[int] = []
+
+    def process_all_requests(self) -> None:
+        requests = self._db.requests.get_all_with_tests()
+        if not len(requests):
+            return
+        logs.debug(f"Found {len(requests)} new requests - tests: {','.join(str(r.id_test) for r, _ in requests)}.")
+        for request, test in requests:
+            self._process_request_for_test(request, test)
+
+        if len(self._tests_without_events):
+            self._db.events.delete_all_by_test_ids(self._tests_without_events, transaction_finished=False)
+        self._store_new_events()
+        self._db.requests.delete_by_ids([request.id_request for request, _ in requests], transaction_finished=True)
+
+    def _remove_events(self, id_test: int) -> None:
+        self._tests_without_events.append(id_test)
 
 
 class PlannedEvents(ProcessEvents):
@@ -160,8 +275,16 @@ class PlannedEvents(ProcessEvents):
         self,
         event: models.Event,
     ) -> None:
-        logs.debug(f"(test {event.id_test}) - processing an event from the calendar.")
         test = self._db.tests.get_by_id(event.id_test)
+        self._process_event_for_test(event, test)
+        self._db.events.delete(event.id_event, transaction_finished=True)
+
+    def _process_event_for_test(
+        self,
+        event: models.Event,
+        test: models.Test,
+    ) -> None:
+        logs.debug(f"(test {event.id_test}) - processing an event from the calendar.")
         self._start_a_new_run(test, event, transaction_finished=False)
 
         if event.source != enums.EventSource.recovery:
@@ -169,7 +292,6 @@ class PlannedEvents(ProcessEvents):
             self._plan_next_event(test, event.run_at)
         else:
             logs.debug(f"(test {event.id_test}) - new event is not planned as current processed event is a recovery event.")
-        self._db.events.delete(event.id_event, transaction_finished=True)
 
     def _start_a_new_run(
             self,
@@ -193,26 +315,107 @@ class PlannedEvents(ProcessEvents):
         logs.debug(f"(test {test.id_test}) - created a run.")
 
 
-def process_events():
+class BatchedPlannedEvents(BatchedProcessEvents, PlannedEvents):
+
+    def __init__(self, db: DAOAggregator):
+        super().__init__(db)
+        self._new_runs: list[dict] = []
+        self._waiting_tests: set[int] = set()
+
+    def process_all_events(
+        self,
+    ) -> None:
+        events = self._db.events.get_all_with_tests_until_run_threshold(self._now)
+        if not len(events):
+            return
+        logs.debug(f"Found {len(events)} events to be executed - tests: {','.join(str(e.id_test) for e, _ in events)}.")
+
+        self._waiting_tests = self._db.runs.get_test_ids_by_state(enums.RunState.waiting)
+        for event, test in events:
+            self._process_event_for_test(event, test)
+
+        self._db.runs.create_many(self._new_runs, transaction_finished=False)
+        self._store_new_events()
+        self._db.events.delete_by_ids([event.id_event for event, _ in events], transaction_finished=True)
+
+    def _start_a_new_run(
+            self,
+            test: models.Test,
+            event: models.Event,
+            transaction_finished: Optional[bool] = None,
+    ) -> None:
+        if test.id_test in self._waiting_tests:
+            logs.warning(f"(test {test.id_test}) - new run not created because there is already waiting one.")
+            return
+
+        self._waiting_tests.add(test.id_test)
+        self._new_runs.append({
+            "id_test": test.id_test,
+            "version": test.version,
+            "state": enums.RunState.waiting,
+            "planned": event.run_at,
+            "recovery_attempt": event.recovery_attempt,
+        })
+        logs.debug(f"(test {test.id_test}) - created a run.")
+
+
+def is_batch_processing_enabled() -> bool:
+    return config.exists("calendar", "batch_processing_bool") and config.calendar_batch_processing_bool
+
+
+def process_events(process_planned_events: bool = True) -> None:
     db = DAOAggregator()
+    batch_processing = is_batch_processing_enabled()
 
-    new_events = RequestsForNewEvents(db)
+    new_events = BatchedRequestsForNewEvents(db) if batch_processing else RequestsForNewEvents(db)
     new_events.process_all_requests()
 
-    planned_events = PlannedEvents(db)
-    planned_events.process_all_events()
+    if process_planned_events:
+        planned_events = BatchedPlannedEvents(db) if batch_processing else PlannedEvents(db)
+        planned_events.process_all_events()
 
     db.close()
 
 
+def load_planned_events() -> None:
+    db = DAOAggregator()
+    planned_events_queue.load(db)
+    db.close()
+    logs.debug(f"Loaded {len(planned_events_queue)} planned events from the calendar.")
+
+
+def get_max_sleep() -> float:
+    if config.exists("calendar", "max_sleep_float"):
+        return config.calendar_max_sleep_float
+    return DEFAULT_MAX_SLEEP
+
+
+def wait_for_next_event(listener: Optional[wakeup.WakeUpListener], timeout: float) -> None:
+    if listener is None:
+        time.sleep(timeout)
+    else:
+        listener.wait(timeout)
+
+
 def infinite_loop_for_processing_events():
+    listener = wakeup.get_listener()
+    max_sleep = get_max_sleep()
+    load_planned_events()
     while True:
-        process_events()
-        time.sleep(0.1)
+        if config.reload_if_changed():
+            max_sleep = get_max_sleep()
+        due_events = planned_events_queue.pop_due(time.time())
+        started = time.perf_counter()
+        process_events(process_planned_events=due_events > 0)
+        metrics.observe("agent_calendar_tick_seconds", time.perf_counter() - started)
+        # new requests wake the calendar up through the listener, the max sleep only covers lost notifications
+        timeout = planned_events_queue.seconds_until_next_event(time.time(), max_sleep)
+        wait_for_next_event(listener, timeout)
 
 
 def main(persistent_folder: Path) -> None:
     config.load_config(persistent_folder / "config.ini")
     logs.setup_logging("calendar")
+    metrics.setup(persistent_folder / metrics.METRICS_FILE)
     initialization.pre_running_check()
     infinite_loop_for_processing_events()
@@ -3,24 +3,57 @@ from pathlib import Path
 
 import main_modules.initialization as initialization
 
+from database import connection
 from database.dao import generic
 from database.daoaggregator import DAOAggregator
-from utils import logs
+from utils import logs, metrics
 from utils.configuration import config
 
+DEFAULT_CHUNK_SIZE = 10000  # IDs
+DEFAULT_CHUNK_PAUSE = 0.05  # s
+DEFAULT_TIME_BUDGET = 60.0  # s, the deletes and the vacuum together
 
-def delete_old_records_for_table(sub_db: generic.Generic, calculated_at: float) -> None:
+
+def get_option(option: str, default):
+    if config.exists("cleaner", option):
+        return config.get("cleaner", option)
+    return default
+
+
+def delete_old_records_for_table(sub_db: generic.Generic, calculated_at: float, deadline: float) -> None:
     table_name = sub_db.table.__tablename__
     logs.debug(f"Deleting old records from table '{table_name}'.")
     threshold = config.get("cleaner", f"{table_name}_int")
-    rows_count = sub_db.delete_old_records(calculated_at - threshold)
+    chunk_size = get_option("chunk_size_int", DEFAULT_CHUNK_SIZE)
+    chunk_pause = get_option("chunk_pause_float", DEFAULT_CHUNK_PAUSE)
+    chunks = sub_db.delete_old_records_in_chunks(calculated_at - threshold, chunk_size)
+    rows_count = 0
+    lock_time = 0.0
+    started = time.monotonic()
+    while True:
+        if time.monotonic() >= deadline:
+            logs.warning(f"The time budget of the cleaner is spent, table {table_name} is cleaned in the next run.")
+            break
+        # the write lock is held from the delete of the chunk to its commit
+        chunk_started = time.monotonic()
+        deleted_rows = next(chunks, None)
+        if deleted_rows is None:
+            break
+        lock_time += time.monotonic() - chunk_started
+        rows_count += deleted_rows
+        if deleted_rows > 0:
+            time.sleep(chunk_pause)  # the other processes can write between the chunks
+    duration = time.monotonic() - started
     if rows_count > 0:
-        logs.info(f"Cleaned {rows_count} rows from table {table_name}")
+        logs.info(
+            f"Cleaned {rows_count} rows from table {table_name} in {duration:.2f} s "
+            f"({rows_count / max(duration, 1e-6):.0f} rows/s), the write lock held for {lock_time:.2f} s"
+        )
     else:
         logs.debug(f"No rows have been cleaned from table {table_name}")
 
 
-def delete_old_records(db: DAOAggregator) -> None:
+def delete_old_records(db: DAOAggregator, deadline: float) -> None:
     now = time.time()
     tables_to_clean = [
         db.events,
@@ -34,19 +67,33 @@ def delete_old_records(db: DAOAggregator) -> None:
         db.stats,
         db.tests,
     ]
-    for table in tables_to_clean:
-        delete_old_records_for_table(table, now)
+    for i, table in enumerate(tables_to_clean):
+        if time.monotonic() >= deadline:
+            skipped_tables = ", ".join(sub_db.table.__tablename__ for sub_db in tables_to_clean[i:])
+            logs.warning(
+                f"The time budget of the cleaner is spent, tables {skipped_tables} are cleaned in the next run."
+            )
+            break
+        delete_old_records_for_table(table, now, deadline)
 
 
 def clean_database():
+    deadline = time.monotonic() + get_option("time_budget_float", DEFAULT_TIME_BUDGET)
     db = DAOAggregator()
-    delete_old_records(db)
+    delete_old_records(db, deadline)
     db.close()
+    # the free pages left for the next run are released then
+    connection.optimize_database(
+        deadline,
+        get_option("vacuum_pages_int", connection.VACUUM_PAGES),
+        get_option("chunk_pause_float", DEFAULT_CHUNK_PAUSE),
+    )
     logs.debug("Cleaner run finished.")
 
 
 def infinite_loop_for_cleaning_database():
     while True:
+        config.reload_if_changed()
         clean_database()
         logs.debug(f"Sleeping for '{config.cleaner_interval_int}' seconds.")
         time.sleep(config.cleaner_interval_int)
@@ -55,5 +102,6 @@ def infinite_loop_for_cleaning_database():
 def main(persistent_folder: Path) -> None:
     config.load_config(persistent_folder / "config.ini")
     logs.setup_logging("cleaner")
+    metrics.setup(persistent_folder / metrics.METRICS_FILE)
     initialization.pre_running_check()
     infinite_loop_for_cleaning_database()
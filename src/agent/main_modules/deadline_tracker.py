@@ -0,0 +1,60 @@
+import heapq
+from typing import Dict, List, Tuple
+
+from database.daoaggregator import DAOAggregator
+from utils import enums, logs
+
+TRACKED_STATES = (
+    enums.RunState.running,
+    enums.RunState.terminating,
+    enums.RunState.killing,
+    enums.RunState.zombie,
+)
+
+
+class DeadlineTracker:
+    """
+    In-memory copy of the deadlines of the runs, one heap per run state. A changed deadline is only pushed
+    into the heap, the outdated entry is skipped when it reaches the top.
+    """
+
+    def __init__(self) -> None:
+        self._heaps: Dict[enums.RunState, List[Tuple[float, int]]] = {state: [] for state in TRACKED_STATES}
+        self._deadlines: Dict[int, Tuple[enums.RunState, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def load(self, db: DAOAggregator) -> None:
+        self._deadlines.clear()
+        for heap in self._heaps.values():
+            heap.clear()
+        for run in db.runs.get_all_by_states(TRACKED_STATES):
+            if run.deadline is None:
+                logs.warning(f"The run {run.id_run} in the state {run.state} doesn't have a deadline.")
+                continue
+            self.set(run.id_run, run.state, run.deadline)
+
+    def set(self, id_run: int, state: enums.RunState, deadline: float) -> None:
+        self._deadlines[id_run] = (state, deadline)
+        heapq.heappush(self._heaps[state], (deadline, id_run))
+
+    def remove(self, id_run: int) -> None:
+        self._deadlines.pop(id_run, None)
+
+    def pop_expired(self, state: enums.RunState, now: float) -> List[int]:
+        heap = self._heaps[state]
+        expired = []
+        while heap and heap[0][0] < now:
+            deadline, id_run = heapq.heappop(heap)
+            if self._deadlines.get(id_run) == (state, deadline):
+                del self._deadlines[id_run]
+                expired.append(id_run)
+        return expired
+
+
+def load_deadline_tracker(db: DAOAggregator) -> DeadlineTracker:
+    deadlines = DeadlineTracker()
+    deadlines.load(db)
+    logs.debug(f"Loaded {len(deadlines)} deadlines of the runs.")
+    return deadlines
@@ -5,6 +5,7 @@ from typing import Any
 from sqlalchemy import MetaData
 
 import database.connection as connection
+import database.init as database_init
 from utils import logs
 from utils.configuration import config
 
@@ -23,19 +24,27 @@ def verify_models_with_database():
     metadata.reflect(bind=connection.engine)
 
     for table_name in connection.Base.metadata.tables:
-        expecting_table = connection.Base.metadata.tables[table_name]
-        existing_table = metadata.tables[table_name]
-
         if table_name not in metadata.tables:
             logs.critical(
-                f"Database doesn't contain all the required tables ({table_name})."
+                f"Database doesn't contain all the required tables ({table_name}), run the migrate_database task."
             )
+        expecting_table = connection.Base.metadata.tables[table_name]
+        existing_table = metadata.tables[table_name]
+
         for column_name in expecting_table.columns.keys():
             if column_name not in existing_table.columns:
                 logs.critical(
                     f"Database doesn't contain all the required table columns ({table_name}/{column_name})."
                 )
 
+    with connection.engine.connect() as db_connection:
+        schema_version = database_init.get_schema_version(db_connection)
+    if schema_version < database_init.SCHEMA_VERSION:
+        logs.critical(
+            f"Database schema version {schema_version} is outdated ({database_init.SCHEMA_VERSION}), "
+            f"run the migrate_database task."
+        )
+
 
 def init_config_variables() -> None:
     config.set("public", "version", "1.0.5", required=False)
@@ -78,5 +87,6 @@ def init_config_variables() -> None:
 
 def pre_running_check():
     init_config_variables()
+    connection.setup_engine()
     verify_models_with_database()
     logs.debug("Pre-running check - done")
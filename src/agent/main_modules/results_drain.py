@@ -0,0 +1,244 @@
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import Queue
+from typing import Any, Dict, List, Optional
+
+from database.daoaggregator import DAOAggregator
+from utils import enums, logs, metrics, wakeup
+from utils.configuration import config
+from utils.exceptions import TransactionError
+from utils.result_message import ResultMessage
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_DELAY = 0.05
+METRICS_INTERVAL = 60
+HOLD_TIMEOUT = 60  # s, the longest wait of a result for the start of its run to be stored
+
+
+def parse_result_message(raw_message: Any) -> ResultMessage:
+    message = raw_message
+    try:
+        message = ResultMessage(raw_message)
+        if enums.ResultStatus[message.status]:  # test if the status contains one of the predefined values
+            pass
+        if type(message.run_id) is not int:
+            logs.error(
+                f"Message from queue contains non-numeric run ID - {message}. {type(message.run_id)}"
+            )
+        if type(message.data) is not dict:
+            logs.error(
+                f"Message from queue doesn't contain the data in the dict format - {message}."
+            )
+
+        message.data = json.dumps(message.data)
+
+    except (TypeError, ValueError):
+        logs.error(f"Message from queue is not a valid JSON - {message}.")
+    except KeyError:
+        logs.error(
+            f"Message from queue doesn't contain all the required fields or contains unknown status - {message}."
+        )
+    return message
+
+
+@dataclass
+class DrainMetrics:
+    queue_depth: Optional[int] = None
+    batches: int = 0
+    messages: int = 0
+    last_write_latency: float = 0.0
+    max_write_latency: float = 0.0
+    total_write_latency: float = 0.0
+
+    def add_batch(self, messages_count: int, write_latency: float) -> None:
+        self.batches += 1
+        self.messages += messages_count
+        self.last_write_latency = write_latency
+        self.max_write_latency = max(self.max_write_latency, write_latency)
+        self.total_write_latency += write_latency
+
+    def average_write_latency(self) -> float:
+        if self.batches == 0:
+            return 0.0
+        return self.total_write_latency / self.batches
+
+
+class ResultsDrain(threading.Thread):
+    """
+    Stores the results from the tests. The thread waits for the messages in the queue
+    and writes them in batches, each batch in one transaction.
+    """
+
+    def __init__(
+        self,
+        results_queue: Queue,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        batch_delay: float = DEFAULT_BATCH_DELAY,
+    ) -> None:
+        super().__init__(name="results-drain", daemon=True)
+        self._results_queue = results_queue
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+        self._stopped = threading.Event()
+        self._metrics_logged = time.monotonic()
+        self._held: List[ResultMessage] = []
+        self._held_since: Dict[int, float] = {}
+        self.metrics = DrainMetrics()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            # the held results are retried with the next batch
+            batch = self._held + self.collect_batch(self._batch_delay if len(self._held) else 0.5)
+            if len(batch):
+                self.write_batch(batch)
+            self.__update_metrics()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def collect_batch(self, timeout: float = 0.5) -> List[ResultMessage]:
+        batch = []
+        try:
+            raw_messages = [self._results_queue.get(timeout=timeout)]
+        except queue.Empty:
+            return batch
+        # the batch is closed when it's full or after the delay from its first message
+        batch_deadline = time.monotonic() + self._batch_delay
+        while len(raw_messages) < self._batch_size:
+            remaining = batch_deadline - time.monotonic()
+            try:
+                raw_messages.append(self._results_queue.get(timeout=max(remaining, 0)))
+            except queue.Empty:
+                break
+        for raw_message in raw_messages:
+            try:
+                batch.append(parse_result_message(raw_message))
+            except TransactionError:
+                continue
+        return batch
+
+    def write_batch(self, messages: List[ResultMessage]) -> None:
+        started = time.perf_counter()
+        held = []
+        db = DAOAggregator()
+        try:
+            held = self.__store_results(db, messages)
+        except TransactionError:
+            db.rollback()
+            if len(messages) > 1:
+                # one invalid message must not discard the others
+                logs.warning(f"Unable to store {len(messages)} results at once, storing them one by one.")
+                for message in messages:
+                    held += self.__store_one_result(db, message)
+        finally:
+            db.close()
+        self.__hold(held)
+        write_latency = time.perf_counter() - started
+        self.metrics.add_batch(len(messages) - len(held), write_latency)
+        metrics.observe("agent_results_write_seconds", write_latency)
+        metrics.inc("agent_results_total", len(messages) - len(held))
+
+    def __store_one_result(self, db: DAOAggregator, message: ResultMessage) -> List[ResultMessage]:
+        try:
+            return self.__store_results(db, [message])
+        except TransactionError:
+            db.rollback()
+            return []
+
+    def __hold(self, messages: List[ResultMessage]) -> None:
+        now = time.monotonic()
+        held, held_since = [], {}
+        for message in messages:
+            held_since[message.run_id] = self._held_since.get(message.run_id, now)
+            if now - held_since[message.run_id] >= HOLD_TIMEOUT:
+                logs.warning(f"The result from the test has been received for a run which hasn't started - {message}.")
+                held_since.pop(message.run_id)
+                continue
+            held.append(message)
+        self._held, self._held_since = held, held_since
+
+    @staticmethod
+    def __store_results(db: DAOAggregator, messages: List[ResultMessage]) -> List[ResultMessage]:
+        """
+        Returns the messages of the runs which are still waiting, the start of the run wasn't stored yet.
+        """
+        logs.debug(f"Processing {len(messages)} results from queue.")
+        runs = {run.id_run: run for run in db.runs.get_all_by_ids([m.run_id for m in messages])}
+        finished = time.time()
+        results: List[Dict[str, Any]] = []
+        requests: List[Dict[str, Any]] = []
+        last_results: Dict[int, Dict[str, Any]] = {}
+        held = []
+        for message in messages:
+            run = runs.pop(message.run_id, None)
+            if run is None:
+                logs.warning(
+                    f"The result from the test has been received after the run was deleted - {message}."
+                )
+                continue
+            if run.state == enums.RunState.waiting:
+                held.append(message)
+                continue
+            if message.status != enums.ResultStatus.success.value:
+                requests.append({
+                    "id_test": run.id_test,
+                    "reason": enums.RequestReason.failed,
+                    "recovery_attempt": run.recovery_attempt + 1,
+                    "added_time": finished,
+                })
+            results.append({
+                "id_test": run.id_test,
+                "version": run.version,
+                "planned": run.planned,
+                "started": run.started,
+                "finished": finished,
+                "status": message.status,
+                "recovery_attempt": run.recovery_attempt,
+                "data": message.data,
+            })
+            last_results[run.id_test] = {
+                "id_test": run.id_test,
+                "last_result_status": message.status,
+                "last_result_time": finished,
+            }
+        if not len(results):
+            return held
+
+        held_run_ids = {m.run_id for m in held}
+        db.requests.create_many(requests, transaction_finished=False)
+        db.tests.update_last_results(list(last_results.values()), transaction_finished=False)
+        db.results.create_many(results, transaction_finished=False)
+        db.runs.delete_by_ids([m.run_id for m in messages if m.run_id not in held_run_ids], transaction_finished=True)
+        if len(requests):
+            wakeup.notify_calendar()
+        return held
+
+    def __update_metrics(self) -> None:
+        try:
+            self.metrics.queue_depth = self._results_queue.qsize()
+        except NotImplementedError:  # not available on macOS
+            self.metrics.queue_depth = None
+        if self.metrics.queue_depth is not None:
+            metrics.set_gauge("agent_results_queue_depth", self.metrics.queue_depth)
+        now = time.monotonic()
+        if now - self._metrics_logged < METRICS_INTERVAL:
+            return
+        self._metrics_logged = now
+        logs.debug(
+            f"Results drain - queue depth {self.metrics.queue_depth}, {self.metrics.messages} results in "
+            f"{self.metrics.batches} batches, write latency avg {self.metrics.average_write_latency() * 1000:.1f} ms, "
+            f"max {self.metrics.max_write_latency * 1000:.1f} ms."
+        )
+
+
+def create_results_drain(results_queue: Queue) -> ResultsDrain:
+    batch_size = DEFAULT_BATCH_SIZE
+    if config.exists("tests", "results_batch_size_int"):
+        batch_size = config.tests_results_batch_size_int
+    batch_delay = DEFAULT_BATCH_DELAY
+    if config.exists("tests", "results_batch_delay_float"):
+        batch_delay = config.tests_results_batch_delay_float
+    return ResultsDrain(results_queue, batch_size, batch_delay)
@@ -1,23 +1,42 @@
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Any, Dict, List, Sequence
 
 from database.dao import generic
 from database.daoaggregator import DAOAggregator
 from main_modules import initialization
-from utils import logs
+from utils import logs, metrics
 from utils.configuration import config
 
 
 def calculate_statistics_for_table(
-    db: DAOAggregator, sub_db: generic.Generic, calculated_at: float
-) -> None:
+    db: DAOAggregator, sub_db: generic.Generic, calculated_at: float, incremental: bool = False
+) -> List[Dict[str, Any]]:
     table_name = sub_db.table.__tablename__
     logs.debug(f"Calculating statistics for table '{table_name}'.")
-    stats = sub_db.count_records_in_table()
+    if incremental:
+        stats = db.record_counters.get_records_counter(sub_db)
+    else:
+        stats = sub_db.count_records_in_table()
+    rows = []
     for category, rows_count in stats.iterate():
         category_value = category if isinstance(category, str) else category.name
-        db.stats.create(calculated_at, table_name, category_value, rows_count)
+        rows.append({"time": calculated_at, "table": table_name, "category": category_value, "value": rows_count})
+    return rows
+
+
+def setup_record_counters(db: DAOAggregator, tables: Sequence[generic.Generic]) -> bool:
+    """
+    Starts or stops the incremental counters of the tables by the configuration, returns whether they are used.
+    """
+    incremental = config.exists("stats", "incremental_counters_bool") and config.stats_incremental_counters_bool
+    if not db.record_counters.is_supported():
+        if incremental:
+            logs.warning("The incremental counters are supported only by SQLite, the tables are scanned.")
+        return False
+    db.record_counters.update_counted_tables(tables if incremental else [])
+    return incremental
 
 
 def calculate_statistics_for_tables(db: DAOAggregator) -> None:
@@ -33,8 +52,11 @@ def calculate_statistics_for_tables(db: DAOAggregator) -> None:
         db.runs,
         db.tests,
     ]
+    incremental = setup_record_counters(db, tables_to_calculate)
+    stats_rows = []
     for table in tables_to_calculate:
-        calculate_statistics_for_table(db, table, calculated_at)
+        stats_rows += calculate_statistics_for_table(db, table, calculated_at, incremental)
+    db.stats.create_many(stats_rows)
 
 
 def wait_until_next_hour() -> None:
@@ -56,6 +78,7 @@ def calculate_statistics_for_database():
 def infinite_loop_for_calculating_database_statistics():
     while True:
         wait_until_next_hour()
+        config.reload_if_changed()
         calculate_statistics_for_database()
         time.sleep(0.1)
 
@@ -63,5 +86,6 @@ def infinite_loop_for_calculating_database_statistics():
 def main(persistent_folder: Path) -> None:
     config.load_config(persistent_folder / "config.ini")
     logs.setup_logging("stats")
+    metrics.setup(persistent_folder / metrics.METRICS_FILE)
     initialization.pre_running_check()
     infinite_loop_for_calculating_database_statistics()
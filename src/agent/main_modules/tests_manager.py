@@ -1,100 +1,67 @@
 import importlib
-import json
 import time
 import types
 from multiprocessing import Queue
 from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
 
+import database.models.all as models
 from database.daoaggregator import DAOAggregator
 from main_modules import initialization
-from utils import enums, logs, processes
+from main_modules.deadline_tracker import DeadlineTracker, load_deadline_tracker
+from main_modules.results_drain import create_results_drain
+from utils import enums, logs, metrics, processes
 from utils.configuration import config
 from utils.exceptions import GlobalError, TransactionError
-from utils.result_message import ResultMessage
+from utils.worker_pool import WorkerPool
+
+Executor = Union[processes.ProcessExecutor, WorkerPool]
 
 
 class TestsManager:
 
     loaded_modules = {}
 
-    def __init__(self, db: DAOAggregator, results_queue: Queue) -> None:
+    def __init__(
+        self,
+        db: DAOAggregator,
+        results_queue: Queue,
+        executor: Optional[Executor] = None,
+        deadlines: Optional[DeadlineTracker] = None,
+    ) -> None:
         self.__db = db
         self.__results_queue = results_queue
+        self.__executor = executor or processes.ProcessExecutor(results_queue)
+        self.__deadlines = deadlines
 
     def process_tests(self):
-        self.process_results_from_queue()
+        self.__executor.maintain()
         self.start_new_tests()
         self.terminate_old_tests()
         self.kill_old_tests()
         self.zombify_old_tests()
         self.check_zombies()
 
-    def get_test_result_from_queue(self) -> ResultMessage:
-        message = {}
-        try:
-            message = ResultMessage(self.__results_queue.get(block=False))
-            if enums.ResultStatus[message.status]:  # test if the status contains one of the predefined values
-                pass
-            if type(message.run_id) is not int:
-                logs.error(
-                    f"Message from queue contains non-numeric run ID - {message}. {type(message.run_id)}"
-                )
-            if type(message.data) is not dict:
-                logs.error(
-                    f"Message from queue doesn't contain the data in the dict format - {message}."
-                )
-
-            message.data = json.dumps(message.data)
-
-        except (TypeError, ValueError):
-            logs.error(f"Message from queue is not a valid JSON - {message}.")
-        except KeyError:
-            logs.error(
-                f"Message from queue doesn't contain all the required fields or contains unknown status - {message}."
-            )
-        return message
+    @property
+    def deadlines(self) -> DeadlineTracker:
+        if self.__deadlines is None:
+            self.__deadlines = load_deadline_tracker(self.__db)
+        return self.__deadlines
 
-    def process_results_from_queue(self) -> None:
-        while not self.__results_queue.empty():
-            try:
-                message = self.get_test_result_from_queue()
-                run = self.__db.runs.get_by_id(message.run_id)
-                if run is None:
-                    logs.error(
-                        f"The result from the test has been received after the run was deleted - {message}."
-                    )
-
-                logs.debug(f"Processing result from queue.")
-                finished = time.time()
+    def __get_expired_runs(self, state: enums.RunState) -> Sequence[models.Run]:
+        expired = self.deadlines.pop_expired(state, time.time())
+        if not len(expired):
+            return []
+        # the runs finished in the meantime were deleted by the results drain
+        return [run for run in self.__db.runs.get_all_by_ids(expired) if run.state == state]
 
-                if message.status != enums.ResultStatus.success.value:
-                    new_recovery_attempt = run.recovery_attempt + 1
-                    self.__db.requests.create(
-                        run.id_test,
-                        enums.RequestReason.failed,
-                        new_recovery_attempt,
-                        finished,
-                        transaction_finished=False,
-                    )
+    def __update_state(self, run: models.Run, state: enums.RunState, deadline: float) -> None:
+        self.__db.runs.update_state(run.id_run, state, deadline)
+        self.deadlines.set(run.id_run, state, deadline)
 
-                self.__db.tests.update_last_result(
-                    run.id_test, message.status, finished, transaction_finished=False
-                )
-                self.__db.results.create(
-                    run.id_test,
-                    run.version,
-                    run.planned,
-                    run.started,
-                    finished,
-                    message.status,
-                    run.recovery_attempt,
-                    message.data,
-                    transaction_finished=False,
-                )
-                self.__db.runs.delete(run.id_run, transaction_finished=True)
-            except TransactionError:
-                self.__db.rollback()
-                continue
+    def __delete_run(self, run: models.Run, transaction_finished: Optional[bool] = None) -> None:
+        self.__db.runs.delete(run.id_run, transaction_finished=transaction_finished)
+        self.deadlines.remove(run.id_run)
 
     def load_module(self, name: str) -> types.ModuleType:
         if name not in TestsManager.loaded_modules:
@@ -107,58 +74,147 @@ class TestsManager:
         return TestsManager.loaded_modules[name]
 
     def start_new_tests(self) -> None:
-        for run in self.__db.runs.get_all_by_state(enums.RunState.waiting):
+        waiting_runs = self.__db.runs.get_all_by_state(enums.RunState.waiting)
+        if not len(waiting_runs):
+            return
+        tests = {test.id_test: test for test in self.__db.tests.get_all_by_ids({run.id_test for run in waiting_runs})}
+        runs = []
+        skipped_runs = []
+        for run in waiting_runs:
+            test = tests.get(run.id_test)
+            if test is None or test.state != enums.TestState.enabled:
+                logs.debug(f"Test is not enabled, state - {None if test is None else test.state}.")
+                skipped_runs.append(run.id_run)
+                continue
+            runs.append(run)
+        capacity = self.__executor.get_capacity()
+        if capacity is not None and len(runs) > capacity:
+            logs.debug("All the test workers are busy, the remaining runs are waiting.")
+            runs = runs[:capacity]
+        # the runs are stored as running before the tests are started, so their results can be stored right away
+        started = time.time()
+        starting_runs = self.__store_started_runs([
+            {
+                "id_run": run.id_run,
+                "id_test": run.id_test,
+                "version": tests[run.id_test].version,
+                "pid": None,
+                "state": enums.RunState.running,
+                "started": started,
+                "deadline": started + tests[run.id_test].timeout,
+            }
+            for run in runs
+        ], skipped_runs)
+        if not len(starting_runs):
+            return
+        planned = {run.id_run: run.planned for run in runs}
+        pids = {}
+        disabled_tests = set()
+        for run in starting_runs:
+            if run["id_test"] in disabled_tests:
+                continue
+            logs.debug(f"Starting new test based on the run - {run['id_run']}")
+            test = tests[run["id_test"]]
             try:
-                logs.debug(f"Starting new test based on the run - {run.id_run}")
-                test = self.__db.tests.get_by_id(run.id_test)
-                if test.state != enums.TestState.enabled:
-                    logs.debug(f"Test is not enabled, state - {test.state}.")
-                    self.__db.runs.delete(run.id_run)
-                    continue
-                started = time.time()
                 module = self.load_module(test.name)
-                test_object = module.Test(self.__results_queue)
-                pid = processes.start_new_process(
-                    test.name, test_object, test.test_params, run.id_run
-                )
-
-                self.__db.tests.update_last_started(
-                    run.id_test, started, transaction_finished=False
-                )
-                deadline = started + test.timeout
-                self.__db.runs.update(
-                    run.id_run,
-                    test.version,
-                    pid,
-                    enums.RunState.running,
-                    started,
-                    deadline,
-                    transaction_finished=True,
-                )
+                pid = self.__executor.start(test.name, module, test.test_params, run["id_run"])
             except TransactionError:
-                self.__db.rollback()
-                self.__db.tests.update_state(run.id_test, enums.TestState.disabled)
+                self.__db.tests.update_state(run["id_test"], enums.TestState.disabled)
+                disabled_tests.add(run["id_test"])
+                continue
+            if pid is None:
+                logs.debug("No test worker is available, the remaining runs are waiting.")
+                break
+            # the lag of the start after the planned time of the event
+            metrics.observe("agent_run_start_lag_seconds", run["started"] - planned[run["id_run"]])
+            pids[run["id_run"]] = pid
+        self.__store_pids(starting_runs, pids)
+
+    def __store_started_runs(
+        self, started_runs: Sequence[Dict[str, Any]], skipped_runs: Sequence[int]
+    ) -> Sequence[Dict[str, Any]]:
+        # all the started runs are stored in one transaction
+        try:
+            self.__db.tests.update_last_started_many(
+                [{"id_test": run["id_test"], "last_started_time": run["started"]} for run in started_runs],
+                transaction_finished=False,
+            )
+            self.__db.runs.update_many(
+                [{key: value for key, value in run.items() if key != "id_test"} for run in started_runs],
+                transaction_finished=False,
+            )
+            self.__db.runs.delete_by_ids(skipped_runs, transaction_finished=True)
+        except TransactionError:
+            self.__db.rollback()
+            logs.warning(f"Unable to store {len(started_runs)} started runs at once, storing them one by one.")
+            started_runs = [run for run in started_runs if self.__store_started_run(run)]
+            for run_id in skipped_runs:
+                self.__db.runs.delete(run_id)
+        for run in started_runs:
+            self.deadlines.set(run["id_run"], enums.RunState.running, run["deadline"])
+        return started_runs
+
+    def __store_pids(self, started_runs: Sequence[Dict[str, Any]], pids: Dict[int, int]) -> None:
+        # the runs which couldn't be started are waiting again
+        changes = []
+        for run in started_runs:
+            pid = pids.get(run["id_run"])
+            if pid is None:
+                self.deadlines.remove(run["id_run"])
+            changes.append({
+                "id_run": run["id_run"],
+                "pid": pid,
+                "state": enums.RunState.waiting if pid is None else run["state"],
+                "started": None if pid is None else run["started"],
+                "deadline": None if pid is None else run["deadline"],
+            })
+        try:
+            self.__db.runs.update_many(changes, transaction_finished=True)
+        except TransactionError:
+            self.__db.rollback()
+            logs.warning(f"Unable to store the PIDs of {len(pids)} started runs at once, storing them one by one.")
+            for change in changes:
+                try:
+                    self.__db.runs.update_many([change], transaction_finished=True)
+                except TransactionError:
+                    self.__db.rollback()
+
+    def __store_started_run(self, run: Dict[str, Any]) -> bool:
+        try:
+            self.__db.tests.update_last_started(
+                run["id_test"], run["started"], transaction_finished=False
+            )
+            self.__db.runs.update(
+                run["id_run"],
+                run["version"],
+                run["pid"],
+                run["state"],
+                run["started"],
+                run["deadline"],
+                transaction_finished=True,
+            )
+        except TransactionError:
+            self.__db.rollback()
+            self.__db.tests.update_state(run["id_test"], enums.TestState.disabled)
+            return False
+        return True
 
     def terminate_old_tests(self) -> None:
-        for run in self.__db.runs.get_all_by_state_and_deadline(
-            enums.RunState.running, time.time()
-        ):
+        for run in self.__get_expired_runs(enums.RunState.running):
             try:
                 logs.debug(
                     f"Terminating run because of reached deadline - {run.id_run}."
                 )
                 finished = time.time()
 
-                if processes.is_process_alive(run.pid):
-                    processes.terminate_process(run.pid)
+                if self.__executor.is_alive(run):
+                    self.__executor.terminate(run)
                     deadline = finished + config.tests_process_deadline_terminating_int
-                    self.__db.runs.update_state(
-                        run.id_run, enums.RunState.terminating, deadline
-                    )
+                    self.__update_state(run, enums.RunState.terminating, deadline)
                     result_status = enums.ResultStatus.terminated
                 else:
                     result_status = enums.ResultStatus.crashed
-                    self.__db.runs.delete(run.id_run, transaction_finished=False)
+                    self.__delete_run(run, transaction_finished=False)
                 self.__db.results.create(
                     run.id_test,
                     run.version,
@@ -174,64 +230,95 @@ class TestsManager:
                 )
             except TransactionError:
                 self.__db.rollback()
+                # the deadline is checked again in the next round
+                self.deadlines.set(run.id_run, enums.RunState.running, run.deadline)
 
     def kill_old_tests(self) -> None:
-        for run in self.__db.runs.get_all_by_state_and_deadline(
-            enums.RunState.terminating, time.time()
-        ):
-            if processes.is_process_alive(run.pid):
+        for run in self.__get_expired_runs(enums.RunState.terminating):
+            if self.__executor.is_alive(run):
                 logs.debug(f"Killing run because of reached deadline - {run.id_run}.")
-                processes.kill_process(run.pid)
+                self.__executor.kill(run)
                 deadline = time.time() + config.tests_process_deadline_killing_int
-                self.__db.runs.update_state(
-                    run.id_run, enums.RunState.killing, deadline
-                )
+                self.__update_state(run, enums.RunState.killing, deadline)
             else:
-                self.__db.runs.delete(run.id_run)
+                self.__delete_run(run)
 
     def zombify_old_tests(self) -> None:
-        for run in self.__db.runs.get_all_by_state_and_deadline(
-            enums.RunState.killing, time.time()
-        ):
-            if processes.is_process_alive(run.pid):
+        for run in self.__get_expired_runs(enums.RunState.killing):
+            if self.__executor.is_alive(run):
                 logs.debug(
                     f"Marking the run {run.id_run} as zombie, because it hasn't been killed."
                 )
                 deadline = time.time() + 10
-                self.__db.runs.update_state(run.id_run, enums.RunState.zombie, deadline)
+                self.__update_state(run, enums.RunState.zombie, deadline)
             else:
-                self.__db.runs.delete(run.id_run)
+                self.__delete_run(run)
 
     def check_zombies(self) -> None:
-        for run in self.__db.runs.get_all_by_state_and_deadline(
-            enums.RunState.zombie, time.time()
-        ):
-            if processes.is_process_alive(run.pid):
+        for run in self.__get_expired_runs(enums.RunState.zombie):
+            if self.__executor.is_alive(run):
                 deadline = time.time() + 10
-                self.__db.runs.update_state(run.id_run, enums.RunState.zombie, deadline)
+                self.__update_state(run, enums.RunState.zombie, deadline)
             else:
-                self.__db.runs.delete(run.id_run)
+                self.__delete_run(run)
 
 
-def check_tests(results_queue: Queue) -> None:
+def check_tests(
+    results_queue: Queue,
+    executor: Optional[Executor] = None,
+    deadlines: Optional[DeadlineTracker] = None,
+) -> None:
     db = DAOAggregator()
-    manager = TestsManager(db, results_queue)
+    manager = TestsManager(db, results_queue, executor, deadlines)
     manager.process_tests()
     db.close()
 
 
+def create_executor(results_queue: Queue) -> Executor:
+    if config.exists("tests", "executor") and config.tests_executor == "pool":
+        return WorkerPool(
+            results_queue,
+            config.tests_pool_size_int,
+            config.tests_pool_max_runs_int,
+            config.tests_pool_max_memory_int,
+        )
+    return processes.ProcessExecutor(results_queue)
+
+
+def load_deadlines() -> DeadlineTracker:
+    db = DAOAggregator()
+    deadlines = load_deadline_tracker(db)
+    db.close()
+    return deadlines
+
+
 def infinite_loop_for_checking_tests():
+    executor = None
+    results_drain = None
     try:
         results_queue = Queue()
+        executor = create_executor(results_queue)
+        results_drain = create_results_drain(results_queue)
+        results_drain.start()
+        deadlines = load_deadlines()
         while True:
-            check_tests(results_queue)
+            config.reload_if_changed()
+            check_tests(results_queue, executor, deadlines)
+            if not results_drain.is_alive():
+                logs.critical("The thread storing the results from the tests has stopped.")
             time.sleep(0.1)
     except GlobalError:
         logs.error("Exiting the tests manager after catching the error.")
+    finally:
+        if executor is not None:
+            executor.close()
+        if results_drain is not None:
+            results_drain.stop()
 
 
 def main(persistent_folder: Path) -> None:
     config.load_config(persistent_folder / "config.ini")
     logs.setup_logging("manager")
+    metrics.setup(persistent_folder / metrics.METRICS_FILE)
     initialization.pre_running_check()
     infinite_loop_for_checking_tests()
@@ -27,6 +27,7 @@ def parse_args() -> Arguments:
         required=True,
         choices=[
             "init_database",
+            "migrate_database",
             "calendar",
             "cleaner",
             "responder",
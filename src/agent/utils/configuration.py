@@ -1,10 +1,15 @@
 import configparser
+import fcntl
 import ipaddress
+import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 import utils.logs as logs
-
+from utils.exceptions import GlobalError
 
 
 SectionName = str
@@ -12,6 +17,8 @@ OptionName = str
 OptionValue = str
 AddedOrUpdated = str
 
+RELOAD_CHECK_INTERVAL = 1.0
+
 
 def retype_value(
     value: OptionValue, option_type: Optional[str] = None
@@ -36,29 +43,103 @@ def retype_value(
     return value
 
 
+class ConfigSnapshot:
+    """
+    Parsed configuration file with the values of all options already retyped, keyed by the attribute names
+    of the configuration, e.g. tests_pool_size_int. A snapshot is never changed, a new one replaces it.
+    """
+
+    __slots__ = ("parser", "values", "file_state")
+
+    def __init__(self, parser: configparser.ConfigParser, file_state: Optional[Tuple[int, int, int]]) -> None:
+        values = {}
+        for section in parser.sections():
+            for option in parser.options(section):
+                try:
+                    values[f"{section}_{option}"] = retype_value(parser.get(section, option), option.rsplit("_", 1)[-1])
+                except ValueError:
+                    pass  # the invalid value is reported when the option is read
+        self.parser = parser
+        self.values = MappingProxyType(values)
+        self.file_state = file_state
+
+
+def get_file_state(file: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = file.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
 class Configuration:
     def __init__(self) -> None:
         self._config_file: Optional[Path] = None
-        self._config: Optional[configparser.ConfigParser] = None
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._checked = 0.0
+
+    @property
+    def _config(self) -> Optional[configparser.ConfigParser]:
+        return None if self._snapshot is None else self._snapshot.parser
 
     def load_config(self, config_file: Path) -> None:
         self._config_file: Path = config_file
         self.__parse_config()
 
     def __parse_config(self) -> None:
-        self._config = configparser.ConfigParser()
+        parser = configparser.ConfigParser()
         if not self._config_file.is_file():
             logs.critical(f"The config file '{self._config_file}' doesn't exist.")
+        file_state = get_file_state(self._config_file)
         try:
-            self._config.read(self._config_file)
+            parser.read(self._config_file)
         except configparser.ParsingError:
             logs.critical(
                 f"The config file '{self._config_file}' contains parsing errors."
             )
+        self._snapshot = ConfigSnapshot(parser, file_state)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Loads the configuration again when the file was changed, e.g. by another process.
+        The file is checked at most once per RELOAD_CHECK_INTERVAL.
+        """
+        if self._snapshot is None or time.monotonic() - self._checked < RELOAD_CHECK_INTERVAL:
+            return False
+        self._checked = time.monotonic()
+        file_state = get_file_state(self._config_file)
+        if file_state is None or file_state == self._snapshot.file_state:
+            return False
+        try:
+            self.__parse_config()
+        except GlobalError:
+            return False  # the previous configuration is kept
+        logs.info(f"The config file '{self._config_file}' was reloaded.")
+        return True
+
+    def __copy_config(self) -> configparser.ConfigParser:
+        parser = configparser.ConfigParser()
+        parser.read_dict(self._config)
+        return parser
+
+    @contextmanager
+    def __changing_config(self) -> Iterator[configparser.ConfigParser]:
+        # the processes, e.g. the API workers, change the file one at a time and keep the changes of the others
+        with open(self._config_file.with_name(f".{self._config_file.name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if get_file_state(self._config_file) != self._snapshot.file_state:
+                self.__parse_config()
+            parser = self.__copy_config()
+            yield parser
+            self.__save_config(parser)
 
-    def __save_config(self) -> None:
-        with open(self._config_file, "w") as fp:
-            self._config.write(fp)
+    def __save_config(self, parser: configparser.ConfigParser) -> None:
+        # the other processes never see a partially written file
+        temporary_file = self._config_file.with_name(f".{self._config_file.name}.tmp")
+        with open(temporary_file, "w") as fp:
+            parser.write(fp)
+        os.replace(temporary_file, self._config_file)
+        self._snapshot = ConfigSnapshot(parser, get_file_state(self._config_file))
 
     @staticmethod
     def __exception_handler(message: str, value_required: bool) -> None:
@@ -70,6 +151,8 @@ class Configuration:
     def exists(
         self, section: SectionName, option: OptionName
     ) -> bool:
+        if self._config is None:
+            return False
         return self._config.has_section(section) and self._config.has_option(
             section, option
         )
@@ -80,6 +163,9 @@ class Configuration:
         option: OptionName,
         required: bool = False,
     ) -> Optional[Any]:
+        snapshot = self._snapshot
+        if snapshot is not None and f"{section}_{option}" in snapshot.values:
+            return snapshot.values[f"{section}_{option}"]
         value = None
         option_type = "unknown"
         try:
@@ -100,6 +186,9 @@ class Configuration:
         return value
 
     def __getattr__(self, attribute: str) -> Optional[str]:
+        snapshot = self._snapshot
+        if snapshot is not None and attribute in snapshot.values:
+            return snapshot.values[attribute]
         parts = attribute.split("_", 1)
         if len(parts) == 1:
             return None
@@ -147,8 +236,8 @@ class Configuration:
         if not self._config.has_option(section, option):
             message = f"Unable to find option '{option}' in the '{section}' section to write the value '{value}' in the configuration file."
             self.__exception_handler(message, required)
-        self._config.set(section, option, value)
-        self.__save_config()
+        with self.__changing_config() as parser:
+            parser.set(section, option, value)
 
     def set_options_values(
         self,
@@ -161,17 +250,17 @@ class Configuration:
         Dict[OptionName, AddedOrUpdated],
     ]:
         result = {}
-        for section in options:
-            result[section] = {}
-            if not self._config.has_section(section):
-                self._config.add_section(section)
-            for option_name, option_value in options[section].items():
-                if self._config.has_option(section, option_name):
-                    result[section][option_name] = "updated"
-                else:
-                    result[section][option_name] = "added"
-                self._config.set(section, option_name, option_value)
-        self.__save_config()
+        with self.__changing_config() as parser:
+            for section in options:
+                result[section] = {}
+                if not parser.has_section(section):
+                    parser.add_section(section)
+                for option_name, option_value in options[section].items():
+                    if parser.has_option(section, option_name):
+                        result[section][option_name] = "updated"
+                    else:
+                        result[section][option_name] = "added"
+                    parser.set(section, option_name, option_value)
         return result
 
 
@@ -44,3 +44,5 @@ class RunState(Enum):
 @unique
 class CompressionAlg(Enum):
     zlib_base85 = "zlib_base85"
+    gzip = "gzip"
+    zstd = "zstd"
@@ -0,0 +1,129 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Optional
+
+SEVERITIES = ("debug", "info", "warning", "error", "critical")
+RING_MINUTES = 24 * 60
+FLUSH_INTERVAL = 1.0
+SQLITE_TIMEOUT = 5.0
+
+
+class LogCountersRing:
+    """
+    Counters of the log records per minute and severity, shared by the processes of the agent in a small SQLite file.
+    The slot of a minute is reused after RING_MINUTES, so the file never grows.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __connect(self) -> sqlite3.Connection:
+        # the connection is not shared with the forked processes, e.g. the test workers
+        if self._connection is None or self._pid != os.getpid():
+            if self._connection is not None:
+                self._lock = threading.Lock()  # the lock could be held by another thread of the parent at the fork
+            # the threads of the process share the connection, the lock serializes its use
+            self._connection = sqlite3.connect(
+                self.file, timeout=SQLITE_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(f"{severity} INTEGER NOT NULL" for severity in SEVERITIES)
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS log_counters (slot INTEGER PRIMARY KEY, minute INTEGER NOT NULL, {columns})"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def add(self, counts: Dict[int, Counter]) -> None:
+        columns = ", ".join(SEVERITIES)
+        placeholders = ", ".join("?" for _ in SEVERITIES)
+        # the old minute in the slot is replaced, the same minute is incremented
+        changes = ", ".join(
+            f"{severity} = CASE WHEN minute = excluded.minute THEN {severity} + excluded.{severity} "
+            f"ELSE excluded.{severity} END"
+            for severity in SEVERITIES
+        )
+        query = (
+            f"INSERT INTO log_counters (slot, minute, {columns}) VALUES (?, ?, {placeholders}) "
+            f"ON CONFLICT (slot) DO UPDATE SET {changes}, minute = excluded.minute "
+            f"WHERE excluded.minute >= minute"
+        )
+        parameters = [
+            (minute % RING_MINUTES, minute, *(counter[severity] for severity in SEVERITIES))
+            for minute, counter in counts.items()
+        ]
+        connection = self.__connect()
+        with self._lock, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(query, parameters)
+
+    def read(self, since_minute: int) -> Dict[str, int]:
+        sums = ", ".join(f"COALESCE(SUM({severity}), 0)" for severity in SEVERITIES)
+        connection = self.__connect()
+        with self._lock:
+            row = connection.execute(f"SELECT {sums} FROM log_counters WHERE minute >= ?", (since_minute,)).fetchone()
+        return dict(zip(SEVERITIES, row))
+
+
+class SeverityCountingHandler(logging.Handler):
+    """
+    Counts the records by severity in memory, a thread adds them to the ring every flush interval.
+    The logging call never waits for the file and the records themselves are not stored.
+    """
+
+    def __init__(
+        self, ring: LogCountersRing, level: int = logging.NOTSET, flush_interval: float = FLUSH_INTERVAL
+    ) -> None:
+        super().__init__(level)
+        self.ring = ring
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, Counter] = defaultdict(Counter)
+        self._stopped = threading.Event()
+        self.start_flushing()
+
+    def start_flushing(self) -> None:
+        # called again in the forked processes, e.g. the test workers, they have no flushing thread
+        self._stopped = threading.Event()
+        threading.Thread(target=self.__flush_periodically, name="log-counters", daemon=True).start()
+
+    def __flush_periodically(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._pending[int(record.created // 60)][record.levelname.lower()] += 1
+
+    def flush(self) -> None:
+        # the ring is written outside the lock, the records are counted meanwhile
+        self.acquire()
+        try:
+            pending, self._pending = self._pending, defaultdict(Counter)
+        finally:
+            self.release()
+        if not len(pending):
+            return
+        try:
+            self.ring.add(pending)
+        except sqlite3.Error:
+            self.acquire()
+            try:
+                for minute, counter in pending.items():
+                    self._pending[minute].update(counter)  # added with the next flush
+            finally:
+                self.release()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self.flush()
+        super().close()
+
+    def statistics(self, minutes: int, now: float) -> Dict[str, int]:
+        self.flush()
+        return self.ring.read(int((now - minutes * 60) // 60))
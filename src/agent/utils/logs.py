@@ -1,9 +1,13 @@
-import inspect
 import logging.config
 import logging.handlers
+import multiprocessing.util
 import os
+import queue
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 
+from utils import log_counters
 from utils.configuration import config
 from utils.exceptions import GlobalError, TransactionError
 from splunk_handler import SplunkHandler
@@ -11,6 +15,8 @@ import logstash
 
 logger_debug = logging.getLogger("symon-debug")
 logger_debug.setLevel(logging.DEBUG)
+severity_counter: Optional[log_counters.SeverityCountingHandler] = None
+queue_listener: Optional[logging.handlers.QueueListener] = None
 
 
 def convert_debug_level(debug_level: str) -> int:
@@ -27,13 +33,48 @@ def convert_debug_level(debug_level: str) -> int:
     return logging_level
 
 
+class CallerLocation(logging.Filter):
+    """
+    Adds the location of the caller to the record, only when a handler is going to emit it.
+    The location is taken from the fields filled by the logger, the stack is not inspected.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "location"):
+            file_name = os.path.relpath(record.pathname)
+            record.location = f"{file_name:32s} | {record.funcName:48s} | {record.lineno:3d}"
+        return True
+
+
+def add_handler(handler: logging.Handler, level: int, formatter: Optional[logging.Formatter] = None) -> logging.Handler:
+    handler.setLevel(level)
+    handler.addFilter(CallerLocation())
+    handler.setFormatter(formatter or logging.Formatter("%(location)s | %(message)s"))
+    return handler
+
+
+def start_queue_listener(queue_handler: logging.handlers.QueueHandler, handlers: List[logging.Handler]) -> None:
+    global queue_listener
+    queue_listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    queue_listener.start()
+    # the queued records are sent before the process exits
+    multiprocessing.util.Finalize(queue_listener, queue_listener.stop, exitpriority=0)
+
+
+def restart_queue_listener(queue_handler: logging.handlers.QueueHandler) -> None:
+    queue_handler.queue = queue.SimpleQueue()
+    start_queue_listener(queue_handler, list(queue_listener.handlers))
+
+
 def setup_logging(process_name: str) -> None:
-    global logger_debug
+    global logger_debug, severity_counter, queue_listener
 
-    console_handler = logging.StreamHandler()
     logging_level = convert_debug_level(config.get("logging", "console_level"))
-    console_handler.setLevel(logging_level)
-    logger_debug.addHandler(console_handler)
+    logger_debug.addHandler(add_handler(logging.StreamHandler(), logging_level))
+
+    # the file and the remote handlers are called by the listener thread,
+    # the logging call doesn't wait for the disk or a slow sink
+    queued_handlers = []
 
     logging_file = config.get("logging", "logs_file")
     if logging_file is not None:
@@ -41,33 +82,37 @@ def setup_logging(process_name: str) -> None:
             os.makedirs(logging_file.parent)
 
         logging_level = convert_debug_level(config.get("logging", "logs_file_level"))
-        file_handler = logging.FileHandler(logging_file)
-        file_handler.setLevel(logging_level)
-        file_handler.setFormatter(
-            logging.Formatter(
-                f"%(asctime)s | {process_name:8s} | %(levelname)8s | %(message)s"
-            )
+        file_handler = add_handler(
+            logging.FileHandler(logging_file),
+            logging_level,
+            logging.Formatter(f"%(asctime)s | {process_name:8s} | %(levelname)8s | %(location)s | %(message)s"),
         )
-        logger_debug.addHandler(file_handler)
+        queued_handlers.append(file_handler)
+
+        # the same records as in the file are counted for the log statistics
+        ring = log_counters.LogCountersRing(logging_file.parent / "log_counters.db")
+        severity_counter = log_counters.SeverityCountingHandler(ring, logging_level)
+        logger_debug.addHandler(severity_counter)
+        multiprocessing.util.register_after_fork(severity_counter, log_counters.SeverityCountingHandler.start_flushing)
 
     syslog_host = config.get("logging", "syslog_host")
     if syslog_host is not None and len(syslog_host) > 0:
         syslog_port = config.get("logging", "syslog_port", required=True)
         logging_level = convert_debug_level(config.get("logging", "syslog_level"))
         syslog_handler = logging.handlers.SysLogHandler(address=(str(syslog_host), syslog_port))
-        syslog_handler.setLevel(logging_level)
-        logger_debug.addHandler(syslog_handler)
+        queued_handlers.append(add_handler(syslog_handler, logging_level))
 
     logstash_host = config.get("logging", "logstash_host")
     if logstash_host is not None and len(logstash_host) > 0:
         logstash_port = config.get("logging", "logstash_port", required=True)
         logging_level = convert_debug_level(config.get("logging", "logstash_level"))
-        logger_debug.setLevel(logging_level)
         logstash_protocol = config.get("logging", "logstash_protocol").lower()
         if logstash_protocol == "tcp":
-            logger_debug.addHandler(logstash.TCPLogstashHandler(logstash_host, logstash_port, version=1))
+            logstash_handler = logstash.TCPLogstashHandler(logstash_host, logstash_port, version=1)
         else:
-            logger_debug.addHandler(logstash.LogstashHandler(logstash_host, logstash_port, version=1))
+            logstash_handler = logstash.LogstashHandler(logstash_host, logstash_port, version=1)
+        # the location is sent as a field of the record, the formatter of the handler is kept
+        queued_handlers.append(add_handler(logstash_handler, logging_level, logstash_handler.formatter))
 
     splunk_host = config.get("logging", "splunk_host")
     if splunk_host is not None and len(splunk_host) > 0:
@@ -83,43 +128,47 @@ def setup_logging(process_name: str) -> None:
             token=splunk_token,
             index=splunk_index,
             debug=True)
-        splunk_handler.setLevel(logging_level)
-        logger_debug.addHandler(splunk_handler)
+        queued_handlers.append(add_handler(splunk_handler, logging_level))
+
+    if len(queued_handlers):
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.setLevel(min(handler.level for handler in queued_handlers))
+        logger_debug.addHandler(queue_handler)
+        start_queue_listener(queue_handler, queued_handlers)
+        # the forked processes, e.g. the test workers, have no listener thread
+        multiprocessing.util.register_after_fork(queue_handler, restart_queue_listener)
 
+    # the records which no handler would emit are not created at all
+    logger_debug.setLevel(min(handler.level for handler in logger_debug.handlers))
 
 
-def get_info_about_calling_location() -> str:
-    previous_stack = inspect.stack()[2]
-    file_name = os.path.relpath(previous_stack[1])
-    line_num = previous_stack[2]
-    function_name = previous_stack[3]
-    return f"{file_name:32s} | {function_name:48s} | {line_num:3d}"
+def get_severity_statistics(minutes: int) -> Optional[Dict[str, int]]:
+    if severity_counter is None or minutes > log_counters.RING_MINUTES:
+        return None
+    counters = severity_counter.statistics(minutes, time.time())
+    counters["unknown"] = 0  # every record has its severity, unlike the lines in the file
+    return counters
 
 
 def debug(message: str) -> None:
-    calling_location = get_info_about_calling_location()
-    logger_debug.debug(f"{calling_location} | {message}")
+    logger_debug.debug(message, stacklevel=2)
 
 
 def info(message: str) -> None:
-    calling_location = get_info_about_calling_location()
-    logger_debug.info(f"{calling_location} | {message}")
+    logger_debug.info(message, stacklevel=2)
 
 
 def warning(message: str) -> None:
-    calling_location = get_info_about_calling_location()
-    logger_debug.warning(f"{calling_location} | {message}")
+    logger_debug.warning(message, stacklevel=2)
 
 
 def error(message: str) -> None:
-    calling_location = get_info_about_calling_location()
-    logger_debug.error(f"{calling_location} | {message}")
+    logger_debug.error(message, stacklevel=2)
     raise TransactionError(message)
 
 
 def critical(message: str) -> None:
-    calling_location = get_info_about_calling_location()
-    logger_debug.critical(f"{calling_location} | {message}")
+    logger_debug.critical(message, stacklevel=2)
     raise GlobalError(message)
 
 
@@ -0,0 +1,276 @@
+import bisect
+import multiprocessing.util
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import psutil
+
+METRICS_FILE = "metrics.db"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FLUSH_INTERVAL = 1.0
+SQLITE_TIMEOUT = 5.0
+RETIRED_PID = 0  # the counters and histograms of the exited processes are added together
+
+# sample name, labels
+SampleKey = Tuple[str, str]
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsStore:
+    """
+    The samples of all the processes of the agent in a small SQLite file. Every process replaces its own rows,
+    the rows of the exited processes are merged into the rows of RETIRED_PID, so the file doesn't grow with them.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __connect(self) -> sqlite3.Connection:
+        # the connection is not shared with the forked processes, e.g. the test workers
+        if self._connection is None or self._pid != os.getpid():
+            if self._connection is not None:
+                self._lock = threading.Lock()  # the lock could be held by another thread of the parent at the fork
+            # the threads of the process share the connection, the lock serializes its use
+            self._connection = sqlite3.connect(
+                self.file, timeout=SQLITE_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS metrics (pid INTEGER NOT NULL, family TEXT NOT NULL, kind TEXT NOT NULL, "
+                "sample TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (pid, sample, labels))"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def write(self, pid: int, rows: Sequence[Tuple[str, str, str, str, float]]) -> None:
+        query = (
+            "INSERT INTO metrics (pid, family, kind, sample, labels, value) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (pid, sample, labels) DO UPDATE SET value = excluded.value"
+        )
+        connection = self.__connect()
+        with self._lock, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(query, [(pid, *row) for row in rows])
+
+    def retire(self, pids: Iterable[int]) -> None:
+        # the gauges of an exited process are not valid anymore
+        query = (
+            "INSERT INTO metrics (pid, family, kind, sample, labels, value) "
+            "SELECT ?, family, kind, sample, labels, value FROM metrics WHERE pid = ? AND kind != 'gauge' "
+            "ON CONFLICT (pid, sample, labels) DO UPDATE SET value = value + excluded.value"
+        )
+        connection = self.__connect()
+        with self._lock, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for pid in pids:
+                connection.execute(query, (RETIRED_PID, pid))
+                connection.execute("DELETE FROM metrics WHERE pid = ?", (pid,))
+
+    def read(self) -> List[Tuple[int, str, str, str, str, float]]:
+        connection = self.__connect()
+        with self._lock:
+            return connection.execute("SELECT pid, family, kind, sample, labels, value FROM metrics").fetchall()
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, family: str, labels: str) -> List[Tuple[str, str, float]]:
+        samples = []
+        cumulative = 0
+        separator = "," if len(labels) else ""
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            bound = bound if isinstance(bound, str) else format_value(bound)
+            samples.append((f"{family}_bucket", f'{labels}{separator}le="{bound}"', cumulative))
+        samples.append((f"{family}_sum", labels, self.sum))
+        samples.append((f"{family}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms of one process kept in memory, the changed ones are written to the store
+    at most once per FLUSH_INTERVAL and when the process exits.
+    """
+
+    def __init__(self, store: MetricsStore) -> None:
+        self.store = store
+        self._lock = threading.Lock()
+        self.__reset()
+
+    def __reset(self) -> None:
+        self._pid = os.getpid()
+        self._values: Dict[Tuple[str, str], float] = {}
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._kinds: Dict[str, str] = {}
+        self._changed = set()
+        self._written = False
+        self._flushed = time.monotonic()
+        multiprocessing.util.Finalize(self, self.close, exitpriority=0)
+
+    def after_fork(self) -> None:
+        # the lock could be held by another thread of the parent at the fork
+        self._lock = threading.Lock()
+        self.__reset()
+
+    def inc(self, family: str, value: float = 1.0, **labels: str) -> None:
+        key = (family, format_labels(labels))
+        with self._lock:
+            self._kinds[family] = "counter"
+            self._values[key] = self._values.get(key, 0.0) + value
+            self._changed.add(key)
+        self.__flush_periodically()
+
+    def set(self, family: str, value: float, **labels: str) -> None:
+        key = (family, format_labels(labels))
+        with self._lock:
+            self._kinds[family] = "gauge"
+            self._values[key] = value
+            self._changed.add(key)
+        self.__flush_periodically()
+
+    def observe(self, family: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: str) -> None:
+        key = (family, format_labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                self._kinds[family] = "histogram"
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+            self._changed.add(key)
+        self.__flush_periodically()
+
+    def __flush_periodically(self) -> None:
+        if time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flushed = time.monotonic()
+            changed, self._changed = self._changed, set()
+            rows = []
+            for family, labels in changed:
+                kind = self._kinds[family]
+                if kind == "histogram":
+                    samples = self._histograms[(family, labels)].samples(family, labels)
+                else:
+                    samples = [(family, labels, self._values[(family, labels)])]
+                rows += [(family, kind, sample, sample_labels, value) for sample, sample_labels, value in samples]
+        if not len(rows):
+            return
+        try:
+            self.store.write(self._pid, rows)
+            self._written = True
+        except sqlite3.Error:
+            with self._lock:
+                self._changed |= changed  # written with the next flush
+
+    def close(self) -> None:
+        self.flush()
+        if not self._written:
+            return
+        try:
+            self.store.retire([self._pid])
+        except sqlite3.Error:
+            pass  # the rows are retired by the next reader
+
+
+def collect(store: Optional[MetricsStore], gauges: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    """
+    Returns the samples of all the processes in the Prometheus text format. The counters and histograms
+    are summed over the processes, the gauges only over the running ones.
+    """
+    rows = store.read() if store is not None and store.file.exists() else []
+    pids = {row[0] for row in rows} - {RETIRED_PID}
+    dead_pids = {pid for pid in pids if not psutil.pid_exists(pid)}
+    if len(dead_pids):
+        store.retire(dead_pids)  # e.g. the killed test processes
+    kinds: Dict[str, str] = {}
+    samples: Dict[str, Dict[SampleKey, float]] = defaultdict(lambda: defaultdict(float))
+    for pid, family, kind, sample, labels, value in rows:
+        if kind == "gauge" and pid in dead_pids:
+            continue
+        kinds[family] = kind
+        samples[family][(sample, labels)] += value
+    for family, values in (gauges or {}).items():
+        kinds[family] = "gauge"
+        samples[family] = {(family, labels): value for labels, value in values.items()}
+
+    lines = []
+    for family in sorted(kinds):
+        lines.append(f"# TYPE {family} {kinds[family]}")
+        for (sample, labels), value in samples[family].items():
+            name = f"{sample}{{{labels}}}" if len(labels) else sample
+            lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry: Optional[MetricsRegistry] = None
+setup_hooks: List[Callable[[], None]] = []
+
+
+def setup(file: Path) -> None:
+    global registry
+    registry = MetricsRegistry(MetricsStore(file))
+    multiprocessing.util.register_after_fork(registry, MetricsRegistry.after_fork)
+    for hook in setup_hooks:
+        hook()
+
+
+def add_setup_hook(hook: Callable[[], None]) -> None:
+    """
+    The hook prepares the collecting of the metrics, it runs by the setup or at once when already set up.
+    """
+    setup_hooks.append(hook)
+    if registry is not None:
+        hook()
+
+
+def inc(family: str, value: float = 1.0, **labels: str) -> None:
+    if registry is not None:
+        registry.inc(family, value, **labels)
+
+
+def set_gauge(family: str, value: float, **labels: str) -> None:
+    if registry is not None:
+        registry.set(family, value, **labels)
+
+
+def observe(family: str, value: float, **labels: str) -> None:
+    if registry is not None:
+        registry.observe(family, value, **labels)
+
+
+def enabled() -> bool:
+    return registry is not None
+
+
+def render(gauges: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    if registry is None:
+        return collect(None, gauges)
+    registry.flush()  # the samples of this process are up to date
+    return collect(registry.store, gauges)
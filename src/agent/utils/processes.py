@@ -1,10 +1,16 @@
 import json
 import multiprocessing
+import multiprocessing.connection
+import time
+import types
+from multiprocessing import Queue
+from typing import Dict, Optional
 
 import psutil
 
+import database.models.all as models
 from tests.common import BaseTest
-from utils import logs
+from utils import logs, metrics
 
 
 def kill_process(pid: int) -> None:
@@ -37,20 +43,32 @@ def terminate_process(pid: int) -> None:
         )
 
 
-def is_process_alive(pid: int) -> bool:
-    return psutil.pid_exists(pid)
+def is_process_alive(pid: Optional[int]) -> bool:
+    # the run stored as running without PID, the tests manager stopped before the test was started
+    return pid is not None and psutil.pid_exists(pid)
+
+
+def run_test(test_object: BaseTest, params: dict, run_id: int) -> None:
+    started = time.perf_counter()
+    try:
+        test_object.run(params, run_id)
+    finally:
+        metrics.observe("agent_test_run_seconds", time.perf_counter() - started, test=type(test_object).__module__)
 
 
 def start_new_process(
     test_name: str, test_object: BaseTest, params_json: str, run_id: int
-) -> int:
+) -> Optional[multiprocessing.Process]:
+    p = None
     pid = None
     try:
         params = json.loads(params_json)
         p = multiprocessing.Process(
-            target=test_object.run, args=(params, run_id)
+            target=run_test, args=(test_object, params, run_id)
         )
+        started = time.perf_counter()
         p.start()
+        metrics.observe("agent_process_spawn_seconds", time.perf_counter() - started)
         pid = p.pid
     except json.decoder.JSONDecodeError:
         logs.error(f"Test parameters are not in a valid JSON format. Value: {params_json}.")
@@ -65,4 +83,49 @@ def start_new_process(
         )
     else:
         logs.debug(f"Started a new process for function {test_name} with PID {pid}.")
-    return pid
+    return p
+
+
+class ProcessExecutor:
+    """
+    Runs every test in a new process.
+    """
+
+    def __init__(self, results_queue: Queue) -> None:
+        self._results_queue = results_queue
+        self._processes: Dict[int, multiprocessing.Process] = {}
+
+    def maintain(self) -> None:
+        # exited processes are detected by their sentinels and joined, so they don't stay as zombies
+        if not len(self._processes):
+            return
+        sentinels = {p.sentinel: pid for pid, p in self._processes.items()}
+        for sentinel in multiprocessing.connection.wait(list(sentinels), timeout=0):
+            self._processes.pop(sentinels[sentinel]).join()
+
+    def get_capacity(self) -> Optional[int]:
+        return None  # unlimited
+
+    def start(
+        self, test_name: str, module: types.ModuleType, params_json: str, run_id: int
+    ) -> Optional[int]:
+        test_object = module.Test(self._results_queue)
+        p = start_new_process(test_name, test_object, params_json, run_id)
+        self._processes[p.pid] = p
+        return p.pid
+
+    def is_alive(self, run: models.Run) -> bool:
+        p = self._processes.get(run.pid)
+        if p is None:
+            # the process has been joined or it was started before the restart of the tests manager
+            return is_process_alive(run.pid)
+        return p.is_alive()
+
+    def terminate(self, run: models.Run) -> None:
+        terminate_process(run.pid)
+
+    def kill(self, run: models.Run) -> None:
+        kill_process(run.pid)
+
+    def close(self) -> None:
+        pass
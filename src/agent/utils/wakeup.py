@@ -0,0 +1,72 @@
+import select
+import socket
+from typing import Optional, Tuple
+
+from utils import logs
+from utils.configuration import config
+
+WAKEUP_MESSAGE = b"wakeup"
+
+Address = Tuple[str, int]
+
+_sender_socket: Optional[socket.socket] = None
+
+
+def get_calendar_address() -> Optional[Address]:
+    if not config.exists("calendar", "wakeup_ip") or not config.exists("calendar", "wakeup_port"):
+        return None
+    ip = config.get("calendar", "wakeup_ip")
+    port = config.get("calendar", "wakeup_port")
+    return str(ip), port
+
+
+def notify_calendar() -> None:
+    """
+    Wakes up the calendar, so the new requests are processed immediately. The notification is only a hint,
+    the requests are still stored in the database, so a lost datagram only delays the processing.
+    """
+    global _sender_socket
+    address = get_calendar_address()
+    if address is None:
+        return
+    try:
+        if _sender_socket is None:
+            _sender_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            _sender_socket.setblocking(False)
+        _sender_socket.sendto(WAKEUP_MESSAGE, address)
+    except OSError as e:
+        logs.debug(f"Unable to wake up the calendar on {address[0]}:{address[1]} - {e}.")
+
+
+class WakeUpListener:
+    def __init__(self, address: Address) -> None:
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(address)
+        self._socket.setblocking(False)
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        readable, _, _ = select.select([self._socket], [], [], timeout)
+        if not readable:
+            return False
+        self.__drain()
+        return True
+
+    def __drain(self) -> None:
+        # several notifications can arrive before the calendar wakes up, one processing run handles all of them
+        while True:
+            try:
+                self._socket.recv(64)
+            except (BlockingIOError, InterruptedError):
+                return
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+def get_listener() -> Optional[WakeUpListener]:
+    address = get_calendar_address()
+    if address is None:
+        logs.warning("Calendar wake-up address is not defined, new requests are processed with a delay.")
+        return None
+    logs.debug(f"Listening for calendar wake-ups on {address[0]}:{address[1]}.")
+    return WakeUpListener(address)
@@ -0,0 +1,204 @@
+import importlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+import traceback
+import types
+from multiprocessing import Queue
+from multiprocessing.connection import Connection
+from typing import List, Optional
+
+import psutil
+
+import database.models.all as models
+from utils import logs, metrics, processes
+
+
+def worker_loop(
+    connection: Connection, results_queue: Queue, max_runs: int, max_memory: int
+) -> None:
+    manager_pid = os.getppid()
+    runs_count = 0
+    while True:
+        try:
+            while not connection.poll(1.0):
+                if os.getppid() != manager_pid:
+                    return  # the tests manager is gone
+            task = connection.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        module_name, params, run_id = task
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(module_name)
+            module.Test(results_queue).run(params, run_id)
+        except Exception:
+            # same as a crashed process, the run doesn't send any result and is finished by the deadline
+            traceback.print_exc()
+        metrics.observe("agent_test_run_seconds", time.perf_counter() - started, test=module_name)
+        runs_count += 1
+        memory = psutil.Process().memory_info().rss // 2**20
+        retiring = runs_count >= max_runs or memory >= max_memory
+        try:
+            connection.send((run_id, retiring))
+        except OSError:
+            return
+        if retiring:
+            return
+
+
+class Worker:
+    def __init__(
+        self, results_queue: Queue, max_runs: int, max_memory: int
+    ) -> None:
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=worker_loop,
+            args=(worker_connection, results_queue, max_runs, max_memory),
+        )
+        started = time.perf_counter()
+        self.process.start()
+        metrics.observe("agent_process_spawn_seconds", time.perf_counter() - started)
+        worker_connection.close()
+        self.run_id: Optional[int] = None
+        self.retiring = False
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_idle(self) -> bool:
+        return self.run_id is None and not self.retiring and self.process.is_alive()
+
+    def is_finished(self) -> bool:
+        return not self.process.is_alive() or (self.retiring and self.run_id is None)
+
+    def collect_finished_runs(self) -> None:
+        try:
+            while self.connection.poll():
+                run_id, self.retiring = self.connection.recv()
+                if run_id == self.run_id:
+                    self.run_id = None
+        except (EOFError, OSError):
+            self.retiring = True
+
+    def start(self, module_name: str, params: dict, run_id: int) -> None:
+        self.connection.send((module_name, params, run_id))
+        self.run_id = run_id
+
+    def release(self) -> None:
+        self.connection.close()
+        self.process.join(timeout=0)
+
+    def stop(self, timeout: float) -> None:
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.connection.close()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class WorkerPool:
+    """
+    Runs the tests in long-lived worker processes, so the process start and the import of the test modules
+    are paid once per worker instead of once per run. Stopping a run (terminate, kill) stops its worker
+    and the pool starts a replacement.
+    """
+
+    def __init__(
+        self, results_queue: Queue, size: int, max_runs: int, max_memory: int
+    ) -> None:
+        self._results_queue = results_queue
+        self._max_runs = max_runs
+        self._max_memory = max_memory
+        self._workers: List[Worker] = [self.__start_worker() for _ in range(size)]
+        self._retired_workers: List[Worker] = []
+        logs.debug(f"Started a pool of {size} test workers.")
+
+    def __start_worker(self) -> Worker:
+        return Worker(self._results_queue, self._max_runs, self._max_memory)
+
+    def __find_worker(self, pid: int) -> Optional[Worker]:
+        for worker in self._workers:
+            if worker.pid == pid:
+                return worker
+        return None
+
+    def maintain(self) -> None:
+        # only the workers which sent a message or exited are checked
+        handles = {}
+        for worker in self._workers:
+            handles[worker.connection] = worker
+            handles[worker.process.sentinel] = worker
+        ready = multiprocessing.connection.wait(list(handles), timeout=0)
+        for worker in {handles[handle] for handle in ready}:
+            worker.collect_finished_runs()
+        for i, worker in enumerate(self._workers):
+            if worker.is_finished():
+                logs.debug(f"Replacing the test worker with PID {worker.pid}.")
+                worker.release()
+                self._retired_workers.append(worker)
+                self._workers[i] = self.__start_worker()
+        # the processes are joined only after they exit, so they don't stay as zombies
+        self._retired_workers = [w for w in self._retired_workers if w.process.is_alive()]
+
+    def get_capacity(self) -> Optional[int]:
+        return sum(worker.is_idle() for worker in self._workers)
+
+    def start(
+        self, test_name: str, module: types.ModuleType, params_json: str, run_id: int
+    ) -> Optional[int]:
+        """
+        Returns the PID of the worker, None if there is no idle worker left, e.g. the last one has just failed.
+        Raises TransactionError for the invalid parameters of the test.
+        """
+        try:
+            params = json.loads(params_json)
+        except json.decoder.JSONDecodeError:
+            logs.error(f"Test parameters are not in a valid JSON format. Value: {params_json}.")
+        for worker in self._workers:
+            if worker.is_idle():
+                try:
+                    worker.start(module.__name__, params, run_id)
+                except OSError:
+                    worker.retiring = True
+                    continue
+                logs.debug(f"Started the test {test_name} in the worker with PID {worker.pid}.")
+                return worker.pid
+        logs.warning(f"Unable to start the test {test_name}, there is no idle worker.")
+        return None
+
+    def is_alive(self, run: models.Run) -> bool:
+        worker = self.__find_worker(run.pid)
+        if worker is None:
+            # the run was started by another pool, e.g. before the restart of the tests manager
+            return processes.is_process_alive(run.pid)
+        return worker.run_id == run.id_run and worker.process.is_alive()
+
+    def terminate(self, run: models.Run) -> None:
+        worker = self.__find_worker(run.pid)
+        if worker is None:
+            processes.terminate_process(run.pid)
+        elif worker.run_id == run.id_run:
+            worker.retiring = True
+            processes.terminate_process(worker.pid)
+
+    def kill(self, run: models.Run) -> None:
+        worker = self.__find_worker(run.pid)
+        if worker is None:
+            processes.kill_process(run.pid)
+        elif worker.run_id == run.id_run:
+            worker.retiring = True
+            processes.kill_process(worker.pid)
+
+    def close(self) -> None:
+        for worker in self._workers + self._retired_workers:
+            worker.stop(timeout=1.0)